@@ -0,0 +1,304 @@
+# backend/app/actor_learner.py
+import multiprocessing as mp
+import os
+import queue
+import random
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from .env import MultiFieldEnv
+from .engine import StepEngine
+from .qstore import DenseQTable, encode_state, N_ACTIONS
+from .replay import td_update_batch
+from .parallel_train import env_kwargs_for, fleet_specs, build_fleet, reset_fleet, episode_stats
+
+
+class TransitionRing:
+    """
+    Buffer circular de transiciones (slot, s, a, r, s2, done) en
+    shared_memory. Los actores escriben con push() bajo el lock compartido;
+    el único lector (el learner) lleva su propia cola y lee con pop(). Si el
+    lector se queda más de `capacity` atrás, las transiciones más viejas se
+    pierden (se cuentan en dropped).
+    """
+
+    FIELDS = (('slot', np.int32), ('s', np.int64), ('a', np.int32),
+              ('r', np.float32), ('s2', np.int64), ('done', np.uint8))
+    HEADER = 64
+
+    def __init__(self, capacity, lock, name=None):
+        self.capacity = int(capacity)
+        self.lock = lock
+        size = self.HEADER + sum(self.capacity * np.dtype(dt).itemsize for _, dt in self.FIELDS)
+        self.owner = name is None
+        if self.owner:
+            self.shm = shared_memory.SharedMemory(create=True, size=size)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self._head = np.ndarray((1,), dtype=np.int64, buffer=self.shm.buf, offset=0)
+        self.arrays = {}
+        offset = self.HEADER
+        for field, dt in self.FIELDS:
+            self.arrays[field] = np.ndarray((self.capacity,), dtype=dt,
+                                            buffer=self.shm.buf, offset=offset)
+            offset += self.capacity * np.dtype(dt).itemsize
+        if self.owner:
+            self._head[0] = 0
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    @property
+    def head(self):
+        return int(self._head[0])
+
+    def push(self, batch):
+        n = len(batch['s'])
+        if n == 0:
+            return
+        with self.lock:
+            h = int(self._head[0])
+            idx = (h + np.arange(n)) % self.capacity
+            for field, _ in self.FIELDS:
+                self.arrays[field][idx] = batch[field]
+            self._head[0] = h + n
+
+    def pop(self, tail, max_items=None):
+        """Transiciones nuevas desde tail → (batch, nueva cola, perdidas)"""
+        with self.lock:
+            h = int(self._head[0])
+            dropped = max(0, h - tail - self.capacity)
+            tail += dropped
+            n = h - tail if max_items is None else min(h - tail, max_items)
+            idx = (tail + np.arange(n)) % self.capacity
+            batch = {field: self.arrays[field][idx] for field, _ in self.FIELDS}
+        return batch, tail + n, dropped
+
+    def close(self):
+        del self._head, self.arrays
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+def actor_main(actor_id, env_kwargs, specs, slots, q_name, n_tables, ring_name,
+               ring_capacity, lock, stop_event, stats_queue, params, episodes,
+               steps_per_episode, seed, flush_every=256):
+    """
+    Proceso actor: juega episodios con una vista de solo lectura de las
+    Q-tables compartidas y envía sus transiciones al ring en bloques.
+    """
+    random.seed(seed)
+    np.random.seed(seed)
+    table = DenseQTable(n_tables, name=q_name)
+    ring = TransitionRing(ring_capacity, lock, name=ring_name)
+    env = MultiFieldEnv(**env_kwargs)
+    agents = build_fleet(env, specs)
+    pending = {field: [] for field, _ in TransitionRing.FIELDS}
+
+    def policy(agent, state):
+        if agent.path:
+            return agent.choose_action(state, training=True)  # sigue la ruta A*
+        if random.random() < agent.eps:
+            return random.randrange(N_ACTIONS)
+        row = table.q[slots[agent.id], encode_state(state)]
+        if not row.any():
+            return random.randrange(N_ACTIONS)
+        return int(np.argmax(row))
+
+    def collect(agent, state, action, reward, next_state, done):
+        pending['slot'].append(slots[agent.id])
+        pending['s'].append(encode_state(state))
+        pending['a'].append(action)
+        pending['r'].append(reward)
+        pending['s2'].append(encode_state(next_state))
+        pending['done'].append(done)
+
+    def flush():
+        ring.push(pending)
+        for values in pending.values():
+            values.clear()
+
+    engine = StepEngine(env, agents, policy=policy, learn_fn=collect,
+                        eps_decay=params['eps_decay'])
+    try:
+        for _ in range(episodes):
+            if stop_event.is_set():
+                break
+            env.reset()
+            reset_fleet(env, agents, params['eps'])
+            reward = 0.0
+            step = 0
+            for step in range(steps_per_episode):
+                result = engine.step()
+                reward += sum(result.rewards)
+                if len(pending['s']) >= flush_every:
+                    flush()
+                if result.done:
+                    break
+            flush()
+            ep = episode_stats(env, agents, reward, step + 1)
+            ep['total_states_learned'] = int(np.count_nonzero(table.visits))
+            ep['actor'] = actor_id
+            stats_queue.put(ep)
+    finally:
+        ring.close()
+        table.close()
+
+
+def learner_main(q_name, n_tables, ring_name, ring_capacity, lock, stop_event,
+                 alpha, gamma, batch_size, result_queue):
+    """
+    Proceso learner: aplica las transiciones del ring en lotes vectorizados
+    (td_update_batch) sobre las Q-tables compartidas y publica una versión
+    nueva tras cada lote. Termina cuando stop_event está activo y el ring está vacío.
+    """
+    table = DenseQTable(n_tables, name=q_name)
+    ring = TransitionRing(ring_capacity, lock, name=ring_name)
+    alpha = np.asarray(alpha, dtype=np.float32)
+    gamma = np.asarray(gamma, dtype=np.float32)
+    tail = updates = dropped = 0
+    try:
+        while True:
+            batch, tail, lost = ring.pop(tail, batch_size)
+            dropped += lost
+            n = len(batch['s'])
+            if n == 0:
+                if stop_event.is_set() and ring.head == tail:
+                    break
+                time.sleep(0.001)
+                continue
+            td_update_batch(table.q, table.visits, batch, alpha, gamma)
+            table.publish()
+            updates += n
+    finally:
+        result_queue.put({'updates': updates, 'dropped': dropped, 'version': table.version})
+        ring.close()
+        table.close()
+
+
+def write_back(Q, table, slot):
+    """
+    Vuelca en la Q-table dict Q (la misma instancia, compartida o no) los
+    estados de la tabla densa slot que el learner ha actualizado, es decir,
+    con más visitas que las que ya tenía Q. Devuelve cuántos.
+    """
+    q, visits = table.to_dict(slot)
+    n = 0
+    for state, count in visits.items():
+        extra = count - Q.visits.get(state, 0)
+        if extra <= 0:
+            continue
+        Q.mark(state)
+        Q[state] = q[state]
+        Q.touch(state, extra)
+        n += 1
+    Q.maybe_prune()
+    return n
+
+
+class ActorLearnerTrainer:
+    """
+    Entrenamiento asíncrono actor–learner: `actors` procesos generan
+    experiencia con la Q compartida (solo lectura) y un único proceso
+    learner la aplica. Al terminar, las tablas densas se vuelcan de nuevo a
+    las Q-tables dict de sim.agents.
+    """
+
+    def __init__(self, sim, actors=None, ring_capacity=1 << 18, batch_size=4096):
+        self.sim = sim
+        self.actors = actors or max(1, (os.cpu_count() or 2) - 1)
+        self.ring_capacity = ring_capacity
+        self.batch_size = batch_size
+        self.episodes_per_sec = 0.0
+        self.transitions_per_sec = 0.0
+
+    def train(self, episodes=50, steps_per_episode=1000):
+        sim = self.sim
+        agents = sim.agents
+        params = dict(sim.params)
+        # Un slot por Q-table distinta: los agentes que comparten tabla de rol
+        # escriben en la misma tabla densa
+        slot_of = {}
+        slots = [slot_of.setdefault(id(a.Q), len(slot_of)) for a in agents]
+        owners = {}
+        for a, slot in zip(agents, slots):
+            owners.setdefault(slot, a)
+        owners = [owners[k] for k in range(len(owners))]
+        table = DenseQTable(len(owners))
+        for slot, a in enumerate(owners):
+            table.load_dict(slot, a.Q, a.visits)
+        lock = mp.Lock()
+        ring = TransitionRing(self.ring_capacity, lock)
+        stop_event = mp.Event()
+        stats_queue = mp.Queue()
+        result_queue = mp.Queue()
+        print(f"ENTRENAMIENTO ACTOR-LEARNER: {episodes} episodios, {self.actors} actores")
+
+        learner = mp.Process(target=learner_main, args=(
+            table.name, table.n_tables, ring.name, ring.capacity, lock, stop_event,
+            [a.alpha for a in owners], [a.gamma for a in owners], self.batch_size,
+            result_queue), daemon=True)
+        learner.start()
+
+        env_kwargs = env_kwargs_for(sim.env)
+        specs = fleet_specs(agents, with_q=False)
+        share, extra = divmod(episodes, self.actors)
+        procs = []
+        for k in range(self.actors):
+            n = share + (1 if k < extra else 0)
+            if n == 0:
+                continue
+            p = mp.Process(target=actor_main, args=(
+                k, env_kwargs, specs, slots, table.name, table.n_tables, ring.name,
+                ring.capacity, lock, stop_event, stats_queue, params, n,
+                steps_per_episode, random.randrange(2 ** 31)), daemon=True)
+            p.start()
+            procs.append(p)
+
+        t0 = time.perf_counter()
+        done_eps = 0
+
+        def drain():
+            nonlocal done_eps
+            while True:
+                try:
+                    ep = stats_queue.get_nowait()
+                except queue.Empty:
+                    return
+                done_eps += 1
+                ep['episode'] = len(sim.train_stats['episodes']) + 1
+                sim.train_stats['episodes'].append(ep)
+                if ep['reward'] > sim.train_stats['best_reward']:
+                    sim.train_stats['best_reward'] = ep['reward']
+                    sim.train_stats['best_episode'] = ep['episode']
+
+        while any(p.is_alive() for p in procs):
+            if not sim.running:
+                stop_event.set()
+            drain()
+            time.sleep(0.05)
+        for p in procs:
+            p.join()
+        stop_event.set()
+        learner.join()
+        drain()
+        result = result_queue.get()
+        elapsed = time.perf_counter() - t0
+
+        with sim.lock:
+            for slot, a in enumerate(owners):
+                write_back(a.Q, table, slot)
+        ring.close()
+        table.close()
+
+        self.episodes_per_sec = done_eps / elapsed
+        self.transitions_per_sec = result['updates'] / elapsed
+        print(f"  {done_eps} episodios | {self.episodes_per_sec:.2f} ep/s | "
+              f"{self.transitions_per_sec:.0f} transiciones/s | perdidas: {result['dropped']}")
+        return {'episodes': done_eps, 'episodes_per_sec': round(self.episodes_per_sec, 3),
+                'updates': result['updates'], 'dropped': result['dropped'],
+                'transitions_per_sec': round(self.transitions_per_sec, 1)}
@@ -1,15 +1,147 @@
+import copy
 import random
 import numpy as np
 from collections import defaultdict
 
+from .config import Q_MAX_STATES, Q_BACKEND
+from .tilecoding import TileQ
+
 ACTIONS = [(0,0), (1,0), (-1,0), (0,1), (0,-1)]
 
 def zero_q():
     return np.zeros(len(ACTIONS))
 
+
+class QTable(dict):
+    """
+    Q-table dict {estado: q} con memoria acotada. Acceso con Q[s] como el
+    defaultdict(zero_q) de antes (inserta una fila a 0); row(s) consulta sin
+    insertar. Lleva visitas por estado y el instante de la última
+    actualización (touch). Con max_states > 0, cuando la tabla supera el
+    tope se podan primero los actualizados hace más tiempo (LRU), a igual
+    antigüedad los menos visitados y por último los de |q| más cercano a 0,
+    hasta bajar al PRUNE_TO del tope (histéresis: la poda no se repite en
+    cada inserción). Las visitas no protegen a un estado viejo: los estados
+    nuevos (pocas visitas, recientes) sobreviven a la poda.
+
+    Tras begin_delta(), cada fila guarda su valor previo antes de la primera
+    escritura (mark) y delta() da el cambio acumulado solo de esas filas.
+    """
+
+    PRUNE_TO = 0.9
+    approximate = False
+    _base = None   # {estado: fila previa o None} mientras se registra el cambio
+    version = 0    # escrituras de filas (mark): detecta tablas cambiadas
+
+    def __init__(self, data=None, visits=None, max_states=None):
+        super().__init__(data or {})
+        self.visits = defaultdict(int, visits or {})
+        self.last_update = {}
+        self.clock = 0
+        self.max_states = Q_MAX_STATES if max_states is None else int(max_states)
+        self.evictions = 0
+        self.prune_runs = 0
+        self.maybe_prune()
+
+    def __missing__(self, state):
+        q = self[state] = zero_q()
+        return q
+
+    def row(self, state):
+        """Fila Q del estado sin insertarlo (ceros si no se conoce)"""
+        q = self.get(state)
+        return zero_q() if q is None else q
+
+    def touch(self, state, n=1):
+        self.visits[state] += n
+        self.clock += 1
+        self.last_update[state] = self.clock
+
+    def mark(self, state):
+        """Llamar antes de escribir una fila: guarda su valor previo si se registra el cambio"""
+        self.version += 1
+        base = self._base
+        if base is not None and state not in base:
+            q = self.get(state)
+            base[state] = None if q is None else q.copy()
+
+    def begin_delta(self):
+        self._base = {}
+
+    def end_delta(self):
+        self._base = None
+
+    def delta(self):
+        """
+        (Σ ΔQ², Σ Q²) de las filas escritas desde begin_delta/delta (las
+        nuevas cuentan entero como cambio) y vuelve a empezar el registro.
+        None si no se estaba registrando.
+        """
+        if self._base is None:
+            return None
+        diff_sq = norm_sq = 0.0
+        for s, old in self._base.items():
+            q = self.get(s)
+            if q is None:
+                continue  # podada desde entonces
+            d = q if old is None else q - old
+            diff_sq += float(d @ d)
+            norm_sq += float(q @ q)
+        self._base = {}
+        return diff_sq, norm_sq
+
+    def update(self, state, action, target, alpha):
+        self.mark(state)
+        q = self[state]
+        td = target - q[action]
+        q[action] += alpha * td
+        self.touch(state)
+        self.maybe_prune(keep=(state,))
+        return td
+
+    def copy(self):
+        clone = QTable({s: q.copy() for s, q in self.items()}, self.visits, self.max_states)
+        clone.last_update = dict(self.last_update)
+        clone.clock = self.clock
+        return clone
+
+    def maybe_prune(self, keep=()):
+        if self.max_states and len(self) > self.max_states:
+            return self.prune(keep)
+        return 0
+
+    def prune(self, keep=()):
+        """Poda hasta PRUNE_TO * max_states; nunca quita los estados de keep"""
+        n_evict = len(self) - int(self.max_states * self.PRUNE_TO)
+        states = [s for s in self if s not in keep]
+        n_evict = min(n_evict, len(states))
+        if n_evict <= 0:
+            return 0
+        n = len(states)
+        visits = np.fromiter((self.visits.get(s, 0) for s in states), dtype=np.int64, count=n)
+        last = np.fromiter((self.last_update.get(s, 0) for s in states), dtype=np.int64, count=n)
+        value = np.fromiter((np.abs(dict.__getitem__(self, s)).max() for s in states),
+                            dtype=np.float64, count=n)
+        for k in np.lexsort((value, visits, last))[:n_evict]:
+            s = states[k]
+            del self[s]
+            self.visits.pop(s, None)
+            self.last_update.pop(s, None)
+        self.evictions += n_evict
+        self.prune_runs += 1
+        return n_evict
+
+    def stats(self):
+        return {'states': len(self), 'max_states': self.max_states,
+                'evictions': self.evictions, 'prune_runs': self.prune_runs}
+
+
 class FarmAgent:
+    rng = random  # exploración / acciones al azar; run_headless pone un random.Random propio
+
     def __init__(self, aid, start_pos, role='harvester', barn_pos=(0,0),
-                 alpha=0.5, gamma=0.95, eps=0.4, capacity=10, fuel=100):
+                 alpha=0.5, gamma=0.95, eps=0.4, capacity=10, fuel=100,
+                 max_q_states=None, q_backend=None):
         self.id = aid
         self.pos = tuple(start_pos)
         self.role = role
@@ -43,7 +175,10 @@ class FarmAgent:
         self.last_goal_distance = float('inf')
         
         # Q-Learning
-        self.Q = defaultdict(zero_q)
+        if (q_backend or Q_BACKEND) == 'tiles':
+            self.Q = TileQ(len(ACTIONS))  # aproximación lineal, memoria fija
+        else:
+            self.Q = QTable(max_states=max_q_states)  # visitas por estado en Q.visits
         self.alpha = alpha
         self.gamma = gamma
         self.eps = eps
@@ -56,11 +191,43 @@ class FarmAgent:
         self.total_distance_traveled = 0
         self.fuel_refills = 0
 
+    def fork(self, share_q=True):
+        """Copia del agente (escalares + ruta); la Q-table se comparte salvo share_q=False"""
+        clone = copy.copy(self)
+        clone.path = list(self.path)
+        if not share_q:
+            clone.Q = self.Q.copy()
+        return clone
+
+    @property
+    def Q(self):
+        return self._Q
+
+    @Q.setter
+    def Q(self, table):
+        # dict/defaultdict cargados de disco o de otro proceso → QTable con el tope del agente
+        if not isinstance(table, (QTable, TileQ)):
+            current = getattr(self, '_Q', None)
+            table = QTable(table, max_states=None if current is None else current.max_states)
+        self._Q = table
+
+    @property
+    def visits(self):
+        """Actualizaciones por estado (peso al fusionar); viajan con la Q-table"""
+        return self._Q.visits
+
+    @visits.setter
+    def visits(self, counts):
+        self._Q.visits = counts if isinstance(counts, defaultdict) else defaultdict(int, counts)
+
     def obs_to_state(self, obs):
         pos = obs['pos']
         goal = obs['goal']
         nearby = obs.get('nearby', set())
         
+        if self._Q.approximate:
+            return self._approx_state(pos, goal, nearby)
+        
         dx = max(-8, min(8, goal[0] - pos[0]))
         dy = max(-8, min(8, goal[1] - pos[1]))
         occ = 0
@@ -83,6 +250,17 @@ class FarmAgent:
         
         return (dx, dy, occ, cap_level, barn_dist_q, fuel_level, returning)
     
+    def _approx_state(self, pos, goal, nearby):
+        """Estado sin clamps ni buckets para la Q aproximada (el tile coding discretiza)"""
+        occ = 0
+        for i, d in enumerate([(0,1), (0,-1), (-1,0), (1,0)]):
+            if (pos[0] + d[0], pos[1] + d[1]) in nearby:
+                occ |= (1 << i)
+        barn_dist = abs(self.barn_pos[0] - pos[0]) + abs(self.barn_pos[1] - pos[1])
+        return (goal[0] - pos[0], goal[1] - pos[1], occ,
+                self.current_capacity / self.max_capacity, barn_dist,
+                self.current_fuel / self.max_fuel, 1 if self.is_returning_to_barn else 0)
+    
     def consume_fuel(self, amount):
         if self.current_fuel > 0:
             self.current_fuel = max(0, self.current_fuel - amount)
@@ -196,23 +374,19 @@ class FarmAgent:
             return 0
 
         # 2. Exploración vs Explotación (Q-Learning)
-        if training and random.random() < self.eps:
-            return random.randrange(len(ACTIONS))
+        if training and self.rng.random() < self.eps:
+            return self.rng.randrange(len(ACTIONS))
         
         if state not in self.Q:
-            return random.randrange(len(ACTIONS))
+            return self.rng.randrange(len(ACTIONS))
             
         return int(np.argmax(self.Q[state]))
     
     def update_q(self, state, action, reward, next_state, done=False):
-        if state not in self.Q: self.Q[state] = np.zeros(len(ACTIONS))
-        if next_state not in self.Q: self.Q[next_state] = np.zeros(len(ACTIONS))
-        
-        current_q = self.Q[state][action]
-        max_next_q = np.max(self.Q[next_state]) if not done else 0
+        # next_state solo se consulta: no entra en la tabla hasta que se actualice
+        max_next_q = np.max(self.Q.row(next_state)) if not done else 0
         target = reward + self.gamma * max_next_q
-        
-        self.Q[state][action] = current_q + self.alpha * (target - current_q)
+        self.Q.update(state, action, target, self.alpha)
     
     def decay_epsilon(self, decay_rate=0.995):
         self.eps = max(self.eps_min, self.eps * decay_rate)
@@ -233,6 +407,7 @@ class FarmAgent:
             'id': int(self.id),
             'role': str(self.role),
             'states_learned': int(len(self.Q)),
+            'q_evictions': int(self.Q.evictions),
             'steps_taken': int(self.steps_taken),
             'harvested': int(self.harvested),
             'planted': int(self.planted),
@@ -1,10 +1,16 @@
 # backend/app/main.py
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from typing import Optional
+from typing import Optional, List, Dict, Any
 from .sim_manager import SimManager
+from .config import ROLE_ORDER, POLICY_PATH, RECORD_DIR, RECORD_CHUNK_STEPS
+from .headless import run_headless
+from .whatif import what_if
+from .convergence import ConvergenceMonitor
+from .recorder import TrajectoryRecorder
 import os
+import time
 import numpy as np
 
 # Función helper para convertir tipos numpy a Python nativos
@@ -49,6 +55,15 @@ class TrainRequest(BaseModel):
     gamma: float = 0.95
     eps: float = 0.8
     eps_decay: float = 0.995
+    workers: int = 1  # >1: entrenamiento multiproceso
+    mode: str = 'merge'  # con workers > 1: 'merge' o 'actor_learner'
+    replay: bool = False  # experience replay con actualizaciones por lotes
+    prioritized: bool = False
+    planning_steps: int = 0  # >0: Dyna-Q con barrido priorizado
+    eval_every: Optional[int] = None  # evaluación greedy en segundo plano cada N episodios (0/None: no)
+    # Parada temprana: None = sin parada, {} = criterios por defecto, {'patience': 50, ...}
+    early_stop: Optional[Dict[str, Optional[float]]] = None
+    record: bool = False  # trazas por tick (.npz por chunks) en saved/traces
 
 class ParamsUpdate(BaseModel):
     alpha: Optional[float] = None
@@ -56,6 +71,37 @@ class ParamsUpdate(BaseModel):
     eps: Optional[float] = None
     eps_decay: Optional[float] = None
 
+class SimulateRequest(BaseModel):
+    max_steps: int = 5000
+    until_complete: bool = True
+    seed: Optional[int] = None
+    record: bool = False
+
+class Scenario(BaseModel):
+    name: Optional[str] = None
+    add_agents: Dict[str, int] = {}
+    fuel: Dict[str, float] = {}
+    capacity: Dict[str, int] = {}
+
+class WhatIfRequest(BaseModel):
+    scenarios: List[Scenario]
+    max_steps: int = 5000
+    workers: Optional[int] = None
+
+class SweepRequest(BaseModel):
+    # {'alpha': {'low': 0.1, 'high': 0.9}, 'eps_decay': [0.99, 0.995, 0.999], ...}
+    space: Dict[str, Any]
+    n_configs: int = 16
+    eta: int = 3
+    min_episodes: int = 2
+    max_rung: Optional[int] = None
+    steps_per_episode: int = 1000
+    eval_steps: int = 2000
+    eval_seeds: Optional[List[int]] = None  # mapas de evaluación comunes a todos los trials
+    workers: Optional[int] = None
+    seed: Optional[int] = None
+    apply_best: bool = False  # al terminar, copiar la mejor configuración a params
+
 class ControlResponse(BaseModel):
     status: str
     detail: Optional[str] = None
@@ -81,28 +127,96 @@ def state():
     state_data = sim.get_state()
     return convert_numpy_types(state_data)
 
+@app.get('/state/raw')
+def state_raw():
+    """
+    Capas del grid como bytes crudos (application/octet-stream)
+    El layout va en los headers. Grid denso: X-Grid-Layers con
+    nombre:dtype:offset de cada capa. Grid por tiles (campos grandes): un
+    bloque por tile alocado, listado en X-Grid-Tiles como
+    x0:y0:ancho:alto:offset; dentro de cada bloque las capas de
+    X-Grid-Layers (nombre:dtype) van seguidas, de ancho*alto celdas cada
+    una y alineadas al tamaño de su dtype (como en FarmState). Las celdas
+    fuera de los tiles listados están vacías (todas las capas a 0).
+    """
+    layout, data = sim.get_state_bytes()
+    return Response(content=data, media_type='application/octet-stream',
+                    headers=layout_headers(layout))
+
+def layout_headers(layout):
+    """Headers de /state/raw a partir de FarmState.layout() o ChunkedFarmState.layout()"""
+    headers = {
+        'X-Grid-Width': str(layout['width']),
+        'X-Grid-Height': str(layout['height']),
+        'X-Grid-Bytes': str(layout['nbytes']),
+    }
+    if 'tiles' in layout:
+        headers['X-Grid-Tile'] = str(layout['tile'])
+        headers['X-Grid-Layers'] = ','.join(f"{l['name']}:{l['dtype']}" for l in layout['layers'])
+        headers['X-Grid-Tiles'] = ','.join(
+            f"{t['x0']}:{t['y0']}:{t['width']}:{t['height']}:{t['offset']}" for t in layout['tiles']
+        )
+    else:
+        headers['X-Grid-Layers'] = ','.join(
+            f"{l['name']}:{l['dtype']}:{l['offset']}" for l in layout['layers']
+        )
+    return headers
+
 @app.post('/train')
-def train(req: TrainRequest):
+def train(req: Optional[TrainRequest] = None, resume: bool = False):
     """
     Iniciar entrenamiento
     - episodes: número de episodios
     - steps_per_episode: pasos máximo por episodio
     - Parámetros de Q-Learning: alpha, gamma, eps
+    - ?resume=true: continuar desde el último checkpoint (ignora el cuerpo)
     """
+    if resume:
+        try:
+            started = sim.resume_training()
+        except ValueError as e:
+            return {'status': 'error', 'message': str(e)}
+        return {
+            'status': 'resumed' if started else 'nothing_to_resume',
+            'episode': len(sim.train_stats['episodes']),
+            'params': convert_numpy_types(sim.params)
+        }
+    req = req or TrainRequest()
     sim.params['alpha'] = req.alpha
     sim.params['gamma'] = req.gamma
     sim.params['eps'] = req.eps
     sim.params['eps_decay'] = req.eps_decay
+    sim.params['replay'] = req.replay
+    sim.params['prioritized'] = req.prioritized
+    sim.params['planning_steps'] = req.planning_steps
+    sim.params['record'] = req.record
+    sim.params['eval_every'] = req.eval_every
+    if req.early_stop is not None:
+        try:
+            ConvergenceMonitor(**req.early_stop)
+        except ValueError as e:
+            return {'status': 'error', 'message': str(e)}
+    sim.params['early_stop'] = req.early_stop
 
-    started = sim.start_training(
-        episodes=req.episodes,
-        steps_per_episode=req.steps_per_episode
-    )
+    if req.workers > 1:
+        started = sim.start_parallel_training(
+            episodes=req.episodes,
+            steps_per_episode=req.steps_per_episode,
+            workers=req.workers,
+            mode=req.mode
+        )
+    else:
+        started = sim.start_training(
+            episodes=req.episodes,
+            steps_per_episode=req.steps_per_episode
+        )
 
     return {
         'status': 'started' if started else 'already_running',
         'episodes': req.episodes,
         'steps_per_episode': req.steps_per_episode,
+        'workers': req.workers,
+        'mode': req.mode if req.workers > 1 else 'single',
         'fuel_system': 'enabled',
         'parcels': len(sim.env.parcels)
     }
@@ -127,6 +241,42 @@ def update_params(p: ParamsUpdate):
 
     return {'status': 'ok', 'params': sim.params}
 
+@app.post('/sweep')
+def sweep(req: SweepRequest):
+    """
+    Sweep de hiperparámetros (alpha, gamma, eps, eps_decay) en paralelo
+    Muestrea n_configs configuraciones, las entrena en procesos y poda las
+    peores con successive halving asíncrono (ASHA) según pasos hasta
+    completar el ciclo y eficiencia de combustible. Resultados en GET /sweep
+    """
+    params = req.dict()
+    space = params.pop('space')
+    apply_best = params.pop('apply_best')
+    try:
+        started = sim.start_sweep(space, apply_best=apply_best, **params)
+    except ValueError as e:
+        return {'status': 'error', 'message': str(e)}
+    return {
+        'status': 'started' if started else 'already_running',
+        'n_configs': req.n_configs,
+        'budgets': sim.sweep.results()['budgets']
+    }
+
+@app.get('/sweep')
+def sweep_results():
+    """Estado del sweep: trials ordenados por rung y resultado, y el mejor"""
+    if sim.sweep is None:
+        return {'status': 'idle'}
+    return convert_numpy_types(sim.sweep.results())
+
+@app.post('/sweep/stop')
+def sweep_stop():
+    """Detener el sweep (los trials en curso terminan su rung)"""
+    if sim.sweep is None:
+        return {'status': 'idle'}
+    sim.sweep.stop()
+    return {'status': 'stopping'}
+
 @app.post('/save')
 def save():
     """Guardar Q-tables en disco"""
@@ -138,6 +288,15 @@ def save():
         'path': sim.QTABLE_PATH
     }
 
+@app.post('/compile-policy')
+def compile_policy():
+    """Compilar las Q-tables actuales a la política greedy uint8 que usa /ws"""
+    try:
+        policy = sim.compile_policy(POLICY_PATH)
+    except ValueError as e:
+        return {'status': 'error', 'message': str(e)}
+    return {'status': 'compiled', 'path': POLICY_PATH, **policy.stats()}
+
 @app.post('/load')
 def load():
     """Cargar Q-tables desde disco"""
@@ -192,6 +351,49 @@ def stop_trained():
     stopped = sim.stop_run_trained()
     return {'status': 'stopped' if stopped else 'not_running'}
 
+@app.post('/simulate')
+def simulate(req: SimulateRequest):
+    """
+    Simulación headless (sin tiempo real) con la política entrenada
+    Corre sobre un entorno nuevo, sin tocar la simulación en vivo, hasta
+    completar el ciclo o max_steps. Devuelve métricas finales,
+    pasos hasta completar y throughput (pasos/s). Con record=True graba
+    la traza por tick en saved/traces
+    """
+    recorder = None
+    if req.record:
+        recorder = TrajectoryRecorder(
+            os.path.join(RECORD_DIR, time.strftime('sim_%Y%m%d_%H%M%S')),
+            len(sim.agents), chunk_steps=RECORD_CHUNK_STEPS)
+    result = run_headless(
+        sim.agents,
+        max_steps=req.max_steps,
+        until_complete=req.until_complete,
+        seed=req.seed,
+        recorder=recorder
+    )
+    if recorder is not None:
+        recorder.close()
+        result['trace'] = recorder.stats()
+    return convert_numpy_types(result)
+
+@app.post('/whatif')
+def whatif(req: WhatIfRequest):
+    """
+    Proyecciones "qué pasaría si" desde el estado actual
+    Cada escenario (p. ej. add_agents={'harvester': 1}) corre sobre un fork
+    de la simulación en vivo, en paralelo en procesos. Devuelve el paso de
+    finalización proyectado y el combustible usado, junto al escenario base
+    """
+    result = what_if(
+        sim.env, sim.agents,
+        [sc.dict() for sc in req.scenarios],
+        max_steps=req.max_steps,
+        workers=req.workers,
+        lock=sim.lock
+    )
+    return convert_numpy_types(result)
+
 @app.get('/metrics')
 def metrics():
     """Obtener métricas del entorno actual"""
@@ -214,14 +416,14 @@ def metrics():
 @app.get('/agents')
 def agents_info():
     """Obtener información detallada de agentes"""
+    roles = {role: 0 for role in ROLE_ORDER}
+    for a in sim.agents:
+        roles[a.role] = roles.get(a.role, 0) + 1
+    
     agents_data = {
         'agents': [convert_numpy_types(a.get_stats()) for a in sim.agents],
         'total_agents': int(len(sim.agents)),
-        'roles': {
-            'planter': int(sum(1 for a in sim.agents if a.role == 'planter')),
-            'harvester': int(sum(1 for a in sim.agents if a.role == 'harvester')),
-            'irrigator': int(sum(1 for a in sim.agents if a.role == 'irrigator'))
-        },
+        'roles': roles,
         'fuel_system': {
             'enabled': True,
             'avg_fuel_pct': float(sum(a.get_fuel_percentage() for a in sim.agents) / len(sim.agents)),
@@ -236,12 +438,9 @@ def parcels_info():
     parcels_data = []
     for i, parcel in enumerate(sim.env.parcels):
         # Contar cultivos en cada parcela
-        crops_in_parcel = 0
-        for y in range(parcel['y_start'], parcel['y_end']):
-            for x in range(parcel['x_start'], parcel['x_end']):
-                if 0 <= y < sim.env.h and 0 <= x < sim.env.w:
-                    if sim.env.grid[y, x] == 2:  # CROP
-                        crops_in_parcel += 1
+        window = sim.env.grid[max(0, parcel['y_start']):parcel['y_end'],
+                              max(0, parcel['x_start']):parcel['x_end']]
+        crops_in_parcel = int(np.count_nonzero(window == 2))  # CROP
         
         parcels_data.append({
             'id': int(i),
@@ -291,7 +490,24 @@ def training_progress():
         'best_reward': float(sim.train_stats.get('best_reward', 0)),
         'avg_fuel_efficiency': float(last_episode.get('avg_fuel_efficiency', 0)),
         'time_saved': float(last_episode.get('time_saved_pct', 0)),
-        'task_complete': bool(last_episode.get('task_complete', False))
+        'task_complete': bool(last_episode.get('task_complete', False)),
+        'episodes_per_sec': float(sim.parallel_trainer.episodes_per_sec) if sim.parallel_trainer else None,
+        'last_eval': sim.evaluator.latest(),
+        'convergence': convert_numpy_types(sim.convergence.status()) if sim.convergence else None,
+        'early_stop': sim.train_stats.get('early_stop')
+    }
+
+@app.get('/evaluations')
+def evaluations():
+    """
+    Evaluaciones greedy hechas durante el entrenamiento (semillas fijas,
+    sin exploración): pasos medios hasta completar y eficiencia de combustible
+    """
+    return {
+        'eval_every': int(sim.params.get('eval_every') or 0),
+        'seeds': list(sim.evaluator.seeds),
+        'skipped': int(sim.evaluator.skipped),
+        'evaluations': sim.evaluator.history
     }
 
 @app.get('/business-metrics')
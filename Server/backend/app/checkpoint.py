@@ -0,0 +1,84 @@
+# backend/app/checkpoint.py
+import os
+import pickle
+import random
+import time
+
+import numpy as np
+
+CHECKPOINT_VERSION = 1
+
+
+# eps no se guarda: train_background lo reinicia a params['eps'] al empezar cada
+# episodio y decae por tick, así que el calendario de exploración al reanudar
+# sale de params (incluidos en el checkpoint), igual que sin interrupción
+_NOT_SAVED = ('_Q', 'eps')
+
+
+def agent_counters(agent):
+    """Escalares del agente (contadores, combustible, carga...) sin Q, ruta ni eps"""
+    return {k: v for k, v in vars(agent).items()
+            if k not in _NOT_SAVED and (v is None or isinstance(v, (bool, int, float, str, tuple,
+                                                                    np.integer, np.floating)))}
+
+
+def capture(sim, episode, episodes, steps_per_episode):
+    """
+    Estado completo de entrenamiento de sim al final de un episodio. Las
+    Q-tables van en una sola lista para que pickle conserve las tablas
+    compartidas (un objeto por tabla de rol).
+    """
+    return {
+        'version': CHECKPOINT_VERSION,
+        'created': time.time(),
+        'episode': episode,
+        'episodes': episodes,
+        'steps_per_episode': steps_per_episode,
+        'params': dict(sim.params),
+        'q_tables': [a.Q for a in sim.agents],
+        'agents': [agent_counters(a) for a in sim.agents],
+        'env': sim.env,
+        'train_stats': sim.train_stats,
+        'evaluations': list(sim.evaluator.history),
+        'convergence': sim.convergence,
+        'rng': {'random': random.getstate(), 'numpy': np.random.get_state()},
+    }
+
+
+def save_checkpoint(sim, path, episode, episodes, steps_per_episode):
+    """Escritura atómica (fichero temporal + os.replace): un corte nunca deja el checkpoint a medias"""
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        pickle.dump(capture(sim, episode, episodes, steps_per_episode), f,
+                    protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, path)
+
+
+def load_checkpoint(path):
+    if not os.path.exists(path):
+        return None
+    with open(path, 'rb') as f:
+        ckpt = pickle.load(f)
+    if ckpt.get('version') != CHECKPOINT_VERSION:
+        raise ValueError(f"Versión de checkpoint no soportada: {ckpt.get('version')}")
+    return ckpt
+
+
+def restore(sim, ckpt):
+    """Vuelca un checkpoint sobre sim (agentes, entorno, estadísticas y RNG)"""
+    if len(ckpt['agents']) != len(sim.agents):
+        raise ValueError(f"El checkpoint tiene {len(ckpt['agents'])} agentes y la "
+                         f"simulación {len(sim.agents)}")
+    with sim.lock:
+        for a, q, counters in zip(sim.agents, ckpt['q_tables'], ckpt['agents']):
+            a.Q = q
+            for k, v in counters.items():
+                setattr(a, k, v)
+            a.path = []
+        sim.env = ckpt['env']
+        sim.params.update(ckpt['params'])
+        sim.train_stats = ckpt['train_stats']
+        sim.evaluator.history = list(ckpt['evaluations'])
+        sim.convergence = ckpt['convergence']
+        random.setstate(ckpt['rng']['random'])
+        np.random.set_state(ckpt['rng']['numpy'])
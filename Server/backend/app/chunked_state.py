@@ -0,0 +1,279 @@
+# backend/app/chunked_state.py
+import numpy as np
+
+from .farm_state import FarmState, FARM_LAYERS
+
+EMPTY = 0
+
+
+class _Tile:
+    """Bloque de tile x tile celdas con su propio FarmState e histograma del grid"""
+    __slots__ = ('x0', 'y0', 'state', 'hist', 'dirty')
+
+    def __init__(self, x0, y0, w, h, layers):
+        self.x0 = x0
+        self.y0 = y0
+        self.state = FarmState(w, h, layers=layers)
+        # Conteo de celdas por valor del grid (activity flags por tipo de celda)
+        self.hist = np.zeros(256, dtype=np.int64)
+        self.hist[EMPTY] = w * h
+        self.dirty = True
+
+    def has_any(self, values):
+        return any(self.hist[v] > 0 for v in values)
+
+    def refresh_hist(self):
+        self.hist[:] = np.bincount(self.state.grid.ravel(), minlength=256)
+        self.dirty = True
+
+
+class _ChunkedLayer:
+    """
+    Proxy de una capa con la indexación que usa el entorno: layer[y, x] para
+    leer/escribir una celda y layer[y0:y1, x0:x1] para materializar una región.
+    """
+
+    def __init__(self, owner, name):
+        self._owner = owner
+        self._name = name
+        self.dtype = dict(owner.layers)[name]
+
+    @property
+    def shape(self):
+        return (self._owner.h, self._owner.w)
+
+    def __getitem__(self, key):
+        y, x = key
+        if isinstance(y, slice) or isinstance(x, slice):
+            return self._owner.read_region(self._name, y, x)
+        return self._owner.get(self._name, int(y), int(x))
+
+    def __setitem__(self, key, value):
+        y, x = key
+        self._owner.set(self._name, int(y), int(x), value)
+
+    def __array__(self, dtype=None, copy=None):
+        full = self._owner.read_region(self._name, slice(None), slice(None))
+        return full if dtype is None else full.astype(dtype)
+
+    def copy(self):
+        return np.asarray(self)
+
+    def tolist(self):
+        return np.asarray(self).tolist()
+
+
+class ChunkedFarmState:
+    """
+    Estado de la granja dividido en tiles de tamaño fijo.
+
+    Solo se alocan los tiles con contenido (parcelas, graneros, obstáculos,
+    cultivos); el resto se considera EMPTY con todas las capas a cero. Cada
+    tile lleva un histograma del grid que sirve de flag de actividad, de modo
+    que las búsquedas, conteos y el crecimiento solo recorren los tiles donde
+    hay algo que hacer. Expone la misma interfaz de consultas que FarmState.
+    """
+
+    def __init__(self, w, h, tile=64, layers=FARM_LAYERS):
+        self.w = int(w)
+        self.h = int(h)
+        self.tile = int(tile)
+        self.layers = tuple((name, np.dtype(dtype)) for name, dtype in layers)
+        self.tiles = {}
+        self._zeros = {name: dtype.type(0) for name, dtype in self.layers}
+        for name, _ in self.layers:
+            setattr(self, name, _ChunkedLayer(self, name))
+
+    # ---------- Acceso por celda ----------
+
+    def _tile_for(self, x, y, create=False):
+        if not (0 <= x < self.w and 0 <= y < self.h):
+            raise IndexError(f"Celda fuera del grid: {(x, y)}")
+        key = (x // self.tile, y // self.tile)
+        t = self.tiles.get(key)
+        if t is None and create:
+            x0, y0 = key[0] * self.tile, key[1] * self.tile
+            t = _Tile(x0, y0, min(self.tile, self.w - x0), min(self.tile, self.h - y0),
+                      self.layers)
+            self.tiles[key] = t
+        return t
+
+    def get(self, layer, y, x):
+        t = self._tile_for(x, y)
+        if t is None:
+            return self._zeros[layer]
+        return t.state.layer(layer)[y - t.y0, x - t.x0]
+
+    def set(self, layer, y, x, value):
+        t = self._tile_for(x, y, create=(value != 0))
+        if t is None:
+            return  # Escribir 0 en un tile sin alocar no cambia nada
+        arr = t.state.layer(layer)
+        ly, lx = y - t.y0, x - t.x0
+        if layer == 'grid':
+            t.hist[arr[ly, lx]] -= 1
+            t.hist[int(value) & 0xFF] += 1
+        arr[ly, lx] = value
+        t.dirty = True
+
+    def read_region(self, layer, ys, xs):
+        y0, y1, _ = ys.indices(self.h) if isinstance(ys, slice) else (ys, ys + 1, 1)
+        x0, x1, _ = xs.indices(self.w) if isinstance(xs, slice) else (xs, xs + 1, 1)
+        out = np.zeros((max(0, y1 - y0), max(0, x1 - x0)), dtype=dict(self.layers)[layer])
+        for t in self.tiles.values():
+            th, tw = t.state.h, t.state.w
+            ay0, ay1 = max(y0, t.y0), min(y1, t.y0 + th)
+            ax0, ax1 = max(x0, t.x0), min(x1, t.x0 + tw)
+            if ay0 >= ay1 or ax0 >= ax1:
+                continue
+            out[ay0 - y0:ay1 - y0, ax0 - x0:ax1 - x0] = \
+                t.state.layer(layer)[ay0 - t.y0:ay1 - t.y0, ax0 - t.x0:ax1 - t.x0]
+        if not isinstance(ys, slice):
+            out = out[0]
+        if not isinstance(xs, slice):
+            out = out[..., 0]
+        return out
+
+    def fill_rect(self, layer, x0, y0, x1, y1, value):
+        x0, y0 = max(0, x0), max(0, y0)
+        x1, y1 = min(self.w, x1), min(self.h, y1)
+        for ty in range(y0 // self.tile, -(-y1 // self.tile)):
+            for tx in range(x0 // self.tile, -(-x1 // self.tile)):
+                cx, cy = tx * self.tile, ty * self.tile
+                t = self._tile_for(cx, cy, create=(value != 0))
+                if t is None:
+                    continue
+                t.state.layer(layer)[max(y0, cy) - cy:min(y1, cy + self.tile) - cy,
+                                     max(x0, cx) - cx:min(x1, cx + self.tile) - cx] = value
+                if layer == 'grid':
+                    t.refresh_hist()
+                t.dirty = True
+
+    def fill_cells(self, layer, cells, value):
+        if len(cells) == 0:
+            return
+        keys = cells // self.tile
+        order = np.lexsort((keys[:, 0], keys[:, 1]))
+        cells, keys = cells[order], keys[order]
+        starts = np.flatnonzero(np.any(np.diff(keys, axis=0), axis=1)) + 1
+        for chunk in np.split(cells, starts):
+            x, y = int(chunk[0, 0]), int(chunk[0, 1])
+            t = self._tile_for(x, y, create=(value != 0))
+            if t is None:
+                continue
+            t.state.layer(layer)[chunk[:, 1] - t.y0, chunk[:, 0] - t.x0] = value
+            if layer == 'grid':
+                t.refresh_hist()
+            t.dirty = True
+
+    def clear(self):
+        self.tiles.clear()
+
+    # ---------- Consultas ----------
+
+    def count(self, layer, value):
+        if layer == 'grid':
+            total = sum(int(t.hist[value]) for t in self.tiles.values())
+        else:
+            total = sum(t.state.count(layer, value) for t in self.tiles.values())
+        if value == 0:
+            allocated = sum(t.state.w * t.state.h for t in self.tiles.values())
+            total += self.w * self.h - allocated
+        return total
+
+    def regions(self, values=None):
+        """Tiles alocados (x0, y0, FarmState) que contienen alguno de values en el grid"""
+        for t in list(self.tiles.values()):
+            if values is None or t.has_any(values):
+                yield t.x0, t.y0, t.state
+
+    def cells_where(self, mask_fn, values=None):
+        parts = [region.cells_where(mask_fn) + (x0, y0)
+                 for x0, y0, region in self.regions(values)]
+        if not parts:
+            return np.zeros((0, 2), dtype=np.int64)
+        return np.concatenate(parts)
+
+    def find_nearest(self, pos, mask_fn, values=None):
+        """
+        Igual que FarmState.find_nearest, recorriendo los tiles por cota inferior
+        de distancia y parando en cuanto ningún tile restante puede mejorar.
+        mask_fn debe ser False en celdas sin contenido (todas las capas a 0).
+        """
+        px, py = pos
+        candidates = []
+        for t in self.tiles.values():
+            if values is not None and not t.has_any(values):
+                continue
+            dx = max(t.x0 - px, 0, px - (t.x0 + t.state.w - 1))
+            dy = max(t.y0 - py, 0, py - (t.y0 + t.state.h - 1))
+            candidates.append((dx + dy, t.y0, t.x0, t))
+        candidates.sort(key=lambda c: c[:3])
+
+        best = None
+        for bound, _, _, t in candidates:
+            if best is not None and bound > best[0]:
+                break
+            ys, xs = np.nonzero(mask_fn(t.state))
+            if xs.size == 0:
+                continue
+            xs = xs + t.x0
+            ys = ys + t.y0
+            dist = np.abs(xs - px) + np.abs(ys - py)
+            k = int(np.argmin(dist))
+            cand = (int(dist[k]), int(ys[k]), int(xs[k]))
+            if best is None or cand < best:
+                best = cand
+        if best is None:
+            return None
+        return (best[2], best[1])
+
+    # ---------- Snapshots y serialización ----------
+
+    def copy(self):
+        clone = ChunkedFarmState(self.w, self.h, tile=self.tile, layers=self.layers)
+        clone.copy_from(self)
+        return clone
+
+    def copy_from(self, other):
+        self.tiles = {}
+        for key, t in other.tiles.items():
+            nt = _Tile.__new__(_Tile)
+            nt.x0, nt.y0 = t.x0, t.y0
+            nt.state = t.state.copy()
+            nt.hist = t.hist.copy()
+            nt.dirty = t.dirty
+            self.tiles[key] = nt
+
+    def dirty_tiles(self):
+        return [key for key, t in self.tiles.items() if t.dirty]
+
+    def clear_dirty(self):
+        for t in self.tiles.values():
+            t.dirty = False
+
+    def layout(self, keys=None):
+        keys = sorted(self.tiles) if keys is None else sorted(keys)
+        offset = 0
+        tiles = []
+        for key in keys:
+            t = self.tiles[key]
+            tiles.append({'tx': key[0], 'ty': key[1], 'x0': t.x0, 'y0': t.y0,
+                          'width': t.state.w, 'height': t.state.h, 'offset': offset})
+            offset += t.state.nbytes
+        return {
+            'width': self.w,
+            'height': self.h,
+            'tile': self.tile,
+            'nbytes': offset,
+            'layers': [{'name': name, 'dtype': dtype.str} for name, dtype in self.layers],
+            'tiles': tiles
+        }
+
+    def to_bytes(self, keys=None):
+        """Buffers de los tiles alocados (o solo de keys) concatenados en orden de layout()"""
+        keys = sorted(self.tiles) if keys is None else sorted(keys)
+        return b''.join(self.tiles[k].state.to_bytes() for k in keys)
+
+    def layer_bytes(self, name):
+        return memoryview(np.ascontiguousarray(getattr(self, name).copy()))
@@ -3,7 +3,10 @@ import os
 BASE_DIR = os.path.dirname(__file__)
 GRID_W = int(os.getenv("GRID_W", 60))
 GRID_H = int(os.getenv("GRID_H", 40))
-N_AGENTS = int(os.getenv("N_AGENTS", 6))
+
+# A partir de este número de celdas el entorno usa el grid por tiles
+CHUNKED_GRID_MIN_CELLS = int(os.getenv("CHUNKED_GRID_MIN_CELLS", 1_000_000))
+CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", 64))
 
 CROP_COUNT = int(os.getenv("CROP_COUNT", 200))
 OBSTACLE_COUNT = int(os.getenv("OBST_COUNT", 30))
@@ -49,32 +52,88 @@ HARVESTER_BARN_POS = (GRID_W - 5, 3)
 IRRIGATOR_BARN_POS = (3, GRID_H - 5)
 MANAGER_POS = (GRID_W - 5, GRID_H - 5)
 
-AGENT_ROLES = [
-    'planter',   
-    'planter',   
-    'harvester', 
-    'harvester', 
-    'irrigator', 
-    'irrigator'  
-]
-
-DEFAULT_ROLES = AGENT_ROLES
-
-AGENT_START_POSITIONS = [
-    (4, 4),                        # Plantador
-    (5, 4),                        
-    (GRID_W - 6, 4),               # Cosechador
-    (GRID_W - 7, 4),               
-    (4, GRID_H - 6),               # Irrigador
-    (5, GRID_H - 6)
-]
-
 ROLE_BARNS = {
     'planter': PLANTER_BARN_POS,
     'harvester': HARVESTER_BARN_POS,
     'irrigator': IRRIGATOR_BARN_POS
 }
 
+# FLOTA: número de agentes por rol
+# FLEET="planter:4,harvester:3,irrigator:2" o, por compatibilidad, N_AGENTS=n
+ROLE_ORDER = ('planter', 'harvester', 'irrigator')
+
+def parse_fleet(spec):
+    """'planter:2,harvester:2' → {'planter': 2, 'harvester': 2, 'irrigator': 0}"""
+    counts = {role: 0 for role in ROLE_ORDER}
+    for item in spec.split(','):
+        if not item.strip():
+            continue
+        role, n = item.split(':')
+        role = role.strip()
+        if role not in counts:
+            raise ValueError(f"Rol desconocido en FLEET: {role}")
+        counts[role] = int(n)
+    return counts
+
+def fleet_for_agents(n_agents):
+    """Reparte n agentes entre los roles de forma equilibrada (6 → 2/2/2)"""
+    return {role: n_agents // len(ROLE_ORDER) + (1 if i < n_agents % len(ROLE_ORDER) else 0)
+            for i, role in enumerate(ROLE_ORDER)}
+
+def fleet_roles(counts):
+    """Lista de roles agrupada por rol, en ROLE_ORDER"""
+    return [role for role in ROLE_ORDER for _ in range(counts.get(role, 0))]
+
+def spawn_positions(roles, barns, w, h, blocked=()):
+    """
+    Posiciones iniciales generadas alrededor del granero de cada rol.
+    Los agentes de un rol se colocan en un bloque de ~sqrt(n) columnas que
+    crece desde el granero hacia el centro del campo, saltando celdas
+    bloqueadas o ya ocupadas. O(n) en el número de agentes.
+    """
+    blocked = set(blocked)
+    taken = set()
+    per_role = {}
+    for role in roles:
+        per_role[role] = per_role.get(role, 0) + 1
+
+    cells = {}
+    for role, n in per_role.items():
+        bx, by = barns[role]
+        sx = 1 if bx < w // 2 else -1
+        sy = 1 if by < h // 2 else -1
+        cols = max(1, int(n ** 0.5 + 0.999))
+        found = []
+        r = 1
+        while len(found) < n:
+            if r > h:
+                raise ValueError(f"No hay espacio para {n} agentes '{role}' junto a {barns[role]}")
+            y = by + sy * r
+            for k in range(1, cols + 1):
+                pos = (bx + sx * k, y)
+                if (0 <= pos[0] < w and 0 <= y < h and
+                        pos not in blocked and pos not in taken):
+                    found.append(pos)
+                    taken.add(pos)
+                    if len(found) == n:
+                        break
+            r += 1
+        cells[role] = iter(found)
+
+    return [next(cells[role]) for role in roles]
+
+if os.getenv("FLEET"):
+    FLEET_COMPOSITION = parse_fleet(os.getenv("FLEET"))
+else:
+    FLEET_COMPOSITION = fleet_for_agents(int(os.getenv("N_AGENTS", 6)))
+
+AGENT_ROLES = fleet_roles(FLEET_COMPOSITION)
+N_AGENTS = len(AGENT_ROLES)
+
+DEFAULT_ROLES = AGENT_ROLES
+
+AGENT_START_POSITIONS = spawn_positions(AGENT_ROLES, ROLE_BARNS, GRID_W, GRID_H)
+
 AGENT_COLORS = {
     'planter': '#e74c3c',
     'harvester': '#27ae60',
@@ -96,6 +155,11 @@ HARVESTER_CAPACITY = 120
 IRRIGATOR_CAPACITY = 200
 BARN_RECHARGE_TIME = 5
 
+# CICLO DE VIDA DE CULTIVOS
+MATURITY_STEPS = int(os.getenv("MATURITY_STEPS", 50))           # ticks hasta madurar
+CROP_UPDATE_EVERY = int(os.getenv("CROP_UPDATE_EVERY", 1))      # actualizar cada N ticks
+CROP_WATER_USE_EVERY = int(os.getenv("CROP_WATER_USE_EVERY", 0))  # 0 = sin consumo de agua
+
 PLANTER_PARAMS = {
     'alpha': 0.6,
     'gamma': 0.92,
@@ -150,6 +214,18 @@ PENALTY_FUEL_WASTE = -0.5
 DEFAULT_EPISODES = int(os.getenv("EPISODES", 50))
 DEFAULT_STEPS_PER_EPISODE = int(os.getenv("STEPS_PER_EP", 2000))  # Aumentado para ciclo completo
 SAVE_FREQUENCY = int(os.getenv("SAVE_FREQ", 10))
+# Evaluación greedy en segundo plano cada EVAL_EVERY episodios (0 = desactivada)
+EVAL_EVERY = int(os.getenv("EVAL_EVERY", 0))
+EVAL_SEEDS = tuple(int(s) for s in os.getenv("EVAL_SEEDS", "0,1,2").split(","))
+EVAL_MAX_STEPS = int(os.getenv("EVAL_MAX_STEPS", 2000))
+# Parada temprana con los criterios por defecto de ConvergenceMonitor
+EARLY_STOP = os.getenv("EARLY_STOP", "0") == "1"
+SHARED_ROLE_Q = os.getenv("SHARED_ROLE_Q", "0") == "1"  # una Q-table por rol
+Q_MAX_STATES = int(os.getenv("Q_MAX_STATES", 0))  # tope de estados por Q-table (0 = sin tope)
+# Q_BACKEND=tiles: Q lineal con tile coding (memoria fija, estado sin clamps)
+Q_BACKEND = os.getenv("Q_BACKEND", "table")
+TILE_TILINGS = int(os.getenv("TILE_TILINGS", 8))
+TILE_MEMORY = int(os.getenv("TILE_MEMORY", 1 << 16))  # pesos por acción
 
 # ARCHIVOS Y RUTAS
 SAVE_DIR = os.path.join(os.path.dirname(__file__), "..", "saved")
@@ -160,9 +236,18 @@ QTABLE_PATH = os.path.join(SAVE_DIR, "trained_qtables.pkl")
 PLANTER_QTABLE_PATH = os.path.join(SAVE_DIR, "planter_qtable.pkl")
 HARVESTER_QTABLE_PATH = os.path.join(SAVE_DIR, "harvester_qtable.pkl")
 IRRIGATOR_QTABLE_PATH = os.path.join(SAVE_DIR, "irrigator_qtable.pkl")
+# Política greedy compilada (uint8) para servir sin las Q-tables float
+POLICY_PATH = os.path.join(SAVE_DIR, "compiled_policy.npz")
+SERVE_DROP_Q = os.getenv("SERVE_DROP_Q", "1") == "1"
 
 # Estadísticas y logs
 STATS_PATH = os.path.join(SAVE_DIR, "train_stats.json")
+# Checkpoint completo para reanudar (/train?resume=true)
+CHECKPOINT_PATH = os.path.join(SAVE_DIR, "train_checkpoint.pkl")
+CHECKPOINT_EVERY = int(os.getenv("CHECKPOINT_EVERY", SAVE_FREQUENCY))
+# Trazas por tick (TrajectoryRecorder): un subdirectorio por ejecución
+RECORD_DIR = os.path.join(SAVE_DIR, "traces")
+RECORD_CHUNK_STEPS = int(os.getenv("RECORD_CHUNK_STEPS", 1024))
 LOGS_PATH = os.path.join(SAVE_DIR, "training_logs.txt")
 
 # VISUALIZACIÓN
@@ -204,10 +289,14 @@ def get_training_config():
     """Retorna configuración de entrenamiento"""
     return {
         'n_agents': N_AGENTS,
+        'fleet': FLEET_COMPOSITION,
         'agent_roles': AGENT_ROLES,
         'role_params': ROLE_PARAMS,
         'episodes': DEFAULT_EPISODES,
         'steps_per_episode': DEFAULT_STEPS_PER_EPISODE,
+        'shared_role_q': SHARED_ROLE_Q,
+        'q_max_states': Q_MAX_STATES,
+        'q_backend': Q_BACKEND,
         'barns': {
             'planter': PLANTER_BARN_POS,
             'harvester': HARVESTER_BARN_POS,
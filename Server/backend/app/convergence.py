@@ -0,0 +1,159 @@
+# backend/app/convergence.py
+from collections import deque
+
+import numpy as np
+
+
+class ConvergenceMonitor:
+    """
+    Criterios de parada temprana evaluados al final de cada episodio
+    (update devuelve el motivo de parada o None). Un criterio con valor 0 /
+    None queda desactivado; basta con que se cumpla uno:
+
+      - plateau:  la media móvil (window episodios) de reward y de pasos no
+                  mejora más de min_delta (relativo) en patience episodios
+      - q_change: el cambio relativo en el episodio de las filas Q que se
+                  escribieron (||ΔQ|| / ||Q||, registrado por las tablas en
+                  la propia actualización: coste proporcional a los estados
+                  tocados, no al tamaño de la tabla) queda por debajo de
+                  q_tol durante q_streak episodios seguidos
+      - complete: complete_streak episodios seguidos con task_complete en
+                  step_budget pasos o menos (sin presupuesto: cualquiera)
+      - eval:     la evaluación greedy en segundo plano (mean_steps) no
+                  mejora en eval_patience evaluaciones
+    """
+
+    DEFAULTS = {
+        'window': 20,
+        'patience': 30,
+        'min_delta': 0.01,
+        'q_tol': 1e-3,
+        'q_streak': 3,
+        'complete_streak': 0,
+        'step_budget': None,
+        'eval_patience': 0,
+    }
+
+    def __init__(self, **criteria):
+        unknown = set(criteria) - set(self.DEFAULTS)
+        if unknown:
+            raise ValueError(f"Criterios de convergencia desconocidos: {sorted(unknown)}")
+        self.criteria = {**self.DEFAULTS, **{k: v for k, v in criteria.items() if v is not None}}
+        window = int(self.criteria['window'])
+        self.rewards = deque(maxlen=window)
+        self.steps = deque(maxlen=window)
+        self.best_reward_ma = None
+        self.best_steps_ma = None
+        self.since_improve = 0
+        self.q_below = 0
+        self.q_change = None
+        self.complete_run = 0
+        self.best_eval = np.inf
+        self.evals_seen = 0
+        self.evals_since_improve = 0
+        self.reason = None
+
+    def update(self, episode_data, agents, evaluations=()):
+        # Todos los criterios se actualizan en cada episodio (llevan estado)
+        for check in (self._plateau(episode_data), self._q_converged(agents),
+                      self._complete(episode_data), self._eval_plateau(evaluations)):
+            if check:
+                self.reason = check
+                return check
+        return None
+
+    def _plateau(self, ep):
+        c = self.criteria
+        if not c['patience']:
+            return None
+        self.rewards.append(ep['reward'])
+        self.steps.append(ep['steps'])
+        if len(self.rewards) < self.rewards.maxlen:
+            return None
+        reward_ma, steps_ma = np.mean(self.rewards), np.mean(self.steps)
+        tol = c['min_delta']
+        improved = False
+        best = self.best_reward_ma
+        if best is None or reward_ma > best + tol * abs(best):
+            self.best_reward_ma = reward_ma
+            improved = True
+        best = self.best_steps_ma
+        if best is None or steps_ma < best - tol * best:
+            self.best_steps_ma = steps_ma
+            improved = True
+        self.since_improve = 0 if improved else self.since_improve + 1
+        if self.since_improve >= c['patience']:
+            return (f"plateau: media móvil ({len(self.rewards)} ep) sin mejorar en "
+                    f"{self.since_improve} episodios")
+        return None
+
+    def _q_converged(self, agents):
+        c = self.criteria
+        if not c['q_tol']:
+            return None
+        diff_sq = norm_sq = 0.0
+        complete = True
+        for Q in {id(a.Q): a.Q for a in agents}.values():
+            d = Q.delta()
+            if d is None:
+                Q.begin_delta()   # tabla nueva (o recién cargada): se mide desde el próximo episodio
+                complete = False
+                continue
+            diff_sq += d[0]
+            norm_sq += d[1]
+        if not complete:
+            return None
+        self.q_change = (diff_sq / norm_sq) ** 0.5 if norm_sq else 0.0
+        self.q_below = self.q_below + 1 if self.q_change < c['q_tol'] else 0
+        if self.q_below >= c['q_streak']:
+            return (f"q_change: cambio relativo {self.q_change:.2e} < {c['q_tol']} "
+                    f"en {self.q_below} episodios")
+        return None
+
+    def _complete(self, ep):
+        c = self.criteria
+        if not c['complete_streak']:
+            return None
+        budget = c['step_budget']
+        ok = ep['task_complete'] and (budget is None or ep['steps'] <= budget)
+        self.complete_run = self.complete_run + 1 if ok else 0
+        if self.complete_run >= c['complete_streak']:
+            return f"complete: {self.complete_run} episodios seguidos completando el ciclo"
+        return None
+
+    def _eval_plateau(self, evaluations):
+        c = self.criteria
+        if not c['eval_patience']:
+            return None
+        for ev in list(evaluations)[self.evals_seen:]:
+            self.evals_seen += 1
+            if ev['mean_steps'] < self.best_eval:
+                self.best_eval = ev['mean_steps']
+                self.evals_since_improve = 0
+            else:
+                self.evals_since_improve += 1
+        if self.evals_since_improve >= c['eval_patience']:
+            return (f"eval: la política greedy no mejora en {self.evals_since_improve} "
+                    f"evaluaciones (mejor {self.best_eval:.0f} pasos)")
+        return None
+
+    def start(self, agents):
+        """Empieza a registrar en las tablas el cambio de cada episodio (q_change)"""
+        if self.criteria['q_tol']:
+            for a in agents:
+                a.Q.begin_delta()
+
+    def close(self, agents):
+        """Deja de registrar cambios en las tablas (fin del entrenamiento)"""
+        for a in agents:
+            a.Q.end_delta()
+
+    def status(self):
+        return {
+            'criteria': self.criteria,
+            'reason': self.reason,
+            'episodes_without_improvement': self.since_improve,
+            'q_change': self.q_change,
+            'complete_streak': self.complete_run,
+            'evals_without_improvement': self.evals_since_improve,
+        }
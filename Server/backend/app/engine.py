@@ -0,0 +1,161 @@
+# backend/app/engine.py
+import time
+
+from .agents import ACTIONS
+from .collisions import ConflictResolver
+
+# Movimiento de cada acción y su inversa (constantes de módulo, no por tick)
+MOVES = tuple(ACTIONS)
+ACTION_INDEX = {move: i for i, move in enumerate(MOVES)}
+
+STAGES = ('observe', 'plan', 'propose', 'resolve', 'apply', 'learn', 'record')
+
+
+def greedy_policy(agent, state):
+    return agent.choose_action(state, training=False)
+
+
+def training_policy(agent, state):
+    return agent.choose_action(state, training=True)
+
+
+def q_learn(agent, state, action, reward, next_state, done):
+    agent.update_q(state, action, reward, next_state, done)
+
+
+class StepResult:
+    __slots__ = ('proposals', 'finals', 'rewards', 'infos', 'done')
+
+    def __init__(self, proposals, finals, rewards, infos, done):
+        self.proposals = proposals
+        self.finals = finals
+        self.rewards = rewards
+        self.infos = infos
+        self.done = done
+
+
+class StepEngine:
+    """
+    Pipeline de un tick compartido por entrenamiento, ejecución entrenada y
+    WebSocket:
+
+        observe → plan → propose → resolve → apply → learn
+
+    Cada modo lo configura en vez de copiar el bucle:
+      - policy:      f(agent, state) → índice de acción (None = sin plan Q;
+                     env.step navega con A* de todos modos)
+      - batch_policy: f(agents, {i: state}) → {i: acción}, todos a la vez
+      - learn_fn:    f(agent, s, a, r, s2, done) (None = no aprende)
+      - batch_learn: f() al final de la etapa learn (actualizaciones por lotes)
+      - resolve_fn:  f(agents, proposals) → posiciones finales (por defecto
+                     ConflictResolver: vertex/swap/follow por prioridad)
+      - grow_crops:  llamar a env.update_crops() tras aplicar
+      - terminal:    pasar done real al TD (False = ciclo continuo)
+      - eps_decay:   decaimiento de epsilon por tick (None = no decae)
+      - recorder:    TrajectoryRecorder que graba cada tick (None = sin grabar)
+
+    Solo se observa, planifica y aprende para los agentes activos del
+    scheduler. self.timings acumula segundos por etapa.
+    """
+
+    def __init__(self, env, agents, policy=None, learn_fn=None,
+                 resolve_fn=None, grow_crops=False,
+                 terminal=True, eps_decay=None, batch_learn=None, batch_policy=None,
+                 recorder=None):
+        self.env = env
+        self.agents = agents
+        self.policy = policy
+        self.batch_policy = batch_policy
+        self.learn_fn = learn_fn
+        self.resolve_fn = resolve_fn if resolve_fn is not None else ConflictResolver(env.w, env.h)
+        self.grow_crops = grow_crops
+        self.terminal = terminal
+        self.eps_decay = eps_decay
+        self.batch_learn = batch_learn
+        self.recorder = recorder
+        self.reset_timings()
+
+    def reset_timings(self):
+        self.timings = dict.fromkeys(STAGES, 0.0)
+        self.ticks = 0
+
+    def stage_report(self):
+        """Milisegundos medios por tick de cada etapa"""
+        n = max(1, self.ticks)
+        return {stage: round(1000.0 * t / n, 3) for stage, t in self.timings.items()}
+
+    def step(self):
+        env, agents, timings = self.env, self.agents, self.timings
+        clock = time.perf_counter
+        needs_state = (self.policy is not None or self.batch_policy is not None
+                       or self.learn_fn is not None)
+
+        # 1. observe: estados de los agentes que estarán activos este tick
+        t0 = clock()
+        states = {}
+        if needs_state:
+            obs_list = env._get_obs(agents)
+            for i in env.scheduler.active_indices(agents, env.cycle_phase):
+                states[i] = agents[i].obs_to_state(obs_list[i])
+        t1 = clock()
+        timings['observe'] += t1 - t0
+
+        # 2. plan
+        actions = None
+        if self.batch_policy is not None:
+            actions = {i: MOVES[a] for i, a in self.batch_policy(agents, states).items()}
+        elif self.policy is not None:
+            policy = self.policy
+            actions = {i: MOVES[policy(agents[i], s)] for i, s in states.items()}
+        t2 = clock()
+        timings['plan'] += t2 - t1
+
+        # 3. propose
+        proposals = env.step(agents, actions_by_q=actions)
+        t3 = clock()
+        timings['propose'] += t3 - t2
+
+        # 4. resolve
+        finals = self.resolve_fn(agents, proposals)
+        t4 = clock()
+        timings['resolve'] += t4 - t3
+
+        # 5. apply (las acciones tomadas se miden antes de mover a los agentes)
+        active = env.active_agents
+        taken = None
+        if self.learn_fn is not None or self.recorder is not None:
+            taken = {}
+            for i in active:
+                pos, fin = agents[i].pos, finals[i]
+                taken[i] = ACTION_INDEX.get((fin[0] - pos[0], fin[1] - pos[1]), 0)
+        rewards, infos, done = env.apply_final_positions_and_harvest(agents, finals)
+        if self.grow_crops:
+            env.update_crops()
+        t5 = clock()
+        timings['apply'] += t5 - t4
+
+        # 6. learn
+        if self.learn_fn is not None:
+            learn = self.learn_fn
+            terminal = done if self.terminal else False
+            obs2_list = env._get_obs(agents)
+            for i in active:
+                s = states.get(i)
+                if s is None:
+                    continue
+                agent = agents[i]
+                learn(agent, s, taken[i], rewards[i], agent.obs_to_state(obs2_list[i]), terminal)
+        if self.batch_learn is not None:
+            self.batch_learn()
+        if self.eps_decay is not None:
+            for agent in agents:
+                agent.decay_epsilon(self.eps_decay)
+        t6 = clock()
+        timings['learn'] += t6 - t5
+
+        if self.recorder is not None:
+            self.recorder.record(env.step_count, agents, taken, rewards, done)
+            timings['record'] += clock() - t6
+
+        self.ticks += 1
+        return StepResult(proposals, finals, rewards, infos, done)
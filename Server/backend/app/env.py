@@ -1,7 +1,18 @@
+import copy
 import random
 import numpy as np
 from heapq import heappush, heappop
 
+from .config import (
+    CHUNKED_GRID_MIN_CELLS, CHUNK_SIZE,
+    MATURITY_STEPS, CROP_UPDATE_EVERY, CROP_WATER_USE_EVERY,
+    fleet_for_agents, fleet_roles, spawn_positions
+)
+from .farm_state import FarmState
+from .chunked_state import ChunkedFarmState
+from .scheduler import AgentScheduler
+from .occupancy import OccupancyGrid
+
 EMPTY = 0
 OBST = 1
 CROP = 2
@@ -13,11 +24,57 @@ HARVESTER_BARN = 7
 IRRIGATOR_BARN = 8
 PARCEL_BORDER = 11
 
+# Máscaras de objetivos por rol (deben ser False en celdas sin contenido)
+def _plantable(s):
+    return (s.grid == EMPTY) & (s.parcel == 1)
+
+def _buildable(s):
+    return s.parcel == 1
+
+def _needs_water(s):
+    return (s.grid == CROP) & (s.water < 2)
+
+def _harvestable(s):
+    return (s.grid == CROP) & (s.water >= 1)
+
+# Comprobación de una sola celda equivalente a las máscaras anteriores
+def _still_target(env, role, cell):
+    x, y = cell
+    if role == 'planter':
+        return env.grid[y, x] == EMPTY and env.state.parcel[y, x] == 1
+    if role == 'irrigator':
+        return env.grid[y, x] == CROP and env.water[y, x] < 2
+    if role == 'harvester':
+        return env.grid[y, x] == CROP and env.water[y, x] >= 1
+    return False
+
+class LazyObservation(dict):
+    """
+    Observación de un agente cuyo 'goal' se calcula al primer acceso con
+    obs['goal'] (memoizado en el entorno). Los demás campos son directos.
+    """
+    __slots__ = ('_env',)
+    
+    def __init__(self, env, **fields):
+        super().__init__(fields)
+        self._env = env
+    
+    def __missing__(self, key):
+        if key != 'goal':
+            raise KeyError(key)
+        goal = self._env._get_smart_goal(self['pos'], self['role'])
+        self['goal'] = goal
+        return goal
+
 def heuristic(a, b):
     """Distancia Manhattan"""
     return abs(a[0] - b[0]) + abs(a[1] - b[1])
 
-def astar(start, goal, obstacles_set, w, h):
+def astar(start, goal, occupancy, w, h):
+    """
+    A* sobre la ocupación compartida (capas estática + agentes).
+    La meta siempre se considera libre, aunque esté ocupada.
+    """
     if start == goal:
         return [start]
     
@@ -26,6 +83,8 @@ def astar(start, goal, obstacles_set, w, h):
     came = {}
     gscore = {start: 0}
     closed = set()
+    static = occupancy.static_buf
+    dynamic = occupancy.dynamic_buf
     
     while openq:
         f, g, current, parent = heappop(openq)
@@ -53,7 +112,8 @@ def astar(start, goal, obstacles_set, w, h):
             if not (0 <= nx < w and 0 <= ny < h):
                 continue
             
-            if (nx, ny) in obstacles_set:
+            idx = ny * w + nx
+            if (static[idx] or dynamic[idx]) and (nx, ny) != goal:
                 continue
             
             ng = g + 1
@@ -65,10 +125,21 @@ def astar(start, goal, obstacles_set, w, h):
     return None
 
 class MultiFieldEnv:
-    def __init__(self, w=60, h=40, n_agents=6, crop_count=200, obst_count=30, parcels=None):
+    rng = random  # azar del mapa; rng=random.Random(seed) lo aísla del estado global
+    finish_recharge = False  # True: un agente que empezó a recargar no sale del granero hasta terminar
+
+    def __init__(self, w=60, h=40, n_agents=6, crop_count=200, obst_count=30, parcels=None,
+                 chunk_threshold=CHUNKED_GRID_MIN_CELLS, chunk_size=CHUNK_SIZE, roles=None,
+                 rng=None):
+        if rng is not None:
+            self.rng = rng
         self.w = w
         self.h = h
-        self.n_agents = n_agents
+        # Composición de la flota: lista de roles por agente (agrupada por rol)
+        if roles is None:
+            roles = fleet_roles(fleet_for_agents(n_agents))
+        self.agent_roles = list(roles)
+        self.n_agents = len(self.agent_roles)
         self.initial_crop_count = crop_count
         self.crop_count = crop_count
         self.obst_count = obst_count
@@ -114,28 +185,75 @@ class MultiFieldEnv:
         self.FUEL_COST_IRRIGATE = 1.5
         self.FUEL_RECHARGE_RATE = 20
         
+        self.MATURITY_STEPS = MATURITY_STEPS
+        self.CROP_UPDATE_EVERY = max(1, CROP_UPDATE_EVERY)
+        self.CROP_WATER_USE_EVERY = CROP_WATER_USE_EVERY
+        
+        # Agentes dormidos (aparcados sin trabajo) no cuestan nada por tick
+        self.scheduler = AgentScheduler()
+        self.active_agents = None
+        
+        # Ocupación compartida por A* y las observaciones
+        self.occupancy = OccupancyGrid(self.w, self.h)
+        
+        # Memo de objetivos: (pos, rol, fase) → (objetivo, celda, grid_version).
+        # grid_version sube con cada cambio del grid/agua; goal_epoch solo con
+        # cambios que pueden AÑADIR objetivos (reset, fase, cambios externos).
+        self.grid_version = 0
+        self.goal_epoch = 0
+        self._goal_cache = {}
+        
+        # Celdas (x, y) escritas por los agentes en el último tick; touched_all
+        # marca cambios de grid/agua fuera de los pasos (reset, ciclo, cultivos)
+        # hasta que un lector (TrajectoryRecorder) lo consume
+        self.touched = []
+        self.touched_all = True
+        
+        # Capas por celda (grid/water/compaction) en un buffer compacto;
+        # en campos grandes, por tiles alocados solo donde hay contenido
+        if self.w * self.h >= chunk_threshold:
+            self.state = ChunkedFarmState(self.w, self.h, tile=chunk_size)
+        else:
+            self.state = FarmState(self.w, self.h)
+        self._bind_layers()
+        
         self.reset()
     
+    def _bind_layers(self):
+        # Vistas de las capas de self.state (deben rehacerse tras copiar/deserializar)
+        self.grid = self.state.grid
+        self.water = self.state.water
+        self.compaction = self.state.compaction
+        self.crop_age = self.state.crop_age
+    
+    def __getstate__(self):
+        # Las vistas no se serializan: al deserializar apuntarían a copias
+        data = self.__dict__.copy()
+        for name in ('grid', 'water', 'compaction', 'crop_age'):
+            data.pop(name, None)
+        return data
+    
+    def __setstate__(self, data):
+        self.__dict__.update(data)
+        self._bind_layers()
+    
     def reset(self):
-        self.grid = np.zeros((self.h, self.w), dtype=int) + EMPTY
+        self.state.clear()  # EMPTY, sin agua ni compactación
         self._create_parcel_borders()
+        # Índice precalculado de celdas sembrables: array (N, 2) de (x, y)
+        self.buildable_cells = self.state.cells_where(_buildable)
         self._place_barn(self.planter_barn_pos, PLANTER_BARN)
         self._place_barn(self.harvester_barn_pos, HARVESTER_BARN)
         self._place_barn(self.irrigator_barn_pos, IRRIGATOR_BARN)
         self._place_barn(self.manager_pos, MANAGER)
         self._place_crops_in_parcels()
         self._place_obstacles_outside_parcels()
-        self.agents_init = [
-            (4, 4),                    # Plantador
-            (5, 4),                    
-            (self.w - 6, 4),           # Cosechador
-            (self.w - 7, 4),         
-            (4, self.h - 6),           # Irrigador
-            (5, self.h - 6)           
-        ]
+        self.occupancy.clear()
+        self.occupancy.set_static(self.obstacles)
+        barns = {role: self._get_barn_for_role(role) for role in set(self.agent_roles)}
+        self.agents_init = spawn_positions(self.agent_roles, barns, self.w, self.h,
+                                           blocked=self.obstacles)
         
-        self.compaction = np.zeros((self.h, self.w), dtype=int)
-        self.water = np.zeros((self.h, self.w), dtype=int)
         self.blackboard = {
             'agents': {},
             'resources': {},
@@ -147,12 +265,20 @@ class MultiFieldEnv:
             }
         }
         
+        self.scheduler.reset()
+        self.active_agents = None
+        self.mark_changed()
+        
         self.step_count = 0
+        self.crop_tick = 0
+        self.mature_crops = 0
+        self.standing_crops = self.state.count('grid', CROP)  # contador O(1) de cultivos en pie
         self.harvested_total = 0
         self.planted_total = 0
         self.irrigated_total = 0
         
         self.cycle_phase = 'planting'  # planting → irrigating → harvesting → complete
+        self.auto_phase = True  # False: la fase la controla un entrenador externo
         self.phase_requirements = {
             'planting': self.target_planted,
             'irrigating': self.target_irrigated,
@@ -177,13 +303,12 @@ class MultiFieldEnv:
                     self.grid[y, x_start] = PARCEL_BORDER
                 if 0 <= x_end - 1 < self.w:
                     self.grid[y, x_end - 1] = PARCEL_BORDER
+            
+            # Interior sembrable
+            self.state.fill_rect('parcel', x_start + 1, y_start + 1, x_end - 1, y_end - 1, 1)
     
     def _is_inside_parcel(self, x, y):
-        for parcel in self.parcels:
-            if (parcel['x_start'] + 1 <= x < parcel['x_end'] - 1 and 
-                parcel['y_start'] + 1 <= y < parcel['y_end'] - 1):
-                return True
-        return False
+        return bool(self.state.parcel[y, x])
     
     def _place_crops_in_parcels(self):
         placed = 0
@@ -191,9 +316,9 @@ class MultiFieldEnv:
         max_attempts = self.initial_crop_count * 20
         
         while placed < self.initial_crop_count and attempts < max_attempts:
-            parcel = random.choice(self.parcels)
-            x = random.randrange(parcel['x_start'] + 1, parcel['x_end'] - 1)
-            y = random.randrange(parcel['y_start'] + 1, parcel['y_end'] - 1)
+            parcel = self.rng.choice(self.parcels)
+            x = self.rng.randrange(parcel['x_start'] + 1, parcel['x_end'] - 1)
+            y = self.rng.randrange(parcel['y_start'] + 1, parcel['y_end'] - 1)
             
             if self.grid[y, x] == EMPTY:
                 self.grid[y, x] = CROP
@@ -211,8 +336,8 @@ class MultiFieldEnv:
         self.obstacles = set()
         
         while placed < self.obst_count and attempts < max_attempts:
-            x = random.randrange(1, self.w - 1)
-            y = random.randrange(1, self.h - 1)
+            x = self.rng.randrange(1, self.w - 1)
+            y = self.rng.randrange(1, self.h - 1)
             
             if not self._is_inside_parcel(x, y) and self.grid[y, x] == EMPTY:
                 self.grid[y, x] = OBST
@@ -228,77 +353,70 @@ class MultiFieldEnv:
                 if 0 <= x + dx < self.w and 0 <= y + dy < self.h:
                     self.grid[y + dy, x + dx] = barn_type
     
-    def _get_obs(self):
-        obs = []
-        occ = set(self.obstacles)
-        
-        for i, init_pos in enumerate(self.agents_init):
-            # Determinar rol
-            if i < 2:
-                role = 'planter'
-            elif i < 4:
-                role = 'harvester'
-            else:
-                role = 'irrigator'
-            
-            obs.append({
-                'pos': init_pos,
-                'goal': self._get_smart_goal(init_pos, role),
-                'nearby': occ,
-                'blackboard': self.blackboard,
-                'agent_id': i,
-                'role': role
-            })
-        
-        return obs
+    def mark_changed(self, additive=True):
+        """
+        Registrar un cambio del grid/agua hecho fuera de los pasos normales.
+        additive=True si puede haber creado objetivos nuevos (invalida el memo).
+        """
+        self.grid_version += 1
+        self.touched_all = True
+        if additive:
+            self.goal_epoch += 1
+            self._goal_cache.clear()
+    
+    def _get_obs(self, agents=None):
+        """
+        Observaciones desde la posición actual de cada agente (sin agentes,
+        tras reset, desde las posiciones de salida). El objetivo se calcula
+        solo si se consulta, memoizado por (posición, rol, fase).
+        """
+        occ = self.occupancy  # solo lectura; 'in' consulta la capa estática
+        board = self.blackboard
+        roles = self.agent_roles
+        positions = self.agents_init if agents is None else [ag.pos for ag in agents]
+        
+        return [
+            LazyObservation(self, pos=pos, nearby=occ, blackboard=board,
+                            agent_id=i, role=roles[i])
+            for i, pos in enumerate(positions)
+        ]
     
     def _get_smart_goal(self, pos, role):
         """
         Objetivo MÁS CERCANO según el rol Y LA FASE ACTUAL
         Los agentes SIEMPRE buscan trabajo, solo van al granero si necesitan combustible
+        
+        Memoizado por (pos, rol, fase, grid_version). Dentro de una fase los
+        pasos solo QUITAN objetivos del rol activo, así que tras un cambio del
+        grid basta comprobar que la celda memoizada sigue siendo objetivo.
         """
+        key = (pos, role, self.cycle_phase)
+        hit = self._goal_cache.get(key)
+        if hit is not None:
+            goal, target, version = hit
+            if version == self.grid_version or target is None or _still_target(self, role, target):
+                return goal
+        
+        target = self._find_target(pos, role)
+        goal = target if target is not None else self._get_barn_for_role(role)
+        if len(self._goal_cache) > 4 * self.w * self.h:
+            self._goal_cache.clear()
+        self._goal_cache[key] = (goal, target, self.grid_version)
+        return goal
+    
+    def _find_target(self, pos, role):
         if role == 'planter' and self.cycle_phase == 'planting':
             # Buscar tierra vacía dentro de parcelas
-            targets = []
-            for parcel in self.parcels:
-                for y in range(parcel['y_start'] + 1, parcel['y_end'] - 1):
-                    for x in range(parcel['x_start'] + 1, parcel['x_end'] - 1):
-                        if self.grid[y, x] == EMPTY:
-                            targets.append((x, y))
-                            
+            target = self.state.find_nearest(pos, _plantable)
         elif role == 'irrigator' and self.cycle_phase == 'irrigating':
-            # Buscar cultivos con menos agua (priorizar los que necesitan más)
-            targets = []
-            for y in range(self.h):
-                for x in range(self.w):
-                    if self.grid[y, x] == CROP:
-                        water_level = self.water[y, x]
-                        if water_level < 2: 
-                            priority = 3 - water_level 
-                            for _ in range(priority):
-                                targets.append((x, y))
-                      
+            # Buscar cultivos con poca agua
+            target = self.state.find_nearest(pos, _needs_water, values=(CROP,))
         elif role == 'harvester' and self.cycle_phase == 'harvesting':
-            targets = []
-            for y in range(self.h):
-                for x in range(self.w):
-                    if self.grid[y, x] == CROP and self.water[y, x] >= 1:
-                        targets.append((x, y))
+            target = self.state.find_nearest(pos, _harvestable, values=(CROP,))
         else:
-            return self._get_barn_for_role(role)
-        
-        if not targets:
-            return self._get_barn_for_role(role)
+            return None
         
-        min_dist = float('inf')
-        nearest = targets[0]
-        for t in targets:
-            dist = heuristic(pos, t)
-            if dist < min_dist:
-                min_dist = dist
-                nearest = t
-        
-        return nearest
+        return target
     
     def _get_barn_for_role(self, role):
         if role == 'planter':
@@ -309,11 +427,68 @@ class MultiFieldEnv:
             return self.irrigator_barn_pos
         return self.manager_pos
     
+    def begin_cycle(self):
+        """
+        Empieza un nuevo ciclo sobre el mismo campo sin reset(): limpia las
+        celdas sembrables con asignaciones vectorizadas sobre buildable_cells y
+        reinicia contadores y fase. Graneros, bordes y obstáculos se conservan.
+        """
+        cells = self.buildable_cells
+        self.state.fill_cells('grid', cells, EMPTY)
+        self.state.fill_cells('crop_age', cells, 0)
+        self.state.fill_cells('water', cells, 0)
+        self.state.fill_cells('compaction', cells, 0)
+        
+        self.standing_crops = 0
+        self.mature_crops = 0
+        self.crop_tick = 0
+        self.planted_total = 0
+        self.irrigated_total = 0
+        self.harvested_total = 0
+        self.cycle_phase = 'planting'
+        self.scheduler.wake_all()
+        self.mark_changed()
+    
+    def fork(self):
+        """
+        Copia independiente del entorno para simular hacia delante: las capas
+        se copian a nivel de array (un memcpy del buffer), la ocupación y el
+        scheduler a nivel de bytearray/set, y el resto son escalares o datos
+        de solo lectura compartidos (obstáculos, parcelas, buildable_cells).
+        """
+        clone = copy.copy(self)
+        clone.state = self.state.copy()
+        clone._bind_layers()
+        clone.touched = list(self.touched)
+        clone.occupancy = self.occupancy.copy()
+        clone.scheduler = self.scheduler.copy()
+        clone.agent_roles = list(self.agent_roles)
+        clone.agents_init = list(self.agents_init)
+        clone.active_agents = list(self.active_agents) if self.active_agents is not None else None
+        clone._goal_cache = dict(self._goal_cache)
+        clone.phase_requirements = dict(self.phase_requirements)
+        clone.blackboard = {
+            'agents': {k: dict(v) for k, v in self.blackboard['agents'].items()},
+            'resources': dict(self.blackboard['resources']),
+            'announcements': list(self.blackboard['announcements']),
+            'barn_activity': dict(self.blackboard['barn_activity'])
+        }
+        return clone
+    
+    def set_phase(self, phase):
+        if phase != self.cycle_phase:
+            self.cycle_phase = phase
+            self.mark_changed()
+    
     def _update_cycle_phase(self):
+        if not self.auto_phase:
+            return
+        
         # FASE 1: PLANTING - Solo plantadores trabajan
         if self.cycle_phase == 'planting':
             if self.planted_total >= self.target_planted:
                 self.cycle_phase = 'irrigating'
+                self.mark_changed()
                 print(f"✓ Fase PLANTING completada ({self.planted_total} plantados)")
                 print(f"→ Iniciando fase IRRIGATING...")
         
@@ -321,6 +496,7 @@ class MultiFieldEnv:
         elif self.cycle_phase == 'irrigating':
             if self.irrigated_total >= self.target_irrigated:
                 self.cycle_phase = 'harvesting'
+                self.mark_changed()
                 print(f"✓ Fase IRRIGATING completada ({self.irrigated_total} irrigados)")
                 print(f"→ Iniciando fase HARVESTING...")
         
@@ -328,6 +504,7 @@ class MultiFieldEnv:
         elif self.cycle_phase == 'harvesting':
             if self.harvested_total >= self.target_harvested:
                 self.cycle_phase = 'complete'
+                self.mark_changed()
                 print(f"✓ Fase HARVESTING completada ({self.harvested_total} cosechados)")
                 print(f"🎉 ¡CICLO COMPLETO!")
     
@@ -342,52 +519,48 @@ class MultiFieldEnv:
             return 100
     
     def _update_blackboard_from_agents(self, agents):
+        # Una entrada por agente, reutilizada entre pasos (O(n) sin realocar)
+        board = self.blackboard['agents']
         for ag in agents:
-            self.blackboard['agents'][f'agent_{ag.id}'] = {
-                'pos': tuple(ag.pos),
-                'role': getattr(ag, 'role', None),
-                'harvested': getattr(ag, 'harvested', 0),
-                'planted': getattr(ag, 'planted', 0),
-                'irrigated': getattr(ag, 'irrigated', 0),
-                'capacity_pct': ag.get_capacity_percentage(),
-                'fuel_pct': ag.get_fuel_percentage(),
-                'is_returning': ag.is_returning_to_barn,
-                'is_fuel_low': ag.is_fuel_low()
-            }
+            key = f'agent_{ag.id}'
+            entry = board.get(key)
+            if entry is None:
+                entry = board[key] = {'role': getattr(ag, 'role', None)}
+            entry['pos'] = tuple(ag.pos)
+            entry['harvested'] = getattr(ag, 'harvested', 0)
+            entry['planted'] = getattr(ag, 'planted', 0)
+            entry['irrigated'] = getattr(ag, 'irrigated', 0)
+            entry['capacity_pct'] = ag.get_capacity_percentage()
+            entry['fuel_pct'] = ag.get_fuel_percentage()
+            entry['is_returning'] = ag.is_returning_to_barn
+            entry['is_fuel_low'] = ag.is_fuel_low()
     
-    def compute_paths(self, agents):
-        obstset = set(self.obstacles)
-        agent_positions = set(ag.pos for ag in agents)
+    def compute_paths(self, agents, indices=None):
+        if indices is None:
+            indices = range(len(agents))
         
-        for i, ag in enumerate(agents):
+        # Registrar posiciones actuales (solo cambian las que se movieron)
+        if not self.occupancy.agent_cells:
+            self.occupancy.sync_agents(agents)
+        else:
+            self.occupancy.sync_agents(agents, indices)
+        
+        for i in indices:
+            ag = agents[i]
             start = ag.pos
             
-            # 1. Determinar Objetivo
-            if ag.should_return_to_barn():
+            # 1. Determinar Objetivo (con finish_recharge, si ya empezó a recargar, termina)
+            if ag.should_return_to_barn() or (self.finish_recharge and ag.recharge_counter > 0):
                 goal = ag.barn_pos
                 ag.is_returning_to_barn = True
             else:
                 goal = self._get_smart_goal(start, ag.role)
                 ag.is_returning_to_barn = False
             
-            # 2. Definir Obstáculos para este agente
-            obstacles_for_this_agent = obstset.copy()
-            for other_ag in agents:
-                if other_ag.id != ag.id:
-                    if other_ag.pos == goal:
-                        continue
-                    obstacles_for_this_agent.add(other_ag.pos)
-            
-            # --- CORRECCIÓN CRÍTICA AQUÍ ---
-            # Si mi meta está ocupada por otro agente (ej. un compañero en el granero),
-            # la quitamos de la lista de obstáculos para que A* no falle.
-            # Esto permite trazar una ruta HASTA el compañero.
-            if goal in obstacles_for_this_agent:
-                obstacles_for_this_agent.remove(goal)
-            # -------------------------------
-            
-            # 3. Calcular Ruta
-            path = astar(start, goal, obstacles_for_this_agent, self.w, self.h)
+            # 2. Calcular Ruta sobre la ocupación compartida: obstáculos fijos
+            # + demás agentes. Si mi meta está ocupada (ej. un compañero en el
+            # granero) A* la trata como libre, para trazar una ruta HASTA él.
+            path = astar(start, goal, self.occupancy, self.w, self.h)
             
             if path and len(path) > 1:
                 ag.path = path[1:] 
@@ -399,25 +572,30 @@ class MultiFieldEnv:
     def step(self, agents, actions_by_q=None):
         self.step_count += 1
         
-        self._update_blackboard_from_agents(agents)
         self._update_cycle_phase()
-        self.compute_paths(agents)
+        active = self.scheduler.active_indices(agents, self.cycle_phase)
+        self.active_agents = active
         
-        proposals = []
-        for i, ag in enumerate(agents):
-            if ag.path and len(ag.path) > 0:
-                next_pos = ag.path[0]
-                proposals.append(next_pos)
-            else:
-                proposals.append(ag.pos)
+        self._update_blackboard_from_agents(agents[i] for i in active)
+        self.compute_paths(agents, active)
+        
+        # Los dormidos proponen quedarse donde están
+        proposals = [ag.pos for ag in agents]
+        for i in active:
+            ag = agents[i]
+            if ag.path:
+                proposals[i] = ag.path[0]
         
         return proposals
     
     def apply_final_positions_and_harvest(self, agents, final_positions):
         rewards = [0.0] * len(agents)
         infos = [{} for _ in agents]
+        active = self.active_agents if self.active_agents is not None else range(len(agents))
+        touched = self.touched = []
         
-        for i, ag in enumerate(agents):
+        for i in active:
+            ag = agents[i]
             newpos = final_positions[i]
             old_pos = ag.pos
             moved = (newpos != old_pos)
@@ -441,6 +619,7 @@ class MultiFieldEnv:
             
             # 3. Actualizar posición física
             ag.pos = newpos
+            self.occupancy.place_agent(i, newpos)
             x, y = newpos
             
             # Actualizar path del agente (borrar el paso que ya dio)
@@ -475,6 +654,10 @@ class MultiFieldEnv:
                 if ag.role == 'planter' and self.grid[y, x] == EMPTY and self._is_inside_parcel(x, y):
                     if ag.use_capacity(1) and ag.consume_fuel(self.FUEL_COST_PLANT):
                         self.grid[y, x] = CROP
+                        self.crop_age[y, x] = 0
+                        touched.append(newpos)
+                        self.grid_version += 1
+                        self.standing_crops += 1
                         ag.planted += 1
                         self.planted_total += 1
                         rewards[i] += self.REWARD_PLANT
@@ -491,6 +674,8 @@ class MultiFieldEnv:
                 if ag.role == 'irrigator' and self.grid[y, x] == CROP:
                     if ag.use_capacity(1) and ag.consume_fuel(self.FUEL_COST_IRRIGATE):
                         self.water[y, x] += 1
+                        touched.append(newpos)
+                        self.grid_version += 1
                         ag.irrigated += 1
                         self.irrigated_total += 1
                         rewards[i] += self.REWARD_IRRIGATE
@@ -509,6 +694,10 @@ class MultiFieldEnv:
                     if self.water[y, x] >= 1:
                         if ag.use_capacity(1) and ag.consume_fuel(self.FUEL_COST_HARVEST):
                             self.grid[y, x] = PATH # O EMPTY
+                            self.crop_age[y, x] = 0
+                            touched.append(newpos)
+                            self.standing_crops -= 1
+                            self.grid_version += 1
                             ag.harvested += 1
                             self.harvested_total += 1
                             rewards[i] += self.REWARD_HARVEST
@@ -528,6 +717,8 @@ class MultiFieldEnv:
                 ag.is_returning_to_barn = True
                 ag.path = [] 
         
+        self.scheduler.update(agents, active, self.cycle_phase)
+        
         # CONDICIÓN DE TERMINACIÓN: CICLO COMPLETO
         done = self.is_task_complete()
         
@@ -557,7 +748,8 @@ class MultiFieldEnv:
             'planted': int(self.planted_total),
             'irrigated': int(self.irrigated_total),
             'harvested': int(self.harvested_total),
-            'remaining_crops': int(np.sum(self.grid == CROP)),
+            'remaining_crops': int(self.standing_crops),
+            'mature_crops': int(self.mature_crops),
             'progress': {
                 'planted': f"{self.planted_total}/{self.target_planted}",
                 'irrigated': f"{self.irrigated_total}/{self.target_irrigated}",
@@ -581,8 +773,32 @@ class MultiFieldEnv:
         return int((planted_pct + irrigated_pct + harvested_pct) / 3)
     
     def update_crops(self):
-        for y in range(self.h):
-            for x in range(self.w):
-                if self.grid[y, x] == 2:  # CROP
-                # Lógica de crecimiento
-                    pass
\ No newline at end of file
+        """
+        Ciclo de vida de los cultivos, con operaciones sobre arrays completos
+        (una región en el grid denso, solo los tiles con cultivos en el grid
+        por tiles). Cada CROP_UPDATE_EVERY ticks los cultivos envejecen ese
+        número de ticks; cada CROP_WATER_USE_EVERY ticks los que aún no han
+        madurado consumen una unidad de agua. Actualiza mature_crops.
+        """
+        self.crop_tick += 1
+        dt = self.CROP_UPDATE_EVERY
+        if self.crop_tick % dt:
+            return
+        
+        every = self.CROP_WATER_USE_EVERY
+        consume = bool(every) and (self.crop_tick // every) != ((self.crop_tick - dt) // every)
+        
+        mature = 0
+        for x0, y0, region in self.state.regions(values=(CROP,)):
+            crops = region.grid == CROP
+            age = region.crop_age
+            np.add(age, dt, out=age, where=crops & (age <= np.iinfo(age.dtype).max - dt))
+            ripe = crops & (age >= self.MATURITY_STEPS)
+            if consume:
+                np.subtract(region.water, 1, out=region.water,
+                            where=crops & ~ripe & (region.water > 0))
+            mature += int(np.count_nonzero(ripe))
+        
+        self.mature_crops = mature
+        if consume:
+            self.mark_changed()  # Menos agua puede crear objetivos de riego
@@ -0,0 +1,111 @@
+# backend/app/evaluation.py
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import numpy as np
+
+from .env import MultiFieldEnv
+from .headless import run_headless
+from .parallel_train import env_kwargs_for, fleet_specs, build_fleet
+
+
+def evaluate_policy(env_kwargs, specs, seeds, max_steps):
+    """
+    Episodios greedy, uno por semilla (la semilla fija también el mapa), con
+    una flota nueva construida desde specs. Los episodios que no completan
+    el ciclo cuentan con max_steps pasos.
+    """
+    t0 = time.perf_counter()
+    steps, completed, fuel, efficiency = [], [], [], []
+    for seed in seeds:
+        random.seed(seed)
+        np.random.seed(seed)
+        env = MultiFieldEnv(**env_kwargs)
+        fleet = build_fleet(env, specs)
+        res = run_headless(fleet, env, max_steps=max_steps)
+        completed.append(res['completed'])
+        steps.append(res['steps_to_completion'] if res['completed'] else max_steps)
+        fuel.append(res['fuel_consumed'])
+        efficiency.append(np.mean([a.calculate_efficiency_score() for a in fleet]))
+    return {
+        'seeds': list(seeds),
+        'completion_rate': round(float(np.mean(completed)), 3),
+        'mean_steps': round(float(np.mean(steps)), 1),
+        'mean_fuel_consumed': round(float(np.mean(fuel)), 1),
+        'mean_fuel_efficiency': round(float(np.mean(efficiency)), 2),
+        'eval_s': round(time.perf_counter() - t0, 3)
+    }
+
+
+def snapshot_specs(agents):
+    """Specs de la flota con una copia de cada Q-table (una por tabla compartida)"""
+    specs = fleet_specs(agents, with_q=False)
+    copies = {}
+    for spec, a in zip(specs, agents):
+        if id(a.Q) not in copies:
+            copies[id(a.Q)] = (a.Q.copy() if a.Q.approximate
+                               else {s: q.copy() for s, q in a.Q.items()})
+        spec['Q'] = copies[id(a.Q)]
+    return specs
+
+
+class BackgroundEvaluator:
+    """
+    Evaluación greedy fuera de banda: cada `every` episodios, train_background
+    llama a maybe_evaluate(), que copia las Q-tables (entre episodios, sin
+    lock) y lanza evaluate_policy en un proceso aparte sobre un conjunto fijo
+    de semillas. El hilo de entrenamiento no espera: si la evaluación
+    anterior sigue en curso, esta se salta (skipped) en vez de encolarse.
+    """
+
+    def __init__(self, sim, seeds=(0, 1, 2), max_steps=2000):
+        self.sim = sim
+        self.seeds = tuple(seeds)
+        self.max_steps = max_steps
+        self.history = []
+        self.skipped = 0
+        self._pool = None
+        self._pending = None
+
+    def maybe_evaluate(self, episode):
+        every = self.sim.params.get('eval_every', 0)
+        if every and episode % every == 0:
+            return self.submit(episode)
+        return False
+
+    def submit(self, episode):
+        if self._pending is not None and not self._pending.done():
+            self.skipped += 1
+            return False
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=1)
+        fut = self._pool.submit(evaluate_policy, env_kwargs_for(self.sim.env),
+                                snapshot_specs(self.sim.agents), self.seeds, self.max_steps)
+        fut.add_done_callback(partial(self._record, episode))
+        self._pending = fut
+        return True
+
+    def _record(self, episode, fut):
+        try:
+            res = fut.result()
+        except Exception as e:
+            print(f"✗ Error en evaluación (ep {episode}): {e}")
+            return
+        res['episode'] = episode
+        self.history.append(res)
+        print(f"  📏 Eval ep {episode}: completado {res['completion_rate']:.0%} | "
+              f"pasos {res['mean_steps']:.0f} | fuel {res['mean_fuel_efficiency']:.1f}%")
+
+    def latest(self):
+        return self.history[-1] if self.history else None
+
+    def wait(self):
+        """Espera a la evaluación en curso (al terminar el entrenamiento)"""
+        if self._pending is not None:
+            self._pending.exception()
+
+    def reset(self):
+        self.history = []
+        self.skipped = 0
@@ -0,0 +1,142 @@
+# backend/app/farm_state.py
+import numpy as np
+
+# Capas por celda: (nombre, dtype). Los tipos de celda caben en 0-11 y los
+# niveles de agua/compactación son pequeños, así que uint8 es suficiente.
+FARM_LAYERS = (
+    ('grid', np.uint8),
+    ('water', np.uint8),
+    ('compaction', np.uint8),
+    ('parcel', np.uint8),      # 1 = interior de parcela (celda sembrable)
+    ('crop_age', np.uint16),   # ticks desde la siembra
+)
+
+
+class FarmState:
+    """
+    Estado por celda de la granja en un único buffer contiguo de bytes.
+
+    Cada capa (grid, water, ...) es una vista tipada (h, w) sobre el buffer,
+    de modo que copiar, hacer snapshot o serializar la granja es un solo
+    memcpy / tobytes() en lugar de varias copias de arrays int64.
+    """
+
+    def __init__(self, w, h, layers=FARM_LAYERS, buffer=None):
+        self.w = int(w)
+        self.h = int(h)
+        self.layers = tuple((name, np.dtype(dtype)) for name, dtype in layers)
+
+        # Offsets alineados al tamaño de cada dtype
+        self.offsets = {}
+        offset = 0
+        cells = self.w * self.h
+        for name, dtype in self.layers:
+            offset = -(-offset // dtype.itemsize) * dtype.itemsize
+            self.offsets[name] = offset
+            offset += cells * dtype.itemsize
+        self.nbytes = offset
+
+        if buffer is None:
+            self.buffer = np.zeros(self.nbytes, dtype=np.uint8)
+        else:
+            self.buffer = np.frombuffer(buffer, dtype=np.uint8).copy()
+            if self.buffer.size != self.nbytes:
+                raise ValueError(
+                    f"Buffer de {self.buffer.size} bytes, se esperaban {self.nbytes}"
+                )
+
+        self._bind_views()
+
+    def _bind_views(self):
+        cells = self.w * self.h
+        for name, dtype in self.layers:
+            start = self.offsets[name]
+            raw = self.buffer[start:start + cells * dtype.itemsize]
+            setattr(self, name, raw.view(dtype).reshape(self.h, self.w))
+
+    def layer(self, name):
+        return getattr(self, name)
+
+    def clear(self):
+        self.buffer.fill(0)
+
+    def copy(self):
+        clone = FarmState.__new__(FarmState)
+        clone.w, clone.h = self.w, self.h
+        clone.layers = self.layers
+        clone.offsets = self.offsets
+        clone.nbytes = self.nbytes
+        clone.buffer = self.buffer.copy()
+        clone._bind_views()
+        return clone
+
+    def copy_from(self, other):
+        """Restaura este estado desde otro con el mismo layout (sin realocar)"""
+        np.copyto(self.buffer, other.buffer)
+
+    def count(self, layer, value):
+        return int(np.count_nonzero(self.layer(layer) == value))
+
+    def fill_rect(self, layer, x0, y0, x1, y1, value):
+        self.layer(layer)[max(0, y0):max(0, y1), max(0, x0):max(0, x1)] = value
+
+    def fill_cells(self, layer, cells, value):
+        """Asigna value en las celdas (x, y) de un array (N, 2), sin bucles Python"""
+        self.layer(layer)[cells[:, 1], cells[:, 0]] = value
+
+    # ---------- Consultas (misma interfaz que ChunkedFarmState) ----------
+
+    def regions(self, values=None):
+        """Regiones (x0, y0, vista) a procesar; aquí, todo el grid de una vez"""
+        yield 0, 0, self
+
+    def cells_where(self, mask_fn, values=None):
+        """Array (N, 2) con las celdas (x, y) donde mask_fn(estado) es True"""
+        ys, xs = np.nonzero(mask_fn(self))
+        return np.stack([xs, ys], axis=1)
+
+    def find_nearest(self, pos, mask_fn, values=None):
+        """
+        Celda (x, y) más cercana a pos (Manhattan) donde mask_fn(estado) es True.
+        Empates: primera en orden fila-mayor. None si no hay ninguna.
+        """
+        ys, xs = np.nonzero(mask_fn(self))
+        if xs.size == 0:
+            return None
+        dist = np.abs(xs - pos[0]) + np.abs(ys - pos[1])
+        k = int(np.argmin(dist))
+        return (int(xs[k]), int(ys[k]))
+
+    # ---------- Serialización ----------
+
+    def layout(self):
+        """Descripción del buffer para clientes que leen los bytes directamente"""
+        return {
+            'width': self.w,
+            'height': self.h,
+            'nbytes': self.nbytes,
+            'layers': [
+                {'name': name, 'dtype': dtype.str, 'offset': self.offsets[name]}
+                for name, dtype in self.layers
+            ]
+        }
+
+    def to_bytes(self):
+        return self.buffer.tobytes()
+
+    def layer_bytes(self, name):
+        """Bytes crudos (row-major) de una capa, sin copiar"""
+        dtype = dict(self.layers)[name]
+        start = self.offsets[name]
+        return memoryview(self.buffer[start:start + self.w * self.h * dtype.itemsize])
+
+    @classmethod
+    def from_bytes(cls, data, w, h, layers=FARM_LAYERS):
+        return cls(w, h, layers=layers, buffer=data)
+
+    def __getstate__(self):
+        return {'w': self.w, 'h': self.h, 'layers': self.layers, 'buffer': self.buffer}
+
+    def __setstate__(self, state):
+        self.__init__(state['w'], state['h'], layers=state['layers'])
+        np.copyto(self.buffer, state['buffer'])
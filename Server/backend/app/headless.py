@@ -0,0 +1,90 @@
+# backend/app/headless.py
+import random
+import time
+
+from .config import GRID_W, GRID_H, PARCELS, AGENT_ROLES
+from .env import MultiFieldEnv
+from .agents import FarmAgent
+from .engine import StepEngine, greedy_policy
+
+
+def fleet_like(agents, env, rng=None):
+    """
+    Copias frescas de una flota en las posiciones iniciales de env. Comparten
+    la Q-table del original (solo lectura con la política greedy).
+    """
+    fleet = []
+    for i, a in enumerate(agents):
+        b = FarmAgent(i, env.agents_init[i], role=a.role, barn_pos=a.barn_pos,
+                      alpha=a.alpha, gamma=a.gamma, eps=a.eps_min,
+                      capacity=a.max_capacity, fuel=a.max_fuel)
+        b.Q = a.Q
+        if rng is not None:
+            b.rng = rng
+        fleet.append(b)
+    return fleet
+
+
+def run_headless(agents, env=None, max_steps=5000, until_complete=True,
+                 policy=greedy_policy, grow_crops=True, seed=None, recorder=None):
+    """
+    Ejecuta la política entrenada sin tiempo real: sin lock por paso, sin
+    sleeps y sin serializar estado. Si no se pasa env, crea uno nuevo con la
+    configuración del servidor y una copia de la flota (agents solo aporta
+    roles, capacidades y Q-tables).
+
+    seed fija el mapa y el azar de la flota con un random.Random propio (no
+    toca el estado global, que puede estar usando un entrenamiento en
+    curso); solo aplica al entorno y la flota que crea run_headless.
+
+    Devuelve métricas finales, pasos hasta completar el ciclo (None si no
+    se completó) y pasos por segundo.
+    """
+    if env is None:
+        rng = random.Random(seed) if seed is not None else None
+        env = MultiFieldEnv(w=GRID_W, h=GRID_H, parcels=PARCELS,
+                            roles=[a.role for a in agents] or AGENT_ROLES, rng=rng)
+        agents = fleet_like(agents, env, rng)
+
+    engine = StepEngine(env, agents, policy=policy, grow_crops=grow_crops, recorder=recorder)
+    if recorder is not None:
+        recorder.begin_episode(0, env)  # el llamador cierra el recorder
+    completed_at = None
+    steps = 0
+    t0 = time.perf_counter()
+    for steps in range(1, max_steps + 1):
+        engine.step()
+        if completed_at is None and env.is_task_complete():
+            completed_at = env.step_count
+            if until_complete:
+                break
+    elapsed = time.perf_counter() - t0
+
+    return {
+        'steps': int(steps),
+        'completed': completed_at is not None,
+        'steps_to_completion': completed_at,
+        'elapsed_s': round(elapsed, 4),
+        'steps_per_s': round(steps / elapsed, 1) if elapsed > 0 else None,
+        'fuel_consumed': float(sum(a.fuel_consumed for a in agents)),
+        'stage_ms': engine.stage_report(),
+        'metrics': env.get_metrics()
+    }
+
+
+if __name__ == '__main__':
+    import argparse
+    import json
+    from .sim_manager import SimManager
+
+    parser = argparse.ArgumentParser(description="Simulación headless con la política entrenada")
+    parser.add_argument('--steps', type=int, default=5000)
+    parser.add_argument('--no-stop', action='store_true', help="no parar al completar el ciclo")
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    sim = SimManager()
+    sim.load_qs()
+    result = run_headless(sim.agents, max_steps=args.steps,
+                          until_complete=not args.no_stop, seed=args.seed)
+    print(json.dumps(result, indent=2))
@@ -2,6 +2,11 @@
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
 from .sim_manager import SimManager
+from .engine import StepEngine
+from .role_q import batched_greedy
+from .policy import load_or_compile
+from .agents import QTable
+from .config import POLICY_PATH, QTABLE_PATH, SERVE_DROP_Q
 import asyncio
 import numpy as np
 
@@ -31,10 +36,23 @@ if sim.load_qs():
 else:
     print("⚠️ No se encontraron Q-Tables guardadas. Iniciando desde cero.")
 
+# Política greedy compilada para servir: un índice uint8 por agente y tick
+try:
+    serve_policy = load_or_compile(sim.agents, POLICY_PATH, QTABLE_PATH).batch
+    if SERVE_DROP_Q:
+        # /ws solo sirve: las Q-tables float ya no hacen falta en este proceso
+        for a in sim.agents:
+            a.Q = QTable()
+    print("✅ Política compilada lista para servir.")
+except ValueError:
+    serve_policy = batched_greedy  # Q aproximada (tiles): argmax sobre los pesos
+
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
     await websocket.accept()
-    print("🔌 Unity Conectado")
+    # ?binary=1 → el grid se envía como bytes crudos (uint8) en un frame aparte
+    binary = websocket.query_params.get('binary') == '1'
+    print(f"🔌 Unity Conectado{' (grid binario)' if binary else ''}")
 
     try:
         # Inicializar ambiente si no hay agentes
@@ -42,6 +60,7 @@ async def websocket_endpoint(websocket: WebSocket):
             sim.env.reset()
             print("🌱 Ambiente inicializado")
 
+        engine = StepEngine(sim.env, sim.agents, batch_policy=serve_policy, grow_crops=True)
         step_count = 0
         episode_step = 0
         max_steps_per_episode = 500  # Reiniciar cada 500 pasos
@@ -49,46 +68,11 @@ async def websocket_endpoint(websocket: WebSocket):
         while True:
             try:
                 with sim.lock:
-                    # 1. Obtener observaciones
-                    obs_list = sim.env._get_obs()
-                    actions = {}
-
-                    # 2. Cada agente elige acción usando Q-table
-                    for i, agent in enumerate(sim.agents):
-                        state = agent.obs_to_state(obs_list[i])
-                        action_idx = agent.choose_action(state, training=False)
-                        
-                        # Mapear acción a movimiento
-                        move_map = {0: (0,0), 1: (1,0), 2: (-1,0), 3: (0,1), 4: (0,-1)}
-                        actions[i] = move_map.get(action_idx, (0,0))
-
-                    # 3. Proponer movimientos
-                    proposals = sim.env.step(sim.agents, actions_by_q=actions)
-                    
-                    # 4. Resolver colisiones
-                    counts = {}
-                    for p in proposals: 
-                        counts[p] = counts.get(p, 0) + 1
-                    
-                    finals = []
-                    for i, p in enumerate(proposals):
-                        if counts[p] > 1: 
-                            finals.append(sim.agents[i].pos)  # No mover si colisiona
-                        else: 
-                            finals.append(p)
-                    
-                    # 5. Aplicar movimientos finales y cosechar
-                    sim.env.apply_final_positions_and_harvest(sim.agents, finals)
-                    
-                    # 6. CRUCIAL: Actualizar ciclo de vida de cultivos
-                    sim.env.update_crops()
-                    
-                    # 7. Verificar y reabastecer combustible
-                    for agent in sim.agents:
-                        if agent.is_fuel_low() and agent.pos == (0, 0):
-                            agent.refuel()
+                    # 1. Tick completo: observar, planificar, proponer, resolver
+                    # colisiones, aplicar (cosecha + recarga en granero) y crecer cultivos
+                    engine.step()
                     
-                    # 8. Reiniciar episodio si se completó
+                    # 2. Reiniciar episodio si se completó
                     episode_step += 1
                     if episode_step >= max_steps_per_episode:
                         print(f"🔄 Episodio completado ({max_steps_per_episode} pasos), reiniciando...")
@@ -100,21 +84,23 @@ async def websocket_endpoint(websocket: WebSocket):
                 import traceback
                 traceback.print_exc()
                 
-            # 9. Obtener estado actualizado
-            raw_state = sim.get_state()
+            # 3. Obtener estado actualizado
+            raw_state = sim.get_state(include_grid=not binary)
             clean_state = convert_numpy_types(raw_state)
 
-            # 10. Log periódico
+            # 4. Log periódico
             step_count += 1
             if step_count % 50 == 0:
                 print(f"📊 Frame {step_count} | Episodio paso {episode_step}")
-                print(f"   Cultivos: {sum(1 for r in sim.env.grid for c in r if c == 2)}")
+                print(f"   Cultivos: {sim.env.state.count('grid', 2)}")
                 print(f"   Fuel promedio: {sum(a.current_fuel for a in sim.agents)/len(sim.agents):.1f}")
             
-            # 11. Enviar a Unity
+            # 5. Enviar a Unity
             await websocket.send_json(clean_state)
+            if binary:
+                await websocket.send_bytes(sim.env.state.layer_bytes('grid').tobytes())
             
-            # 12. Control de velocidad
+            # 6. Control de velocidad
             await asyncio.sleep(0.1)  # 10 FPS
 
     except WebSocketDisconnect:
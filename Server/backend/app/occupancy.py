@@ -0,0 +1,84 @@
+# backend/app/occupancy.py
+import numpy as np
+
+
+class OccupancyGrid:
+    """
+    Ocupación persistente del campo en dos capas:
+      - static:  obstáculos fijos (se escribe en reset)
+      - dynamic: número de agentes en cada celda (se actualiza al moverse)
+
+    Ambas son bytearrays planos (índice y * w + x) que A* lee directamente,
+    con vistas numpy (h, w) para consultas vectorizadas. No se construye
+    ningún set por tick; la excepción "mi meta está ocupada" se resuelve en
+    la consulta (astar trata goal como libre), sin mutar las capas.
+    """
+
+    def __init__(self, w, h):
+        self.w = int(w)
+        self.h = int(h)
+        self.static_buf = bytearray(self.w * self.h)
+        self.dynamic_buf = bytearray(self.w * self.h)
+        self.static = np.frombuffer(self.static_buf, dtype=np.uint8).reshape(self.h, self.w)
+        self.dynamic = np.frombuffer(self.dynamic_buf, dtype=np.uint8).reshape(self.h, self.w)
+        self.agent_cells = {}   # índice de agente → celda registrada en dynamic
+
+    def clear(self):
+        self.static.fill(0)
+        self.dynamic.fill(0)
+        self.agent_cells.clear()
+
+    def set_static(self, cells):
+        self.static.fill(0)
+        for x, y in cells:
+            self.static_buf[y * self.w + x] = 1
+
+    def __contains__(self, pos):
+        """Obstáculo fijo en pos (equivale al antiguo set de obstáculos)"""
+        x, y = pos
+        return 0 <= x < self.w and 0 <= y < self.h and self.static_buf[y * self.w + x] != 0
+
+    def is_blocked(self, pos, goal=None):
+        if pos == goal:
+            return False
+        idx = pos[1] * self.w + pos[0]
+        return self.static_buf[idx] != 0 or self.dynamic_buf[idx] != 0
+
+    # ---------- Capa dinámica (agentes) ----------
+
+    def place_agent(self, index, pos):
+        old = self.agent_cells.get(index)
+        if old == pos:
+            return
+        if old is not None:
+            idx = old[1] * self.w + old[0]
+            if self.dynamic_buf[idx]:
+                self.dynamic_buf[idx] -= 1
+        idx = pos[1] * self.w + pos[0]
+        if self.dynamic_buf[idx] < 255:
+            self.dynamic_buf[idx] += 1
+        self.agent_cells[index] = pos
+
+    def sync_agents(self, agents, indices=None):
+        """Registra las posiciones actuales de los agentes (solo mueve las que cambiaron)"""
+        if indices is None:
+            indices = range(len(agents))
+        for i in indices:
+            self.place_agent(i, agents[i].pos)
+
+    def copy(self):
+        clone = OccupancyGrid(self.w, self.h)
+        clone.static_buf[:] = self.static_buf
+        clone.dynamic_buf[:] = self.dynamic_buf
+        clone.agent_cells = dict(self.agent_cells)
+        return clone
+
+    def __getstate__(self):
+        return {'w': self.w, 'h': self.h, 'static': bytes(self.static_buf),
+                'dynamic': bytes(self.dynamic_buf), 'agent_cells': dict(self.agent_cells)}
+
+    def __setstate__(self, state):
+        self.__init__(state['w'], state['h'])
+        self.static_buf[:] = state['static']
+        self.dynamic_buf[:] = state['dynamic']
+        self.agent_cells = state['agent_cells']
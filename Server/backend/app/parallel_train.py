@@ -0,0 +1,200 @@
+# backend/app/parallel_train.py
+import os
+import random
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .agents import FarmAgent, QTable
+from .env import MultiFieldEnv
+from .engine import StepEngine, q_learn
+
+
+def env_kwargs_for(env):
+    """Argumentos para recrear env en otro proceso"""
+    return {'w': env.w, 'h': env.h, 'parcels': env.parcels,
+            'crop_count': env.initial_crop_count, 'obst_count': env.obst_count,
+            'roles': list(env.agent_roles)}
+
+
+def fleet_specs(agents, with_q=True):
+    """Descripción serializable de la flota (con o sin Q-tables)"""
+    return [{'role': a.role, 'barn_pos': a.barn_pos, 'alpha': a.alpha,
+             'gamma': a.gamma, 'eps': a.eps, 'capacity': a.max_capacity,
+             'fuel': a.max_fuel, 'Q': dict(a.Q) if with_q else {}} for a in agents]
+
+
+def build_fleet(env, specs):
+    agents = []
+    for i, spec in enumerate(specs):
+        a = FarmAgent(i, env.agents_init[i], role=spec['role'], barn_pos=spec['barn_pos'],
+                      alpha=spec['alpha'], gamma=spec['gamma'], eps=spec['eps'],
+                      capacity=spec['capacity'], fuel=spec['fuel'])
+        q = spec['Q']
+        a.Q = q if getattr(q, 'approximate', False) else QTable(q, max_states=a.Q.max_states)
+        agents.append(a)
+    return agents
+
+
+def reset_fleet(env, agents, eps):
+    """
+    Agentes a su posición inicial con carga y combustible de inicio de
+    episodio (cosechadores vacíos, como al crearlos). Reset común de
+    SimManager.train_background, train_shard y los actores.
+    """
+    for i, a in enumerate(agents):
+        a.pos = env.agents_init[i]
+        a.harvested = a.planted = a.irrigated = 0
+        a.current_capacity = a.max_capacity if a.role != 'harvester' else 0
+        a.current_fuel = a.max_fuel
+        a.is_returning_to_barn = False
+        a.recharge_counter = 0
+        a.path = []
+        a.set_eps(eps)
+
+
+def episode_stats(env, agents, reward, steps):
+    return {
+        'reward': round(reward, 2),
+        'harvested': env.harvested_total,
+        'planted': env.planted_total,
+        'irrigated': env.irrigated_total,
+        'task_complete': env.is_task_complete(),
+        'steps': steps,
+        'avg_epsilon': round(float(np.mean([a.eps for a in agents])), 4),
+        'total_states_learned': sum(len(a.Q) for a in agents)
+    }
+
+
+def train_shard(env_kwargs, specs, params, episodes, steps_per_episode, seed):
+    """
+    Trabajo de un proceso: episodios completos sobre su propio entorno y
+    copias de los agentes. Devuelve las Q-tables, las visitas de esta ronda
+    y las estadísticas de cada episodio.
+    """
+    random.seed(seed)
+    np.random.seed(seed)
+    env = MultiFieldEnv(**env_kwargs)
+    agents = build_fleet(env, specs)
+    engine = StepEngine(env, agents, learn_fn=q_learn, eps_decay=params['eps_decay'])
+
+    stats = []
+    for _ in range(episodes):
+        env.reset()
+        reset_fleet(env, agents, params['eps'])
+
+        reward = 0.0
+        step = 0
+        for step in range(steps_per_episode):
+            result = engine.step()
+            reward += sum(result.rewards)
+            if result.done:
+                break
+        stats.append(episode_stats(env, agents, reward, step + 1))
+
+    return {
+        'Q': [dict(a.Q) for a in agents],
+        'visits': [dict(a.visits) for a in agents],
+        'stats': stats
+    }
+
+
+def merge_role_tables(roles, tables, visits):
+    """
+    Fusión por rol ponderada por visitas: para cada estado,
+    Q = sum(v_k * Q_k) / sum(v_k) sobre todas las tablas del rol que lo
+    visitaron en la ronda. Devuelve {rol: (Q, visitas)}.
+    """
+    merged = {}
+    for role in set(roles):
+        acc = {}
+        weight = defaultdict(int)
+        for r, q, v in zip(roles, tables, visits):
+            if r != role:
+                continue
+            for s, n in v.items():
+                if s in acc:
+                    acc[s] += n * q[s]
+                else:
+                    acc[s] = n * q[s]
+                weight[s] += n
+        merged[role] = ({s: acc[s] / weight[s] for s in acc}, weight)
+    return merged
+
+
+class ParallelTrainer:
+    """
+    Entrenamiento multiproceso: reparte los episodios de cada ronda entre
+    `workers` procesos (cada uno con su MultiFieldEnv y copias de los
+    agentes) y al final de la ronda fusiona las Q-tables por rol en
+    sim.agents. Los estados no visitados en la ronda conservan su valor.
+    """
+
+    def __init__(self, sim, workers=None, episodes_per_shard=5):
+        self.sim = sim
+        self.workers = workers or os.cpu_count()
+        self.episodes_per_shard = episodes_per_shard
+        self.episodes_per_sec = 0.0
+
+    def _merge(self, shard_results):
+        agents = self.sim.agents
+        roles, tables, visits = [], [], []
+        for res in shard_results:
+            for a, q, v in zip(agents, res['Q'], res['visits']):
+                roles.append(a.role)
+                tables.append(q)
+                visits.append(v)
+        merged = merge_role_tables(roles, tables, visits)
+        with self.sim.lock:
+            applied = set()
+            for a in agents:
+                if id(a.Q) in applied:
+                    continue  # tabla compartida: las visitas de la ronda se suman una sola vez
+                applied.add(id(a.Q))
+                q, v = merged[a.role]
+                for s, values in q.items():
+                    a.Q.mark(s)
+                    a.Q[s] = values.copy()
+                for s, n in v.items():
+                    a.Q.touch(s, n)
+                a.Q.maybe_prune()
+
+    def train(self, episodes=50, steps_per_episode=1000):
+        sim = self.sim
+        params = dict(sim.params)
+        env_kwargs = env_kwargs_for(sim.env)
+        done_eps = 0
+        t0 = time.perf_counter()
+        print(f"ENTRENAMIENTO PARALELO: {episodes} episodios en {self.workers} procesos")
+
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            while done_eps < episodes and sim.running:
+                remaining = episodes - done_eps
+                shards = []
+                while remaining > 0 and len(shards) < self.workers:
+                    n = min(self.episodes_per_shard, remaining)
+                    shards.append(n)
+                    remaining -= n
+
+                specs = fleet_specs(sim.agents)
+                futures = [pool.submit(train_shard, env_kwargs, specs, params, n,
+                                       steps_per_episode, random.randrange(2 ** 31))
+                           for n in shards]
+                results = [f.result() for f in futures]
+                self._merge(results)
+
+                for res in results:
+                    for ep in res['stats']:
+                        done_eps += 1
+                        ep['episode'] = len(sim.train_stats['episodes']) + 1
+                        sim.train_stats['episodes'].append(ep)
+                        if ep['reward'] > sim.train_stats['best_reward']:
+                            sim.train_stats['best_reward'] = ep['reward']
+                            sim.train_stats['best_episode'] = ep['episode']
+
+                self.episodes_per_sec = done_eps / (time.perf_counter() - t0)
+                print(f"  {done_eps}/{episodes} episodios | {self.episodes_per_sec:.2f} ep/s")
+
+        return {'episodes': done_eps, 'episodes_per_sec': round(self.episodes_per_sec, 3)}
@@ -0,0 +1,132 @@
+# backend/app/planning.py
+import heapq
+from collections import defaultdict
+
+
+class _TableModel:
+    """Modelo tabular aprendido para una Q-table: última transición vista por (s, a)"""
+    __slots__ = ('Q', 'alpha', 'gamma', 'model', 'predecessors', 'queue', 'priority')
+
+    def __init__(self, agent):
+        self.Q = agent.Q
+        self.alpha = agent.alpha
+        self.gamma = agent.gamma
+        self.model = {}                        # (s, a) → (r, s2, done), del más antiguo al más reciente
+        self.predecessors = defaultdict(set)   # s2 → {(s, a)}
+        self.queue = []                        # heap de (-prioridad, s, a); entradas viejas se saltan
+        self.priority = {}                     # (s, a) → prioridad vigente en la cola
+
+    def td_error(self, s, a, r, s2, done):
+        target = r if done else r + self.gamma * self.Q.row(s2).max()
+        return target - self.Q.row(s)[a]   # row(): no reinserta estados podados
+
+    def remember(self, s, a, r, s2, done, max_model):
+        """Guarda la transición como la más reciente; por encima de max_model olvida la más antigua"""
+        key = (s, a)
+        old = self.model.pop(key, None)
+        if old is not None and old[1] != s2:
+            self._unlink(key, old[1])
+        self.model[key] = (r, s2, done)
+        self.predecessors[s2].add(key)
+        while len(self.model) > max_model:
+            old_key = next(iter(self.model))
+            _, old_s2, _ = self.model.pop(old_key)
+            self._unlink(old_key, old_s2)
+            self.priority.pop(old_key, None)
+
+    def _unlink(self, key, s2):
+        preds = self.predecessors.get(s2)
+        if preds is not None:
+            preds.discard(key)
+            if not preds:
+                del self.predecessors[s2]
+
+
+class PrioritizedSweeping:
+    """
+    Dyna-Q con barrido priorizado para StepEngine.
+
+    Como learn_fn aplica la actualización real (update_q), guarda la
+    transición en el modelo de la Q-table del agente (compartido si la
+    tabla es de rol) y encola (s, a) si |TD| > theta. Como batch_learn hace
+    hasta `planning_steps` backups simulados por tabla, sacando primero los
+    de mayor error y encolando los predecesores del estado actualizado.
+    Los backups simulados no cuentan como visitas.
+
+    La cola guarda una sola prioridad por (s, a) (la mayor) y, al pasar de
+    max_queue, se queda con las PRUNE_TO * max_queue más altas. El modelo
+    guarda como mucho max_model transiciones (se olvidan las más antiguas).
+    """
+
+    PRUNE_TO = 0.9
+
+    def __init__(self, planning_steps=10, theta=1e-3, max_queue=50_000, max_model=200_000):
+        self.planning_steps = planning_steps
+        self.theta = theta
+        self.max_queue = max_queue
+        self.max_model = max_model
+        self.models = {}
+        self.backups = 0
+        self.dropped = 0
+
+    def _model_for(self, agent):
+        m = self.models.get(id(agent.Q))
+        if m is None or m.Q is not agent.Q:
+            m = self.models[id(agent.Q)] = _TableModel(agent)
+        return m
+
+    def _push(self, m, priority, s, a):
+        if priority <= self.theta:
+            return
+        key = (s, a)
+        current = m.priority.get(key)
+        if current is not None and current >= priority:
+            return
+        m.priority[key] = priority
+        heapq.heappush(m.queue, (-priority, s, a))
+        if len(m.priority) > self.max_queue or len(m.queue) > 2 * self.max_queue:
+            self._trim(m)
+
+    def _trim(self, m):
+        """Descarta las entradas viejas y las de menor prioridad (se quedan las PRUNE_TO más altas)"""
+        keep = int(self.max_queue * self.PRUNE_TO)
+        best = heapq.nlargest(keep, m.priority.items(), key=lambda kv: kv[1])
+        self.dropped += len(m.priority) - len(best)
+        m.priority = dict(best)
+        m.queue = [(-p, s, a) for (s, a), p in best]
+        heapq.heapify(m.queue)
+
+    def _pop(self, m):
+        """(s, a) de mayor prioridad vigente, o None si la cola se vacía"""
+        while m.queue:
+            neg, s, a = heapq.heappop(m.queue)
+            key = (s, a)
+            if m.priority.get(key) != -neg:
+                continue  # entrada superada por una prioridad mayor o ya descartada
+            del m.priority[key]
+            return key
+        return None
+
+    def __call__(self, agent, state, action, reward, next_state, done):
+        m = self._model_for(agent)
+        agent.update_q(state, action, reward, next_state, done)
+        m.remember(state, action, reward, next_state, done, self.max_model)
+        self._push(m, abs(m.td_error(state, action, reward, next_state, done)), state, action)
+
+    def learn(self):
+        for m in self.models.values():
+            Q = m.Q
+            for _ in range(self.planning_steps):
+                key = self._pop(m)
+                if key is None:
+                    break
+                s, a = key
+                if s not in Q or key not in m.model:
+                    continue  # podado de la Q-table: no se reintroduce con backups simulados
+                r, s2, done = m.model[key]
+                Q.mark(s)
+                Q[s][a] += m.alpha * m.td_error(s, a, r, s2, done)
+                self.backups += 1
+                for ps, pa in m.predecessors.get(s, ()):
+                    pr, _, pdone = m.model[(ps, pa)]
+                    self._push(m, abs(m.td_error(ps, pa, pr, s, pdone)), ps, pa)
@@ -0,0 +1,142 @@
+# backend/app/policy.py
+import os
+
+import numpy as np
+
+from .qstore import encode_state, encode_states, decode_states, N_STATES
+
+_fallback = None
+
+
+def fallback_actions():
+    """
+    Regla para estados que la Q-table nunca vio: avanzar hacia el objetivo
+    (primero en x, luego en y; quedarse si ya está encima). Se calcula una
+    vez para todo el espacio de estados y se comparte entre compilaciones.
+    """
+    global _fallback
+    if _fallback is None:
+        states = decode_states(np.arange(N_STATES))
+        dx, dy = states[:, 0], states[:, 1]
+        acts = np.zeros(N_STATES, dtype=np.uint8)
+        acts[dy < 0] = 4
+        acts[dy > 0] = 3
+        acts[dx < 0] = 2
+        acts[dx > 0] = 1
+        _fallback = acts
+    return _fallback
+
+
+class CompiledPolicy:
+    """
+    Política greedy congelada para servir: una tabla uint8 (n_tables,
+    N_STATES) con la acción argmax de cada estado codificado (qstore) y la
+    regla de fallback en los estados desconocidos. Un slot por Q-table
+    distinta (los agentes que comparten tabla de rol comparten slot);
+    slots[agent.id] es el slot de cada agente, tanto en __call__ como en
+    batch. Inferencia = un índice por agente; no necesita las Q-tables float.
+    """
+
+    def __init__(self, actions, slots, known=None):
+        self.actions = actions
+        self.slots = list(slots)
+        self.known = known if known is not None else [0] * len(actions)
+
+    @staticmethod
+    def slot_layout(agents):
+        """Slot de cada agente por id: agentes con la misma Q-table, mismo slot"""
+        slot_of = {}
+        slots = [0] * len(agents)
+        for ag in sorted(agents, key=lambda a: a.id):
+            slots[ag.id] = slot_of.setdefault(id(ag.Q), len(slot_of))
+        return slots
+
+    @classmethod
+    def compile(cls, agents):
+        """Q-tables tabulares de los agentes → CompiledPolicy (ValueError con Q aproximada)"""
+        if any(ag.Q.approximate for ag in agents):
+            raise ValueError("Solo se compilan Q-tables tabulares")
+        slots = cls.slot_layout(agents)
+        n_tables = max(slots) + 1 if slots else 0
+        actions = np.empty((n_tables, N_STATES), dtype=np.uint8)
+        actions[:] = fallback_actions()
+        known = [0] * n_tables
+        done = set()
+        for ag in agents:
+            slot = slots[ag.id]
+            if slot in done:
+                continue
+            done.add(slot)
+            idx, best = [], []
+            for state, q in ag.Q.items():
+                try:
+                    idx.append(encode_state(state))
+                except (TypeError, ValueError):
+                    continue
+                best.append(int(np.argmax(q)))
+            actions[slot, idx] = best
+            known[slot] = len(idx)
+        return cls(actions, slots, known)
+
+    def save(self, path):
+        # np.savez añade .npz si falta: se escribe con el handle para respetar la ruta
+        with open(path, 'wb') as f:
+            np.savez_compressed(f, actions=self.actions, slots=np.asarray(self.slots),
+                                known=np.asarray(self.known))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(data['actions'], data['slots'].tolist(), data['known'].tolist())
+
+    def __call__(self, agent, state):
+        """policy de StepEngine"""
+        try:
+            return int(self.actions[self.slots[agent.id], encode_state(state)])
+        except ValueError:
+            return 0  # estado fuera del espacio codificado: quedarse
+
+    def batch(self, agents, states):
+        """
+        batch_policy de StepEngine: los agentes con ruta A* la siguen (como
+        batched_greedy); el resto, un único índice vectorizado.
+        """
+        actions = {}
+        pending = []
+        for i, s in states.items():
+            ag = agents[i]
+            if ag.path:
+                actions[i] = ag.choose_action(s, training=False)
+            else:
+                ag.steps_taken += 1
+                pending.append(i)
+        if pending:
+            slots = np.fromiter((self.slots[agents[i].id] for i in pending), dtype=np.int64,
+                                count=len(pending))
+            codes = encode_states([states[i] for i in pending])
+            for i, a in zip(pending, self.actions[slots, codes]):
+                actions[i] = int(a)
+        return actions
+
+    def stats(self):
+        return {'tables': int(len(self.actions)), 'known_states': [int(k) for k in self.known],
+                'bytes': int(self.actions.nbytes)}
+
+
+def load_or_compile(agents, path, q_path=None):
+    """
+    Política compilada de `path` si existe, es más reciente que las Q-tables
+    guardadas (q_path) y tiene el mismo reparto de tablas por agente (p. ej.
+    no vale tras cambiar SHARED_ROLE_Q); si no, se compila de los agentes y
+    se guarda.
+    """
+    fresh = os.path.exists(path) and (
+        q_path is None or not os.path.exists(q_path) or
+        os.path.getmtime(path) >= os.path.getmtime(q_path))
+    if fresh:
+        policy = CompiledPolicy.load(path)
+        if policy.slots == CompiledPolicy.slot_layout(agents):
+            return policy
+    policy = CompiledPolicy.compile(agents)
+    policy.save(path)
+    return policy
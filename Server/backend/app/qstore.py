@@ -0,0 +1,126 @@
+# backend/app/qstore.py
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from .agents import ACTIONS
+
+# Rangos de cada componente del estado de FarmAgent.obs_to_state:
+# (dx, dy, occ, cap_level, barn_dist_q, fuel_level, returning)
+STATE_DIMS = (17, 17, 16, 5, 6, 5, 2)
+STATE_OFFSETS = (8, 8, 0, 0, 0, 0, 0)   # dx/dy van de -8 a 8
+N_STATES = int(np.prod(STATE_DIMS))
+N_ACTIONS = len(ACTIONS)
+
+_STRIDES = tuple(int(np.prod(STATE_DIMS[i + 1:])) for i in range(len(STATE_DIMS)))
+
+
+def encode_state(state):
+    """Tupla de estado → índice entero (mixed radix). ValueError si no encaja"""
+    if len(state) != len(STATE_DIMS):
+        raise ValueError(f"Estado con {len(state)} componentes: {state!r}")
+    idx = 0
+    for v, off, dim, stride in zip(state, STATE_OFFSETS, STATE_DIMS, _STRIDES):
+        v = int(v) + off
+        if not 0 <= v < dim:
+            raise ValueError(f"Componente fuera de rango en {state!r}")
+        idx += v * stride
+    return idx
+
+
+def encode_states(states):
+    """Array (n, 7) de estados → array (n,) de índices"""
+    states = np.asarray(states, dtype=np.int64) + np.asarray(STATE_OFFSETS)
+    return states @ np.asarray(_STRIDES, dtype=np.int64)
+
+
+def decode_state(idx):
+    out = []
+    for off, dim, stride in zip(STATE_OFFSETS, STATE_DIMS, _STRIDES):
+        out.append(int(idx // stride) % dim - off)
+    return tuple(out)
+
+
+def decode_states(idx):
+    """Array (n,) de índices → array (n, 7) de estados"""
+    idx = np.asarray(idx, dtype=np.int64)[:, None]
+    return (idx // np.asarray(_STRIDES)) % np.asarray(STATE_DIMS) - np.asarray(STATE_OFFSETS)
+
+
+class DenseQTable:
+    """
+    Q-tables densas (n_tables, N_STATES, N_ACTIONS) float32 más un contador de
+    visitas por estado, sobre un bloque de multiprocessing.shared_memory para
+    que varios procesos las lean sin copiarlas. Cabecera de 64 bytes con la
+    versión publicada (int64) que sube el escritor tras cada lote.
+
+    Con name=None se crea el bloque; con name se adjunta a uno existente;
+    con shared=False las tablas viven en memoria normal del proceso.
+    """
+
+    HEADER = 64
+
+    def __init__(self, n_tables, name=None, shared=True):
+        self.n_tables = int(n_tables)
+        q_bytes = self.n_tables * N_STATES * N_ACTIONS * 4
+        v_bytes = self.n_tables * N_STATES * 4
+        size = self.HEADER + q_bytes + v_bytes
+        self.owner = name is None
+        if not shared:
+            self.shm = None  # Tablas locales del proceso (mismo layout)
+            buf = bytearray(size)
+        elif self.owner:
+            self.shm = shared_memory.SharedMemory(create=True, size=size)
+            buf = self.shm.buf
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+            buf = self.shm.buf
+        self._version = np.ndarray((1,), dtype=np.int64, buffer=buf, offset=0)
+        self.q = np.ndarray((self.n_tables, N_STATES, N_ACTIONS), dtype=np.float32,
+                            buffer=buf, offset=self.HEADER)
+        self.visits = np.ndarray((self.n_tables, N_STATES), dtype=np.uint32,
+                                 buffer=buf, offset=self.HEADER + q_bytes)
+        if self.owner:
+            self._version[0] = 0
+            self.q.fill(0)
+            self.visits.fill(0)
+
+    @property
+    def name(self):
+        return self.shm.name if self.shm is not None else None
+
+    @property
+    def version(self):
+        return int(self._version[0])
+
+    def publish(self):
+        self._version[0] += 1
+
+    def close(self):
+        # Soltar las vistas antes de cerrar el bloque
+        del self._version, self.q, self.visits
+        if self.shm is None:
+            return
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+    # ---------- Conversión con las Q-tables dict de FarmAgent ----------
+
+    def load_dict(self, slot, Q, visits=None):
+        """Copia un dict {estado: q} en la tabla slot (ignora estados que no encajan)"""
+        for state, values in Q.items():
+            try:
+                idx = encode_state(state)
+            except (TypeError, ValueError):
+                continue
+            self.q[slot, idx] = values
+            if visits is not None and state in visits:
+                self.visits[slot, idx] = visits[state]
+
+    def to_dict(self, slot):
+        """Estados visitados o con algún valor distinto de 0 → {estado: q float64}"""
+        rows = np.flatnonzero((self.visits[slot] > 0) | np.any(self.q[slot] != 0, axis=1))
+        q = self.q[slot, rows].astype(np.float64)
+        return {decode_state(i): q[k] for k, i in enumerate(rows)}, \
+               {decode_state(i): int(self.visits[slot, i]) for i in rows}
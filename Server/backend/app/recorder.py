@@ -0,0 +1,242 @@
+# backend/app/recorder.py
+import os
+import queue
+import threading
+import zipfile
+
+import numpy as np
+
+from .chunked_state import ChunkedFarmState
+
+
+# Capas que se graban; el índice es el id de capa de la columna layer de cells
+TRACE_LAYERS = ('grid', 'water')
+
+
+class _CellDiff:
+    """
+    Celdas de las capas TRACE_LAYERS que cambiaron desde la última llamada
+    → array (k, 4) (capa, x, y, valor nuevo).
+
+    Grid denso: solo se comparan las celdas que el entorno escribió en el
+    tick (env.touched); tras un cambio fuera de los pasos (env.touched_all:
+    reset, nuevo ciclo, consumo de agua de los cultivos) se compara el mapa
+    entero. Grid por tiles: solo se comparan los tiles marcados como dirty.
+    """
+
+    def __init__(self, env):
+        self.env = env
+        self.state = env.state
+        self.chunked = isinstance(self.state, ChunkedFarmState)
+        self.reset()
+
+    def reset(self):
+        if self.chunked:
+            self.prev = {key: [t.state.layer(name).copy() for name in TRACE_LAYERS]
+                         for key, t in self.state.tiles.items()}
+            self.state.clear_dirty()
+        else:
+            self.prev = [self.state.layer(name).copy() for name in TRACE_LAYERS]
+        self.env.touched_all = False
+
+    @staticmethod
+    def _compare(layers, prev, ys, xs, x0=0, y0=0):
+        """Cambios en las celdas (ys, xs) (o en todas si ys es None); actualiza prev"""
+        out = []
+        for lid, (cur, old) in enumerate(zip(layers, prev)):
+            if ys is None:
+                cy, cx = np.nonzero(cur != old)
+            else:
+                changed = cur[ys, xs] != old[ys, xs]
+                cy, cx = ys[changed], xs[changed]
+            if len(cy):
+                vals = cur[cy, cx]
+                old[cy, cx] = vals
+                out.append(np.stack([np.full(len(cy), lid), cx + x0, cy + y0, vals], axis=1))
+        return out
+
+    def changes(self):
+        env = self.env
+        if not self.chunked:
+            layers = [self.state.layer(name) for name in TRACE_LAYERS]
+            if env.touched_all:
+                env.touched_all = False
+                out = self._compare(layers, self.prev, None, None)
+            elif env.touched:
+                pts = np.unique(np.asarray(env.touched, dtype=np.intp), axis=0)
+                out = self._compare(layers, self.prev, pts[:, 1], pts[:, 0])
+            else:
+                return None
+            return np.concatenate(out) if out else None
+        env.touched_all = False
+        out = []
+        for key in self.state.dirty_tiles():
+            t = self.state.tiles[key]
+            layers = [t.state.layer(name) for name in TRACE_LAYERS]
+            prev = self.prev.get(key)
+            if prev is None:
+                prev = self.prev[key] = [np.zeros_like(layer) for layer in layers]
+            out += self._compare(layers, prev, None, None, t.x0, t.y0)
+        self.state.clear_dirty()
+        return np.concatenate(out) if out else None
+
+
+class TrajectoryRecorder:
+    """
+    Grabación por tick para StepEngine (engine.recorder): posiciones,
+    acción tomada (-1 = agente dormido), reward por agente y celdas del grid
+    y del agua que cambiaron. Se escribe en chunks de tamaño fijo (chunk_steps ticks,
+    hasta max_cells celdas cambiadas) preasignados; un chunk lleno o el fin
+    de episodio se pasa a un hilo escritor que lo guarda como .npz
+    comprimido. La cola del escritor es acotada (max_pending chunks): si el
+    disco no da abasto, record() espera en vez de crecer en memoria. Si una
+    escritura falla, el escritor guarda el error y descarta los chunks
+    siguientes (stats() → error, dropped) sin bloquear la simulación.
+
+    Fichero por chunk: {prefix}_ep{episodio}_{chunk}.npz con step, pos
+    (T, n, 2), action (T, n), reward (T, n), done (T,), cells (k, 5) =
+    (step, capa, x, y, valor) con capa = índice en TRACE_LAYERS y, en el
+    primer chunk del episodio, grid0 y water0.
+    """
+
+    def __init__(self, out_dir, n_agents, chunk_steps=1024, max_cells=None,
+                 max_pending=4, prefix='trace'):
+        self.out_dir = out_dir
+        os.makedirs(out_dir, exist_ok=True)
+        self.n = int(n_agents)
+        self.chunk_steps = int(chunk_steps)
+        self.max_cells = int(max_cells) if max_cells else 4 * self.chunk_steps
+        self.prefix = prefix
+        self.step = np.zeros(self.chunk_steps, dtype=np.int64)
+        self.pos = np.zeros((self.chunk_steps, self.n, 2), dtype=np.int16)
+        self.action = np.zeros((self.chunk_steps, self.n), dtype=np.int8)
+        self.reward = np.zeros((self.chunk_steps, self.n), dtype=np.float32)
+        self.done = np.zeros(self.chunk_steps, dtype=bool)
+        self.cells = np.zeros((self.max_cells, 5), dtype=np.int32)
+        self.t = 0
+        self.n_cells = 0
+        self.episode = 0
+        self.chunk = 0
+        self.layers0 = None
+        self.diff = None
+        self.files = []
+        self.waits = 0
+        self.dropped = 0
+        self.error = None
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._writer = threading.Thread(target=self._write_loop, daemon=True)
+        self._writer.start()
+
+    # ---------- Hilo escritor ----------
+
+    def _write_loop(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            path, arrays = item
+            if self.error is not None:
+                self.dropped += 1   # tras un fallo se vacía la cola sin escribir
+                continue
+            tmp = path + '.tmp'
+            try:
+                # Mismo formato que np.savez_compressed, con deflate nivel 1 (más rápido)
+                with zipfile.ZipFile(tmp, 'w', zipfile.ZIP_DEFLATED, compresslevel=1) as zf:
+                    for name, arr in arrays.items():
+                        with zf.open(name + '.npy', 'w', force_zip64=True) as f:
+                            np.lib.format.write_array(f, np.asanyarray(arr), allow_pickle=False)
+                os.replace(tmp, path)
+            except Exception as e:
+                self.error = e
+                self.dropped += 1
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+                print(f"✗ Error escribiendo traza {path}: {e}")
+                continue
+            self.files.append(path)
+
+    # ---------- Grabación ----------
+
+    def begin_episode(self, episode, env):
+        self.flush()
+        self.episode = int(episode)
+        self.chunk = 0
+        self.diff = _CellDiff(env)
+        self.layers0 = {name + '0': np.asarray(getattr(env, name)).copy()
+                        for name in TRACE_LAYERS}
+
+    def record(self, tick, agents, taken, rewards, done):
+        t = self.t
+        self.step[t] = tick
+        self.pos[t] = [ag.pos for ag in agents]
+        action = self.action[t]
+        action.fill(-1)
+        if taken:
+            action[list(taken)] = list(taken.values())
+        self.reward[t] = rewards
+        self.done[t] = done
+        self.t = t + 1
+
+        if self.diff is not None:
+            cells = self.diff.changes()
+            if cells is not None:
+                k = len(cells)
+                if self.n_cells + k > self.max_cells:
+                    self.flush()
+                    k = min(k, self.max_cells)  # más cambios que un chunk entero: se truncan
+                    cells = cells[:k]
+                self.cells[self.n_cells:self.n_cells + k, 0] = tick
+                self.cells[self.n_cells:self.n_cells + k, 1:] = cells
+                self.n_cells += k
+        if self.t == self.chunk_steps:
+            self.flush()
+
+    def flush(self):
+        """
+        Pasa el chunk en curso (si tiene algo) al escritor y reutiliza los
+        buffers. Si el escritor ha fallado, el chunk se descarta (stats()
+        lleva el error) en vez de bloquear la simulación con la cola llena.
+        """
+        if self.t == 0 and self.n_cells == 0:
+            return
+        if self.error is not None or not self._writer.is_alive():
+            self.dropped += 1
+            self.t = 0
+            self.n_cells = 0
+            return
+        t, k = self.t, self.n_cells
+        arrays = {'episode': np.int64(self.episode), 'step': self.step[:t].copy(),
+                  'pos': self.pos[:t].copy(), 'action': self.action[:t].copy(),
+                  'reward': self.reward[:t].copy(), 'done': self.done[:t].copy(),
+                  'cells': self.cells[:k].copy()}
+        if self.chunk == 0 and self.layers0 is not None:
+            arrays.update(self.layers0)
+        path = os.path.join(self.out_dir, f"{self.prefix}_ep{self.episode:05d}_{self.chunk:04d}.npz")
+        if self._queue.full():
+            self.waits += 1
+        self._queue.put((path, arrays))
+        self.chunk += 1
+        self.t = 0
+        self.n_cells = 0
+
+    def close(self):
+        self.flush()
+        if self._writer.is_alive():
+            self._queue.put(None)
+            self._writer.join()
+
+    def stats(self):
+        return {'out_dir': self.out_dir, 'files': len(self.files), 'waits': self.waits,
+                'chunk_steps': self.chunk_steps, 'dropped': self.dropped,
+                'error': str(self.error) if self.error is not None else None}
+
+
+def load_trace(paths):
+    """Concatena los chunks de un episodio (lista de rutas ordenada) en un dict de arrays"""
+    chunks = [dict(np.load(p)) for p in sorted(paths)]
+    out = {key: np.concatenate([c[key] for c in chunks])
+           for key in ('step', 'pos', 'action', 'reward', 'done', 'cells')}
+    for name in TRACE_LAYERS:
+        if name + '0' in chunks[0]:
+            out[name + '0'] = chunks[0][name + '0']
+    return out
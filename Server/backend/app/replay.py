@@ -0,0 +1,228 @@
+# backend/app/replay.py
+
+import numpy as np
+
+from .qstore import N_ACTIONS
+
+
+class ReplayBuffer:
+    """
+    Buffer circular de capacidad fija con las transiciones (slot, s, a, r,
+    s2, done) como arrays NumPy. Con prioritized=True el muestreo es
+    proporcional a |TD|^priority_alpha (las nuevas entran con la prioridad
+    máxima vista para que se muestreen al menos una vez).
+    """
+
+    def __init__(self, capacity=100_000, prioritized=False, priority_alpha=0.6):
+        self.capacity = int(capacity)
+        self.prioritized = prioritized
+        self.priority_alpha = priority_alpha
+        self.slot = np.zeros(self.capacity, dtype=np.int32)
+        self.s = np.zeros(self.capacity, dtype=np.int64)
+        self.a = np.zeros(self.capacity, dtype=np.int32)
+        self.r = np.zeros(self.capacity, dtype=np.float32)
+        self.s2 = np.zeros(self.capacity, dtype=np.int64)
+        self.done = np.zeros(self.capacity, dtype=bool)
+        self.priority = np.zeros(self.capacity, dtype=np.float64)
+        self.max_priority = 1.0
+        self.head = 0
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def add(self, slot, s, a, r, s2, done):
+        i = self.head
+        self.slot[i] = slot
+        self.s[i] = s
+        self.a[i] = a
+        self.r[i] = r
+        self.s2[i] = s2
+        self.done[i] = done
+        self.priority[i] = self.max_priority
+        self.head = (i + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+    def add_batch(self, batch):
+        n = len(batch['s'])
+        idx = (self.head + np.arange(n)) % self.capacity
+        for field in ('slot', 's', 'a', 'r', 's2', 'done'):
+            getattr(self, field)[idx] = batch[field]
+        self.priority[idx] = self.max_priority
+        self.head = int((self.head + n) % self.capacity)
+        self.size = min(self.size + n, self.capacity)
+
+    def sample(self, n, rng=np.random):
+        """Índices de una muestra de n transiciones"""
+        if self.prioritized:
+            p = self.priority[:self.size] ** self.priority_alpha
+            return rng.choice(self.size, size=n, p=p / p.sum())
+        return rng.randint(0, self.size, size=n)
+
+    def batch(self, idx):
+        return {'slot': self.slot[idx], 's': self.s[idx], 'a': self.a[idx],
+                'r': self.r[idx], 's2': self.s2[idx], 'done': self.done[idx]}
+
+    def update_priorities(self, idx, td):
+        pr = np.abs(td) + 1e-3
+        self.priority[idx] = pr
+        self.max_priority = max(self.max_priority, float(pr.max()))
+
+
+def td_update_rows(q, visits, slot, s, a, r, s2, done, alpha, gamma):
+    """
+    Actualizaciones TD tabulares de un lote sobre q (n_filas, N_ACTIONS),
+    con s/s2 índices de fila. Los objetivos se calculan con la Q anterior
+    al lote; las transiciones que repiten (s, a) se promedian y se suman
+    con un scatter (bincount con pesos). alpha/gamma son arrays por slot.
+    Devuelve el error TD de cada transición.
+    """
+    q_next = q[s2].max(axis=1)
+    target = r + np.where(done, 0.0, gamma[slot] * q_next)
+    td = target - q[s, a]
+
+    flat = q.reshape(-1)
+    key = s.astype(np.int64) * N_ACTIONS + a
+    uniq, inverse = np.unique(key, return_inverse=True)
+    step = np.bincount(inverse, weights=alpha[slot] * td)
+    count = np.bincount(inverse)
+    flat[uniq] += (step / count).astype(flat.dtype)
+
+    np.add.at(visits, s, 1)
+    return td
+
+
+def td_update_batch(q, visits, batch, alpha, gamma):
+    """
+    td_update_rows sobre las tablas densas q (n_tables, N_STATES, N_ACTIONS)
+    y visits (n_tables, N_STATES): (slot, estado codificado) → fila plana.
+    """
+    n_states = q.shape[1]
+    slot = batch['slot'].astype(np.int64)
+    return td_update_rows(q.reshape(-1, q.shape[2]), visits.reshape(-1), slot,
+                          slot * n_states + batch['s'], batch['a'], batch['r'],
+                          slot * n_states + batch['s2'], batch['done'], alpha, gamma)
+
+
+class ReplayLearner:
+    """
+    Aprendizaje por lotes para StepEngine: como learn_fn guarda cada
+    transición en el buffer del rol del agente; como batch_learn aplica
+    `updates_per_tick` lotes de `batch_size` por rol sobre una tabla local
+    compacta: una fila por (Q-table, estado) visto, asignada al vuelo (los
+    agentes que comparten tabla comparten filas). sync_to_agents() vuelca a
+    las QTable de los agentes solo las filas actualizadas desde el último
+    volcado, sobre las mismas tablas (conservan visitas y antigüedad LRU).
+
+    La tabla compacta no crece sin límite: tras un volcado en el que las
+    QTable podan estados, o cuando dobla su tamaño desde la última
+    compactación, se quitan las filas de estados que ya no están en su
+    QTable ni en ninguna transición de los buffers, y se renumeran las filas
+    de los buffers.
+    """
+
+    def __init__(self, agents, capacity=100_000, batch_size=256, updates_per_tick=1,
+                 prioritized=False, min_size=None, initial_rows=4096):
+        self.agents = agents
+        self.batch_size = batch_size
+        self.updates_per_tick = updates_per_tick
+        self.min_size = batch_size if min_size is None else min_size
+        slot_of = {}
+        self.slots = [slot_of.setdefault(id(ag.Q), len(slot_of)) for ag in agents]
+        owners = {}
+        for ag, slot in zip(agents, self.slots):
+            owners.setdefault(slot, ag)
+        self.tables = [owners[k].Q for k in range(len(owners))]
+        self.alpha = np.array([owners[k].alpha for k in range(len(owners))], dtype=np.float32)
+        self.gamma = np.array([owners[k].gamma for k in range(len(owners))], dtype=np.float32)
+
+        self.initial_rows = int(initial_rows)
+        self.q = np.zeros((initial_rows, N_ACTIONS), dtype=np.float32)
+        self.visits = np.zeros(initial_rows, dtype=np.uint32)   # actualizaciones sin volcar
+        self.row_of = [{} for _ in self.tables]                 # por slot: estado → fila
+        self.row_key = []                                       # fila → (slot, estado)
+        for slot, Q in enumerate(self.tables):
+            for state, values in Q.items():
+                self.q[self._row(slot, state)] = values
+
+        self.buffers = {role: ReplayBuffer(capacity, prioritized=prioritized)
+                        for role in {ag.role for ag in agents}}
+        self.updates = 0
+        self.compact_at = 2 * max(len(self.row_key), self.initial_rows)
+        self.compactions = 0
+
+    def _row(self, slot, state):
+        row = self.row_of[slot].get(state)
+        if row is None:
+            row = self.row_of[slot][state] = len(self.row_key)
+            self.row_key.append((slot, state))
+            if row == len(self.q):
+                # Crecimiento por duplicación: la memoria sigue a los estados vistos
+                self.q = np.concatenate([self.q, np.zeros_like(self.q)])
+                self.visits = np.concatenate([self.visits, np.zeros_like(self.visits)])
+        return row
+
+    def __call__(self, agent, state, action, reward, next_state, done):
+        slot = self.slots[agent.id]
+        self.buffers[agent.role].add(slot, self._row(slot, state), action, reward,
+                                     self._row(slot, next_state), done)
+
+    def learn(self):
+        for buf in self.buffers.values():
+            if len(buf) < self.min_size:
+                continue
+            for _ in range(self.updates_per_tick):
+                idx = buf.sample(self.batch_size)
+                b = buf.batch(idx)
+                td = td_update_rows(self.q, self.visits, b['slot'], b['s'], b['a'], b['r'],
+                                    b['s2'], b['done'], self.alpha, self.gamma)
+                if buf.prioritized:
+                    buf.update_priorities(idx, td)
+                self.updates += len(idx)
+
+    def sync_to_agents(self):
+        """Vuelca las filas actualizadas desde el último volcado; devuelve cuántas"""
+        rows = np.flatnonzero(self.visits[:len(self.row_key)])
+        for row in rows:
+            slot, state = self.row_key[row]
+            Q = self.tables[slot]
+            Q.mark(state)
+            Q[state] = self.q[row].astype(np.float64)
+            Q.touch(state, int(self.visits[row]))
+        self.visits[rows] = 0
+        evicted = sum(Q.maybe_prune() for Q in self.tables)
+        if evicted or len(self.row_key) >= self.compact_at:
+            self.compact()
+        return len(rows)
+
+    def compact(self):
+        """
+        Quita las filas sin estado vivo (ni en su QTable ni en los buffers)
+        y renumera las de los buffers. Devuelve cuántas filas se quitaron.
+        """
+        n = len(self.row_key)
+        keep = np.fromiter((state in self.tables[slot] for slot, state in self.row_key),
+                           dtype=bool, count=n)
+        for buf in self.buffers.values():
+            keep[buf.s[:buf.size]] = True
+            keep[buf.s2[:buf.size]] = True
+        rows = np.flatnonzero(keep)
+        dropped = n - len(rows)
+        if dropped:
+            new_row = np.cumsum(keep) - 1
+            for buf in self.buffers.values():
+                buf.s[:buf.size] = new_row[buf.s[:buf.size]]
+                buf.s2[:buf.size] = new_row[buf.s2[:buf.size]]
+            size = max(self.initial_rows, len(rows))
+            q = np.zeros((size, N_ACTIONS), dtype=np.float32)
+            q[:len(rows)] = self.q[rows]
+            visits = np.zeros(size, dtype=np.uint32)
+            visits[:len(rows)] = self.visits[rows]
+            self.q, self.visits = q, visits
+            self.row_key = [self.row_key[r] for r in rows]
+            self.row_of = [{} for _ in self.tables]
+            for row, (slot, state) in enumerate(self.row_key):
+                self.row_of[slot][state] = row
+            self.compactions += 1
+        self.compact_at = 2 * max(len(self.row_key), self.initial_rows)
+        return dropped
@@ -0,0 +1,151 @@
+# backend/app/role_q.py
+import random
+
+import numpy as np
+
+from .agents import QTable, ACTIONS
+from .parallel_train import merge_role_tables
+
+
+def share_role_q(agents):
+    """
+    Una Q-table por rol compartida por todos los agentes del rol. Las tablas
+    que ya tuvieran se fusionan ponderando por visitas (los estados sin
+    visitas registradas cuentan como 1); con Q aproximada (TileQ) se
+    promedian los pesos. Devuelve {rol: Q}.
+    """
+    if any(a.Q.approximate for a in agents):
+        return _share_role_tiles(agents)
+    roles = [a.role for a in agents]
+    visits = [{s: a.visits.get(s, 0) or 1 for s in a.Q} for a in agents]
+    merged = merge_role_tables(roles, [a.Q for a in agents], visits)
+    shared = {}
+    for a in agents:
+        if a.role not in shared:
+            q, v = merged[a.role]
+            shared[a.role] = QTable(q, v, max_states=a.Q.max_states)
+        a.Q = shared[a.role]
+    return shared
+
+
+def _share_role_tiles(agents):
+    by_role = {}
+    for a in agents:
+        by_role.setdefault(a.role, []).append(a)
+    shared = {}
+    for role, members in by_role.items():
+        q = members[0].Q.copy()
+        q.w[:] = np.mean([a.Q.w for a in members], axis=0)
+        q.touched[:] = np.any([a.Q.touched for a in members], axis=0)
+        for a in members:
+            a.Q = q
+        shared[role] = q
+    return shared
+
+
+def _groups(agents, indices):
+    """Índices agrupados por Q-table (los agentes que la comparten van juntos)"""
+    groups = {}
+    for i in indices:
+        groups.setdefault(id(agents[i].Q), []).append(i)
+    return groups.values()
+
+
+def batched_greedy(agents, states):
+    return batched_policy(agents, states, training=False)
+
+
+def batched_policy(agents, states, training=False):
+    """
+    choose_action para muchos agentes a la vez: los que siguen una ruta A*
+    la siguen; para el resto, una sola pila de filas Q por tabla compartida
+    y un argmax vectorizado. Estados desconocidos → acción aleatoria.
+    """
+    actions = {}
+    pending = []
+    for i, s in states.items():
+        ag = agents[i]
+        if ag.path:
+            actions[i] = ag.choose_action(s, training=training)
+        elif training and random.random() < ag.eps:
+            ag.steps_taken += 1
+            actions[i] = random.randrange(len(ACTIONS))
+        else:
+            pending.append(i)
+
+    for group in _groups(agents, pending):
+        Q = agents[group[0]].Q
+        known = [i for i in group if states[i] in Q]
+        for i in group:
+            if states[i] not in Q:
+                actions[i] = random.randrange(len(ACTIONS))
+        if known:
+            if Q.approximate:
+                rows = Q.rows([states[i] for i in known])
+            else:
+                rows = np.stack([Q[states[i]] for i in known])
+            for i, a in zip(known, rows.argmax(axis=1)):
+                actions[i] = int(a)
+        for i in group:
+            agents[i].steps_taken += 1
+    return actions
+
+
+class RoleBatchLearner:
+    """
+    Actualizaciones Q de un tick aplicadas juntas por tabla: como learn_fn
+    acumula las transiciones; como batch_learn calcula todos los objetivos
+    con la tabla anterior al tick y escribe las filas de una vez (si dos
+    agentes del rol actualizan el mismo (s, a), se promedia). Con TileQ el
+    lote de la tabla va en un solo update_batch.
+    """
+
+    def __init__(self, agents):
+        self.agents = agents
+        self.pending = []
+
+    def __call__(self, agent, state, action, reward, next_state, done):
+        self.pending.append((agent.id, state, action, reward, next_state, done))
+
+    def learn(self):
+        if not self.pending:
+            return
+        by_table = {}
+        for t in self.pending:
+            by_table.setdefault(id(self.agents[t[0]].Q), []).append(t)
+        self.pending = []
+
+        for batch in by_table.values():
+            ag = self.agents[batch[0][0]]
+            Q = ag.Q
+            if Q.approximate:
+                self._learn_tiles(ag, batch)
+                continue
+            s_rows = np.stack([Q[t[1]] for t in batch])
+            s2_max = np.array([Q.row(t[4]).max() for t in batch])
+            actions = np.fromiter((t[2] for t in batch), dtype=np.int64, count=len(batch))
+            rewards = np.fromiter((t[3] for t in batch), dtype=np.float64, count=len(batch))
+            done = np.fromiter((t[5] for t in batch), dtype=bool, count=len(batch))
+            target = rewards + np.where(done, 0.0, ag.gamma * s2_max)
+            delta = ag.alpha * (target - s_rows[np.arange(len(batch)), actions])
+
+            updates = {}
+            for t, d in zip(batch, delta):
+                key = (t[1], t[2])
+                total, n = updates.get(key, (0.0, 0))
+                updates[key] = (total + d, n + 1)
+            for (s, a), (total, n) in updates.items():
+                Q.mark(s)
+                Q[s][a] += total / n
+                Q.touch(s, n)
+            Q.maybe_prune(keep={t[1] for t in batch})
+
+    @staticmethod
+    def _learn_tiles(ag, batch):
+        """Lote del tick sobre una TileQ: objetivos y gradientes vectorizados"""
+        Q = ag.Q
+        s2_max = Q.rows([t[4] for t in batch]).max(axis=1)
+        rewards = np.fromiter((t[3] for t in batch), dtype=np.float64, count=len(batch))
+        done = np.fromiter((t[5] for t in batch), dtype=bool, count=len(batch))
+        target = rewards + np.where(done, 0.0, ag.gamma * s2_max)
+        Q.update_batch([t[1] for t in batch], [t[2] for t in batch], target, ag.alpha)
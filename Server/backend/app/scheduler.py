@@ -0,0 +1,79 @@
+# backend/app/scheduler.py
+
+# Fase del ciclo en la que cada rol tiene trabajo
+ROLE_PHASES = {
+    'planter': 'planting',
+    'irrigator': 'irrigating',
+    'harvester': 'harvesting'
+}
+
+
+class AgentScheduler:
+    """
+    Planificador de agentes activos.
+
+    Un agente se duerme cuando está aparcado en su granero sin trabajo posible
+    (fase que no es la suya, combustible lleno y carga lista). Mientras duerme
+    no se le calcula objetivo, ruta ni recompensa: su propuesta es quedarse
+    quieto. Se despierta al empezar la fase de su rol o con wake() cuando
+    alguien cambia su combustible/carga desde fuera.
+    """
+
+    def __init__(self):
+        self.sleeping = set()   # índices en la lista de agentes
+        self.phase = None
+        self._awake = None
+
+    def reset(self):
+        self.sleeping.clear()
+        self.phase = None
+        self._awake = None
+
+    def copy(self):
+        clone = AgentScheduler()
+        clone.sleeping = set(self.sleeping)
+        clone.phase = self.phase
+        return clone
+
+    def wake(self, index):
+        if index in self.sleeping:
+            self.sleeping.discard(index)
+            self._awake = None
+
+    def wake_all(self):
+        if self.sleeping:
+            self.sleeping.clear()
+            self._awake = None
+
+    def is_sleeping(self, index):
+        return index in self.sleeping
+
+    def active_indices(self, agents, phase):
+        """Índices de agentes despiertos para este tick (O(activos))"""
+        if phase != self.phase:
+            self.phase = phase
+            for i in [i for i in self.sleeping if ROLE_PHASES.get(agents[i].role) == phase]:
+                self.wake(i)
+        if self._awake is None or len(self._awake) + len(self.sleeping) != len(agents):
+            self._awake = [i for i in range(len(agents)) if i not in self.sleeping]
+        return self._awake
+
+    @staticmethod
+    def can_sleep(ag, phase):
+        if ROLE_PHASES.get(ag.role) == phase:
+            return False
+        if ag.is_returning_to_barn or not ag.is_at_barn():
+            return False
+        if ag.current_fuel < ag.max_fuel:
+            return False
+        if ag.role == 'harvester':
+            return ag.current_capacity <= 0
+        return ag.current_capacity >= ag.max_capacity
+
+    def update(self, agents, indices, phase):
+        """Tras aplicar el tick, duerme a los agentes activos que quedaron aparcados"""
+        for i in indices:
+            if self.can_sleep(agents[i], phase):
+                self.sleeping.add(i)
+                self._awake = None
+                agents[i].path = []
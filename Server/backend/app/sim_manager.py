@@ -4,7 +4,6 @@ import time
 import os
 import pickle
 import json
-from collections import defaultdict
 import numpy as np
 
 from .config import (
@@ -12,14 +11,27 @@ from .config import (
     DEFAULT_ALPHA, DEFAULT_GAMMA, DEFAULT_EPS, 
     EPS_DECAY, EPS_MIN, 
     QTABLE_PATH, STATS_PATH,
-    AGENT_START_POSITIONS, ROLE_BARNS, AGENT_ROLES,
+    ROLE_BARNS, AGENT_ROLES, FLEET_COMPOSITION,
     PLANTER_CAPACITY, HARVESTER_CAPACITY, IRRIGATOR_CAPACITY,
     PLANTER_FUEL, HARVESTER_FUEL, IRRIGATOR_FUEL,
     FUEL_RECHARGE_RATE, PARCELS,
-    SAVE_FREQUENCY
+    SAVE_FREQUENCY, SHARED_ROLE_Q, EVAL_EVERY, EVAL_SEEDS, EVAL_MAX_STEPS,
+    EARLY_STOP, CHECKPOINT_PATH, CHECKPOINT_EVERY, RECORD_DIR, RECORD_CHUNK_STEPS
 )
 from .env import MultiFieldEnv
-from .agents import FarmAgent
+from .agents import FarmAgent, QTable
+from .engine import StepEngine, q_learn
+from .parallel_train import ParallelTrainer, reset_fleet
+from .actor_learner import ActorLearnerTrainer
+from .replay import ReplayLearner
+from .role_q import share_role_q, RoleBatchLearner
+from .planning import PrioritizedSweeping
+from .policy import CompiledPolicy
+from .sweep import HyperparameterSweep
+from .evaluation import BackgroundEvaluator
+from .convergence import ConvergenceMonitor
+from .checkpoint import save_checkpoint, load_checkpoint, restore
+from .recorder import TrajectoryRecorder
 
 class SimManager:
     def __init__(self):
@@ -27,7 +39,8 @@ class SimManager:
             w=GRID_W, 
             h=GRID_H, 
             n_agents=N_AGENTS,
-            parcels=PARCELS
+            parcels=PARCELS,
+            roles=AGENT_ROLES
         )
         
         # Crear agentes con graneros correctos Y combustible
@@ -44,9 +57,8 @@ class SimManager:
             'irrigator': IRRIGATOR_FUEL
         }
         
-        for i in range(N_AGENTS):
-            role = AGENT_ROLES[i]
-            start_pos = AGENT_START_POSITIONS[i]
+        for i, role in enumerate(self.env.agent_roles):
+            start_pos = self.env.agents_init[i]
             barn_pos = ROLE_BARNS[role]
             capacity = capacities[role]
             fuel = fuels[role]
@@ -64,12 +76,21 @@ class SimManager:
             )
             self.agents.append(agent)
         
+        self.shared_role_q = SHARED_ROLE_Q
+        if self.shared_role_q:
+            share_role_q(self.agents)
+        
         print(f"✓ Inicializados {len(self.agents)} agentes con sistema de combustible:")
-        for a in self.agents:
-            print(f"  - A{a.id} ({a.role}): Granero={a.barn_pos}, Cap={a.max_capacity}, Fuel={a.max_fuel}")
+        for role, n in FLEET_COMPOSITION.items():
+            if n:
+                print(f"  - {n} x {role}: Granero={ROLE_BARNS[role]}, "
+                      f"Cap={capacities[role]}, Fuel={fuels[role]}")
         
         self.running = False
         self.train_thread = None
+        self.parallel_trainer = None
+        self.sweep = None
+        self.sweep_thread = None
         self.train_stats = {
             'episodes': [],
             'best_reward': float('-inf'),
@@ -84,16 +105,25 @@ class SimManager:
             'gamma': DEFAULT_GAMMA,
             'eps': DEFAULT_EPS,
             'eps_decay': EPS_DECAY,
-            'eps_min': EPS_MIN
+            'eps_min': EPS_MIN,
+            'replay': False,
+            'prioritized': False,
+            'planning_steps': 0,
+            'eval_every': EVAL_EVERY,
+            'early_stop': {} if EARLY_STOP else None,  # criterios de ConvergenceMonitor
+            'record': False  # trazas por tick en RECORD_DIR
         }
+        self.convergence = None
+        self.recorder = None
+        self.evaluator = BackgroundEvaluator(self, seeds=EVAL_SEEDS, max_steps=EVAL_MAX_STEPS)
         
         self.running_trained = False
         self.trained_thread = None
         self.QTABLE_PATH = QTABLE_PATH
 
-    def get_state(self):
+    def get_state(self, include_grid=True):
         with self.lock:
-            grid = self.env.grid.copy()
+            grid = self.env.grid.copy() if include_grid else None
             
             agent_states = []
             for a in self.agents:
@@ -112,6 +142,7 @@ class SimManager:
                     'is_fuel_critical': bool(a.is_fuel_critical()),
                     'epsilon': float(round(a.eps, 4)),
                     'states_learned': int(len(a.Q)),
+                    'q_evictions': int(a.Q.evictions),
                     'fuel_efficiency': float(round(a.calculate_efficiency_score(), 1))
                 })
             
@@ -142,16 +173,26 @@ class SimManager:
             }
         
         return {
-            'grid': grid.tolist(),
+            'grid': grid.tolist() if include_grid else None,
             'agents': agent_states,
             'blackboard': {},  # Simplificado para evitar problemas de serialización
             'meta': meta
         }
 
-    def train_background(self, episodes=50, steps_per_episode=2000):
+    def get_state_bytes(self):
+        """Snapshot binario de las capas del grid (layout + bytes crudos)"""
+        with self.lock:
+            return self.env.state.layout(), self.env.state.to_bytes()
+
+    def train_background(self, episodes=50, steps_per_episode=2000, start_episode=0):
+        # start_episode > 0: reanudación desde checkpoint (estado ya restaurado)
         self.running = True
+        resume = start_episode > 0
         print("\n" + "="*70)
-        print(f"ENTRENAMIENTO: {episodes} episodios")
+        if resume:
+            print(f"ENTRENAMIENTO REANUDADO: episodios {start_episode + 1}-{episodes}")
+        else:
+            print(f"ENTRENAMIENTO: {episodes} episodios")
         print(f"Sistema de combustible: ACTIVO")
         print(f"Parcelas: {len(self.env.parcels)}")
         print(f"Modo: CICLO COMPLETO SECUENCIAL")
@@ -159,25 +200,54 @@ class SimManager:
         print(f"Límite de pasos: {steps_per_episode} (o hasta completar ciclo)")
         print("="*70)
         
-        for ep in range(episodes):
+        # Con replay, las transiciones van a buffers por rol y se aprenden por lotes
+        learner = None
+        tabular = not any(a.Q.approximate for a in self.agents)
+        if not tabular and (self.params.get('replay') or self.params.get('planning_steps')):
+            print("⚠️ Replay y planning requieren Q tabular: se ignoran con Q_BACKEND=tiles")
+        if self.params.get('replay') and tabular:
+            learner = ReplayLearner(self.agents, prioritized=self.params.get('prioritized', False))
+            engine = StepEngine(self.env, self.agents, learn_fn=learner, batch_learn=learner.learn)
+        elif self.params.get('planning_steps') and tabular:
+            # Dyna-Q: backups simulados priorizados entre pasos reales
+            planner = PrioritizedSweeping(planning_steps=self.params['planning_steps'])
+            engine = StepEngine(self.env, self.agents, learn_fn=planner, batch_learn=planner.learn)
+        elif self.shared_role_q:
+            # Tablas por rol: las actualizaciones del tick se aplican juntas
+            role_learner = RoleBatchLearner(self.agents)
+            engine = StepEngine(self.env, self.agents, learn_fn=role_learner,
+                                batch_learn=role_learner.learn)
+        else:
+            engine = StepEngine(self.env, self.agents, learn_fn=q_learn)
+        
+        early_stop = self.params.get('early_stop')
+        if not resume:
+            self.train_stats.pop('early_stop', None)
+            self.evaluator.reset()  # evaluaciones de otra ejecución no cuentan para eval_patience
+        if not (resume and self.convergence is not None):
+            self.convergence = ConvergenceMonitor(**early_stop) if early_stop is not None else None
+        if self.convergence is not None:
+            self.convergence.start(self.agents)
+        
+        if self.params.get('record'):
+            self.recorder = TrajectoryRecorder(
+                os.path.join(RECORD_DIR, time.strftime('train_%Y%m%d_%H%M%S')),
+                len(self.agents), chunk_steps=RECORD_CHUNK_STEPS)
+            engine.recorder = self.recorder
+        
+        episodes_done = start_episode
+        for ep in range(start_episode, episodes):
             if not self.running:
                 break
             
             obs = self.env.reset()
-            
-            for i, agent in enumerate(self.agents):
-                if i < len(self.env.agents_init):
-                    agent.pos = self.env.agents_init[i]
-                agent.harvested = 0
-                agent.planted = 0
-                agent.irrigated = 0
-                agent.current_capacity = agent.max_capacity
-                agent.current_fuel = agent.max_fuel
-                agent.is_returning_to_barn = False
-                agent.set_eps(self.params['eps'])
+            reset_fleet(self.env, self.agents, self.params['eps'])
+            if engine.recorder is not None:
+                engine.recorder.begin_episode(ep + 1, self.env)
             
             episode_reward = 0.0
             episode_fuel_consumed = 0
+            engine.eps_decay = self.params['eps_decay']
             prev_phase = self.env.cycle_phase
             
             for step in range(steps_per_episode):
@@ -190,56 +260,20 @@ class SimManager:
                     print(f"  → Fase cambiada: {prev_phase} → {current_phase}")
                     prev_phase = current_phase
                 
-                obs_list = self.env._get_obs()
-                
-                while len(obs_list) < len(self.agents):
-                    obs_list.append(obs_list[-1] if obs_list else {
-                        'pos': (1, 1),
-                        'goal': self.env.manager_pos,
-                        'nearby': set(),
-                        'blackboard': self.env.blackboard
-                    })
-
-                proposals = self.env.step(self.agents)
-                
-                counts = {}
-                for p in proposals:
-                    counts[p] = counts.get(p, 0) + 1
-                
-                finals = []
-                for i, p in enumerate(proposals):
-                    finals.append(self.agents[i].pos if counts[p] > 1 else p)
-                
-                rewards, infos, done = self.env.apply_final_positions_and_harvest(
-                    self.agents, finals
-                )
-                
-                episode_reward += sum(rewards)
+                result = engine.step()
+                episode_reward += sum(result.rewards)
                 episode_fuel_consumed += sum(a.fuel_consumed for a in self.agents)
                 
-                obs2_list = self.env._get_obs()
-                while len(obs2_list) < len(self.agents):
-                    obs2_list.append(obs2_list[-1])
-                
-                for i, agent in enumerate(self.agents):
-                    state = agent.obs_to_state(obs_list[i])
-                    next_state = agent.obs_to_state(obs2_list[i])
-                    
-                    action_map_inv = {(0,0): 0, (1,0): 1, (-1,0): 2, (0,1): 3, (0,-1): 4}
-                    actual_move = (finals[i][0] - self.agents[i].pos[0], 
-                                 finals[i][1] - self.agents[i].pos[1])
-                    action_taken = action_map_inv.get(actual_move, 0)
-                    
-                    agent.update_q(state, action_taken, rewards[i], next_state, done)
-                
-                for agent in self.agents:
-                    agent.decay_epsilon(self.params['eps_decay'])
-                
-                if done:
+                if result.done:
                     break
             
+            if learner is not None:
+                learner.sync_to_agents()
+            
             avg_epsilon = np.mean([a.eps for a in self.agents])
-            total_states = sum(len(a.Q) for a in self.agents)
+            tables = {id(a.Q): a.Q for a in self.agents}.values()
+            total_states = sum(len(q) for q in tables)
+            total_evictions = sum(q.evictions for q in tables)
             avg_fuel_efficiency = np.mean([a.calculate_efficiency_score() for a in self.agents])
             
             baseline_steps = 1000  # Tiempo sin optimización
@@ -255,12 +289,24 @@ class SimManager:
                 'steps': step + 1,
                 'avg_epsilon': round(avg_epsilon, 4),
                 'total_states_learned': total_states,
+                'q_evictions': total_evictions,
                 'fuel_consumed': round(episode_fuel_consumed, 2),
                 'avg_fuel_efficiency': round(avg_fuel_efficiency, 1),
                 'time_saved_pct': round(time_saved_pct, 1)
             }
             
             self.train_stats['episodes'].append(episode_data)
+            episodes_done = ep + 1
+            # Evaluación greedy en otro proceso con una copia de las Q-tables
+            self.evaluator.maybe_evaluate(ep + 1)
+            
+            if self.convergence is not None:
+                reason = self.convergence.update(episode_data, self.agents, self.evaluator.history)
+                if reason:
+                    # Al salir del bucle se guardan Q-tables y estadísticas
+                    print(f"⏹ Parada temprana en ep {ep+1}/{episodes}: {reason}")
+                    self.train_stats['early_stop'] = {'episode': ep + 1, 'reason': reason}
+                    break
             
             if episode_reward > self.train_stats['best_reward']:
                 self.train_stats['best_reward'] = episode_reward
@@ -284,10 +330,20 @@ class SimManager:
             if (ep + 1) % SAVE_FREQUENCY == 0:
                 self.save_qs()
                 self.save_stats()
+            if (ep + 1) % CHECKPOINT_EVERY == 0:
+                save_checkpoint(self, CHECKPOINT_PATH, episodes_done, episodes, steps_per_episode)
         
         self.running = False
+        if engine.recorder is not None:
+            engine.recorder.close()
+        if self.convergence is not None:
+            self.convergence.close(self.agents)
+        self.evaluator.wait()
         self.save_qs()
         self.save_stats()
+        if self.train_stats.get('early_stop'):
+            episodes = episodes_done  # convergido: no queda nada que reanudar
+        save_checkpoint(self, CHECKPOINT_PATH, episodes_done, episodes, steps_per_episode)
         
         print("\n" + "="*70)
         print("ENTRENAMIENTO COMPLETADO")
@@ -306,6 +362,73 @@ class SimManager:
         self.train_thread.start()
         return True
 
+    def resume_training(self, path=None):
+        """
+        Reanuda el entrenamiento del último checkpoint: Q-tables, eps y
+        contadores, estadísticas, RNG y episodio. False si no hay checkpoint
+        o ya no quedan episodios.
+        """
+        if self.running:
+            return False
+        ckpt = load_checkpoint(path or CHECKPOINT_PATH)
+        if ckpt is None or ckpt['episode'] >= ckpt['episodes']:
+            return False
+        restore(self, ckpt)
+        self.train_thread = threading.Thread(
+            target=self.train_background,
+            args=(ckpt['episodes'], ckpt['steps_per_episode'], ckpt['episode']),
+            daemon=True
+        )
+        self.train_thread.start()
+        return True
+
+    def parallel_train_background(self, episodes=50, steps_per_episode=1000, workers=None,
+                                  mode='merge'):
+        # mode: 'merge' (rondas + fusión de Q) o 'actor_learner' (asíncrono)
+        self.running = True
+        if mode == 'actor_learner':
+            self.parallel_trainer = ActorLearnerTrainer(self, actors=workers)
+        else:
+            self.parallel_trainer = ParallelTrainer(self, workers=workers)
+        result = self.parallel_trainer.train(episodes, steps_per_episode)
+        self.running = False
+        self.save_qs()
+        self.save_stats()
+        print(f"ENTRENAMIENTO PARALELO COMPLETADO: {result['episodes']} episodios, "
+              f"{result['episodes_per_sec']} ep/s")
+        return result
+
+    def start_parallel_training(self, episodes=50, steps_per_episode=1000, workers=None,
+                                mode='merge'):
+        if self.running:
+            return False
+        if any(a.Q.approximate for a in self.agents):
+            # Los procesos intercambian Q-tables tabulares (dict / tablas densas)
+            print("⚠️ Entrenamiento paralelo no disponible con Q_BACKEND=tiles")
+            return False
+        self.train_thread = threading.Thread(
+            target=self.parallel_train_background,
+            args=(episodes, steps_per_episode, workers, mode),
+            daemon=True
+        )
+        self.train_thread.start()
+        return True
+
+    def start_sweep(self, space, apply_best=False, **kwargs):
+        """Sweep ASHA de hiperparámetros en segundo plano (no toca las Q-tables de sim)"""
+        if self.sweep_thread and self.sweep_thread.is_alive():
+            return False
+        self.sweep = HyperparameterSweep(self, space, **kwargs)
+
+        def run():
+            self.sweep.run()
+            if apply_best:
+                self.sweep.apply_best()
+
+        self.sweep_thread = threading.Thread(target=run, daemon=True)
+        self.sweep_thread.start()
+        return True
+
     def stop_training(self):
         self.running = False
         if self.train_thread:
@@ -320,14 +443,14 @@ class SimManager:
         data = []
         for agent in self.agents:
             agent_q = {}
-            for state, values in agent.Q.items():
-                agent_q[str(state)] = values.tolist()
-            data.append({
-                'id': agent.id,
-                'role': agent.role,
-                'Q': agent_q,
-                'stats': agent.get_stats()
-            })
+            entry = {'id': agent.id, 'role': agent.role, 'Q': agent_q}
+            if agent.Q.approximate:
+                entry['tiles'] = agent.Q  # pesos de tamaño fijo
+            else:
+                for state, values in agent.Q.items():
+                    agent_q[str(state)] = values.tolist()
+            entry['stats'] = agent.get_stats()
+            data.append(entry)
         with open(path, 'wb') as f:
             pickle.dump(data, f)
         print(f"Q-tables guardadas: {path}")
@@ -343,7 +466,10 @@ class SimManager:
             for i, agent in enumerate(self.agents):
                 if i < len(data):
                     agent_data = data[i]
-                    new_q = defaultdict(lambda: np.zeros(5))
+                    if isinstance(agent_data, dict) and 'tiles' in agent_data:
+                        agent.Q = agent_data['tiles']
+                        continue
+                    new_q = QTable(max_states=agent.Q.max_states)
                     q_dict = agent_data.get('Q', agent_data)
                     for state_str, values in q_dict.items():
                         try:
@@ -351,7 +477,10 @@ class SimManager:
                         except:
                             state = state_str
                         new_q[state] = np.array(values)
+                    new_q.maybe_prune()
                     agent.Q = new_q
+            if self.shared_role_q:
+                share_role_q(self.agents)
             print(f"✓ Q-tables cargadas")
             return True
         except Exception as e:
@@ -379,7 +508,9 @@ class SimManager:
                     for ep in self.train_stats.get('episodes', [])
                 ],
                 'best_reward': float(self.train_stats.get('best_reward', 0)),
-                'best_episode': int(self.train_stats.get('best_episode', 0))
+                'best_episode': int(self.train_stats.get('best_episode', 0)),
+                'evaluations': list(self.evaluator.history),
+                'early_stop': self.train_stats.get('early_stop')
             }
             
             with open(STATS_PATH, 'w') as f:
@@ -388,11 +519,21 @@ class SimManager:
             print(f"Error guardando stats: {e}")
 
     def best_action(self, agent, obs):
-        state = agent.obs_to_state(obs)
+        return self.best_action_policy(agent, agent.obs_to_state(obs))
+
+    @staticmethod
+    def best_action_policy(agent, state):
         if state not in agent.Q:
             return np.random.randint(0, 5)
         return int(np.argmax(agent.Q[state]))
 
+    def compile_policy(self, path=None):
+        """Q-tables actuales → CompiledPolicy (y se guarda si se da path)"""
+        policy = CompiledPolicy.compile(self.agents)
+        if path is not None:
+            policy.save(path)
+        return policy
+
     def run_trained_loop(self, sleep=0.12):
         with self.lock:
             self.env.reset()
@@ -403,20 +544,15 @@ class SimManager:
                 agent.current_fuel = agent.max_fuel
                 agent.is_returning_to_barn = False
         
+        try:
+            policy = self.compile_policy()
+        except ValueError:
+            policy = self.best_action_policy  # Q aproximada: sin tabla compilada
+        engine = StepEngine(self.env, self.agents, policy=policy)
         self.running_trained = True
         while self.running_trained:
             with self.lock:
-                obs_list = self.env._get_obs()
-                actions = {}
-                for i, agent in enumerate(self.agents):
-                    action_idx = self.best_action(agent, obs_list[i])
-                    actions[i] = {0: (0,0), 1: (1,0), 2: (-1,0), 3: (0,1), 4: (0,-1)}[action_idx]
-                proposals = self.env.step(self.agents, actions_by_q=actions)
-                counts = {}
-                for p in proposals:
-                    counts[p] = counts.get(p, 0) + 1
-                finals = [self.agents[i].pos if counts[p] > 1 else p for i, p in enumerate(proposals)]
-                self.env.apply_final_positions_and_harvest(self.agents, finals)
+                engine.step()
             time.sleep(sleep)
         return True
 
@@ -0,0 +1,207 @@
+# backend/app/sweep.py
+import math
+import os
+import random
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from .config import EVAL_SEEDS
+from .evaluation import evaluate_policy
+from .parallel_train import env_kwargs_for, fleet_specs, train_shard
+
+PARAMS = ('alpha', 'gamma', 'eps', 'eps_decay')
+
+
+def sample_config(space, rng):
+    """
+    Una configuración del espacio de búsqueda. Cada parámetro es una lista
+    de valores posibles o un rango {'low', 'high', 'log'} (uniforme, o
+    log-uniforme con log=True).
+    """
+    config = {}
+    for name, spec in space.items():
+        if name not in PARAMS:
+            raise ValueError(f"Parámetro desconocido en el espacio de búsqueda: {name}")
+        if isinstance(spec, dict):
+            low, high = float(spec['low']), float(spec['high'])
+            if spec.get('log'):
+                config[name] = math.exp(rng.uniform(math.log(low), math.log(high)))
+            else:
+                config[name] = rng.uniform(low, high)
+        else:
+            config[name] = rng.choice(list(spec))
+    return config
+
+
+def sweep_trial(env_kwargs, specs, config, episodes, steps_per_episode, eval_steps,
+                eval_seeds, seed):
+    """
+    Trabajo de un proceso: `episodes` episodios más de entrenamiento con la
+    configuración (continuando las Q-tables de specs) y la evaluación greedy
+    de evaluate_policy sobre eval_seeds (los mismos mapas para todos los
+    trials; seed solo afecta al entrenamiento). Devuelve las Q-tables y las
+    métricas medias.
+    """
+    specs = [dict(s, **{k: config[k] for k in ('alpha', 'gamma', 'eps') if k in config})
+             for s in specs]
+    params = {'eps': config.get('eps', specs[0]['eps']),
+              'eps_decay': config.get('eps_decay', 0.995)}
+    res = train_shard(env_kwargs, specs, params, episodes, steps_per_episode, seed)
+
+    ev = evaluate_policy(env_kwargs, [dict(s, Q=q) for s, q in zip(specs, res['Q'])],
+                         eval_seeds, eval_steps)
+    return {
+        'Q': res['Q'],
+        'train_reward': res['stats'][-1]['reward'] if res['stats'] else 0.0,
+        'completion_rate': ev['completion_rate'],
+        'mean_steps': ev['mean_steps'],
+        'mean_fuel_consumed': ev['mean_fuel_consumed'],
+        'mean_fuel_efficiency': ev['mean_fuel_efficiency'],
+    }
+
+
+def rank_key(trial):
+    """Menor es mejor: completar el ciclo más a menudo, en menos pasos, con más eficiencia de combustible"""
+    return (-trial['completion_rate'], trial['mean_steps'], -trial['mean_fuel_efficiency'])
+
+
+class HyperparameterSweep:
+    """
+    Búsqueda de (alpha, gamma, eps, eps_decay) con ASHA (successive halving
+    asíncrono): n_configs configuraciones aleatorias empiezan en el rung 0
+    con min_episodes episodios; un trial sube al rung k+1 (eta veces más
+    episodios acumulados, continuando su Q-table) en cuanto está en el mejor
+    1/eta de los que terminaron el rung k. Los procesos nunca esperan a que
+    acabe un rung completo. Los trials que no suben quedan podados.
+    """
+
+    def __init__(self, sim, space, n_configs=16, eta=3, min_episodes=2, max_rung=None,
+                 steps_per_episode=1000, eval_steps=2000, eval_seeds=None, workers=None,
+                 seed=None):
+        self.sim = sim
+        self.space = space
+        self.n_configs = n_configs
+        self.eta = eta
+        self.min_episodes = min_episodes
+        self.max_rung = (max_rung if max_rung is not None
+                         else max(0, int(math.log(n_configs, eta) + 1e-9)))
+        self.steps_per_episode = steps_per_episode
+        self.eval_steps = eval_steps
+        self.eval_seeds = tuple(eval_seeds) if eval_seeds else EVAL_SEEDS
+        self.workers = workers or os.cpu_count()
+        self.rng = random.Random(seed)
+        self.trials = [{'id': i, 'config': sample_config(space, self.rng), 'rung': None,
+                        'episodes': 0, 'status': 'pending'} for i in range(n_configs)]
+        self.status = 'idle'
+        self.elapsed_s = 0.0
+        self._q = {}
+        self._stop = threading.Event()
+
+    def budget(self, rung):
+        """Episodios acumulados al terminar un rung"""
+        return self.min_episodes * self.eta ** rung
+
+    def _next_job(self, rung_results, promoted):
+        # Promociones primero (de los rungs altos a los bajos), luego trials nuevos
+        for k in reversed(range(self.max_rung)):
+            done = sorted(rung_results[k], key=lambda tid: rank_key(self.trials[tid]))
+            for tid in done[:len(done) // self.eta]:
+                if tid not in promoted[k]:
+                    promoted[k].add(tid)
+                    return tid, k + 1
+        for t in self.trials:
+            if t['status'] == 'pending':
+                return t['id'], 0
+        return None
+
+    def run(self):
+        self.status = 'running'
+        with self.sim.lock:
+            env_kwargs = env_kwargs_for(self.sim.env)
+            specs = fleet_specs(self.sim.agents, with_q=False)
+        rung_results = {k: [] for k in range(self.max_rung + 1)}
+        promoted = {k: set() for k in range(self.max_rung)}
+        running = {}
+        t0 = time.perf_counter()
+        print(f"SWEEP ASHA: {self.n_configs} configuraciones, eta={self.eta}, "
+              f"rungs=0..{self.max_rung}, {self.workers} procesos")
+
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            while True:
+                while len(running) < self.workers and not self._stop.is_set():
+                    job = self._next_job(rung_results, promoted)
+                    if job is None:
+                        break
+                    tid, rung = job
+                    trial = self.trials[tid]
+                    episodes = self.budget(rung) - trial['episodes']
+                    trial_specs = [dict(s, Q=q) for s, q in
+                                   zip(specs, self._q.get(tid, [{}] * len(specs)))]
+                    fut = pool.submit(sweep_trial, env_kwargs, trial_specs, trial['config'],
+                                      episodes, self.steps_per_episode, self.eval_steps,
+                                      self.eval_seeds, self.rng.randrange(2 ** 31))
+                    running[fut] = (tid, rung, episodes)
+                    trial['status'] = 'running'
+                if not running:
+                    break
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for fut in finished:
+                    tid, rung, episodes = running.pop(fut)
+                    res = fut.result()
+                    self._q[tid] = res.pop('Q')
+                    trial = self.trials[tid]
+                    trial.update(res, rung=rung, episodes=trial['episodes'] + episodes,
+                                 status='completed' if rung == self.max_rung else 'paused')
+                    rung_results[rung].append(tid)
+                    print(f"  trial {tid} rung {rung}: completado={trial['completion_rate']:.0%} "
+                          f"pasos={trial['mean_steps']:.0f} "
+                          f"eficiencia={trial['mean_fuel_efficiency']:.1f}")
+
+        for t in self.trials:
+            if t['status'] in ('paused', 'pending'):
+                t['status'] = 'stopped' if self._stop.is_set() else 'pruned'
+        self.elapsed_s = round(time.perf_counter() - t0, 2)
+        self.status = 'stopped' if self._stop.is_set() else 'done'
+        best = self.best()
+        print(f"SWEEP {self.status.upper()} en {self.elapsed_s}s | mejor: "
+              f"{best['config'] if best else None}")
+        return self.results()
+
+    def stop(self):
+        self._stop.set()
+
+    def best(self):
+        """Mejor trial del rung más alto alcanzado"""
+        done = [t for t in self.trials if t['rung'] is not None]
+        if not done:
+            return None
+        top = max(t['rung'] for t in done)
+        return min((t for t in done if t['rung'] == top), key=rank_key)
+
+    def apply_best(self):
+        """Copia la mejor configuración a sim.params y a los agentes"""
+        best = self.best()
+        if best is None:
+            return None
+        with self.sim.lock:
+            self.sim.params.update(best['config'])
+            for a in self.sim.agents:
+                a.alpha = best['config'].get('alpha', a.alpha)
+                a.gamma = best['config'].get('gamma', a.gamma)
+        return best['config']
+
+    def results(self):
+        ranked = sorted(self.trials, key=lambda t: (-(t['rung'] if t['rung'] is not None else -1),
+                                                    rank_key(t) if t['rung'] is not None else ()))
+        return {
+            'status': self.status,
+            'space': self.space,
+            'eta': self.eta,
+            'eval_seeds': list(self.eval_seeds),
+            'max_rung': self.max_rung,
+            'budgets': [self.budget(k) for k in range(self.max_rung + 1)],
+            'elapsed_s': self.elapsed_s,
+            'best': self.best(),
+            'trials': ranked
+        }
@@ -0,0 +1,146 @@
+# backend/app/tilecoding.py
+import numpy as np
+
+from .config import TILE_TILINGS, TILE_MEMORY
+
+# Estado de FarmAgent.obs_to_state con Q aproximada (sin clamps):
+# (dx, dy, occ, cap_frac, barn_dist, fuel_frac, returning)
+CONTINUOUS = (0, 1, 3, 4, 5)   # dx, dy, capacidad, distancia al granero, combustible
+DISCRETE = (2, 6)              # ocupación de vecinos, volviendo al granero
+# Ancho de tile por dimensión continua (offsets y distancia en escala log1p)
+TILE_WIDTHS = np.array([0.5, 0.5, 0.25, 0.5, 0.25])
+# Desplazamiento asimétrico entre tilings (1, 3, 5, ...) como en Sutton & Barto
+_DISPLACEMENT = np.arange(1, 2 * len(CONTINUOUS), 2)
+_PRIMES = np.array([73856093, 19349663, 83492791, 49979687, 15485863,
+                    32452843, 67867967, 86028121], dtype=np.int64)
+
+
+def _scaled(states):
+    """Estados (n, 7) → coordenadas continuas en unidades de tile y componentes discretas"""
+    s = np.asarray(states, dtype=np.float64).reshape(-1, 7)
+    x = s[:, CONTINUOUS]
+    # log1p: resolución fina cerca del objetivo/granero y gruesa lejos, sin límite de mapa
+    x[:, :2] = np.sign(x[:, :2]) * np.log1p(np.abs(x[:, :2]))
+    x[:, 3] = np.log1p(x[:, 3])
+    return x / TILE_WIDTHS, s[:, DISCRETE].astype(np.int64)
+
+
+class TileQ:
+    """
+    Q aproximada lineal con tile coding: n_tilings rejillas desplazadas sobre
+    el offset al objetivo, capacidad, distancia al granero y combustible,
+    cruzadas con las componentes discretas. Las coordenadas de cada tile se
+    dispersan (hash) en `size` pesos por acción, así que la memoria es fija
+    (n_actions × size float32) sea cual sea el tamaño del mapa.
+
+    Interfaz compatible con QTable donde la usa FarmAgent: Q[s] / row(s) dan
+    los valores de las acciones, update() hace el paso de gradiente y
+    `s in Q` indica si algún tile del estado ya se ha entrenado.
+    """
+
+    approximate = True
+    _base = None    # pesos previos de las columnas escritas (n_actions, size)
+    _dirty = None   # máscara de columnas escritas desde begin_delta
+    version = 0     # escrituras de pesos (mark)
+    max_states = 0
+    evictions = 0
+
+    def __init__(self, n_actions=5, n_tilings=None, size=None):
+        self.n_tilings = TILE_TILINGS if n_tilings is None else int(n_tilings)
+        self.size = TILE_MEMORY if size is None else int(size)
+        self.w = np.zeros((n_actions, self.size), dtype=np.float32)
+        self.touched = np.zeros(self.size, dtype=bool)
+        self.offsets = (np.arange(self.n_tilings)[:, None] * _DISPLACEMENT) / self.n_tilings
+        self.updates = 0
+
+    def features_batch(self, states):
+        """Índices de los tiles activos → array (n, n_tilings)"""
+        x, disc = _scaled(states)
+        coords = np.floor(x[:, None, :] + self.offsets[None]).astype(np.int64)
+        h = coords @ _PRIMES[:len(CONTINUOUS)]
+        h += (disc @ _PRIMES[len(CONTINUOUS):-1])[:, None]
+        h += np.arange(self.n_tilings) * _PRIMES[-1]
+        return h % self.size
+
+    def features(self, state):
+        return self.features_batch(state)[0]
+
+    def row(self, state):
+        return self.w[:, self.features(state)].sum(axis=1)
+
+    __getitem__ = row
+
+    def rows(self, states):
+        """Valores de todas las acciones para un lote de estados → (n, n_actions)"""
+        return self.w[:, self.features_batch(states)].sum(axis=2).T
+
+    def __contains__(self, state):
+        return bool(self.touched[self.features(state)].any())
+
+    def __len__(self):
+        return int(self.touched.sum())  # tiles entrenados
+
+    # ---------- Cambio acumulado (criterio q_change de ConvergenceMonitor) ----------
+
+    def mark(self, idx):
+        self.version += 1
+        if self._dirty is not None:
+            new = idx[~self._dirty[idx]]
+            self._base[:, new] = self.w[:, new]
+            self._dirty[new] = True
+
+    def begin_delta(self):
+        self._base = np.empty_like(self.w)
+        self._dirty = np.zeros(self.size, dtype=bool)
+
+    def end_delta(self):
+        self._base = self._dirty = None
+
+    def delta(self):
+        """(Σ Δw², Σ w²) de las columnas de pesos escritas desde begin_delta/delta"""
+        if self._dirty is None:
+            return None
+        cols = np.flatnonzero(self._dirty)
+        w = self.w[:, cols].astype(np.float64)
+        d = w - self._base[:, cols]
+        self._dirty[:] = False
+        return float(np.square(d).sum()), float(np.square(w).sum())
+
+    def update(self, state, action, target, alpha):
+        idx = self.features(state)
+        self.mark(idx)
+        td = target - self.w[action, idx].sum()
+        self.w[action, idx] += alpha / self.n_tilings * td
+        self.touched[idx] = True
+        self.updates += 1
+        return td
+
+    def update_batch(self, states, actions, targets, alpha):
+        """
+        Pasos de gradiente de un lote con los pesos anteriores al lote; los
+        que comparten tile se suman (np.add.at). alpha escalar o por transición.
+        """
+        idx = self.features_batch(states)
+        self.mark(np.unique(idx))
+        actions = np.asarray(actions, dtype=np.int64)
+        td = np.asarray(targets) - self.w[actions[:, None], idx].sum(axis=1)
+        step = np.broadcast_to(alpha / self.n_tilings * td, td.shape)
+        np.add.at(self.w, (np.repeat(actions, self.n_tilings), idx.ravel()),
+                  np.repeat(step, self.n_tilings).astype(self.w.dtype))
+        self.touched[idx] = True
+        self.updates += len(actions)
+        return td
+
+    def maybe_prune(self, keep=()):
+        return 0  # memoria fija: nunca crece
+
+    def copy(self):
+        clone = TileQ(self.w.shape[0], self.n_tilings, self.size)
+        clone.w[:] = self.w
+        clone.touched[:] = self.touched
+        clone.updates = self.updates
+        return clone
+
+    def stats(self):
+        return {'states': len(self), 'max_states': self.size, 'evictions': 0,
+                'prune_runs': 0, 'tilings': self.n_tilings, 'updates': self.updates}
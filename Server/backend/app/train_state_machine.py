@@ -2,16 +2,18 @@ import threading
 import time
 import os
 import pickle
-from collections import defaultdict
 import numpy as np
 
 from .config import (
     GRID_W, GRID_H, N_AGENTS, DEFAULT_ALPHA, DEFAULT_GAMMA, 
-    DEFAULT_EPS, EPS_DECAY, QTABLE_PATH, AGENT_ROLES, AGENT_START_POSITIONS,
-    ROLE_BARNS
+    DEFAULT_EPS, EPS_DECAY, QTABLE_PATH, AGENT_ROLES,
+    PLANTER_CAPACITY, HARVESTER_CAPACITY, IRRIGATOR_CAPACITY,
+    PLANTER_FUEL, HARVESTER_FUEL, IRRIGATOR_FUEL
 )
 from .env import MultiFieldEnv
-from .agents import FarmAgent
+from .agents import FarmAgent, QTable
+from .engine import StepEngine, q_learn
+from .scheduler import ROLE_PHASES
 
 class PhaseState:
     PLANTING = 'planting'
@@ -20,22 +22,35 @@ class PhaseState:
     CYCLE_COMPLETE = 'cycle_complete'
 
 class StateMachineTrainer:
-    def __init__(self, width=GRID_W, height=GRID_H, n_agents=N_AGENTS):
-        self.env = MultiFieldEnv(w=width, h=height, n_agents=n_agents)
+    def __init__(self, width=GRID_W, height=GRID_H, n_agents=N_AGENTS, roles=None):
+        if roles is None and n_agents == len(AGENT_ROLES):
+            roles = AGENT_ROLES
+        self.env = MultiFieldEnv(w=width, h=height, n_agents=n_agents, roles=roles)
         self.agents = []
+        capacities = {
+            'planter': PLANTER_CAPACITY,
+            'harvester': HARVESTER_CAPACITY,
+            'irrigator': IRRIGATOR_CAPACITY
+        }
+        fuels = {
+            'planter': PLANTER_FUEL,
+            'harvester': HARVESTER_FUEL,
+            'irrigator': IRRIGATOR_FUEL
+        }
         # Crear agentes con roles específicos
-        for i in range(self.env.n_agents):
-            role = AGENT_ROLES[i] if i < len(AGENT_ROLES) else 'harvester'
-            barn_pos = ROLE_BARNS.get(role, (0, 0))
+        for i, role in enumerate(self.env.agent_roles):
+            barn_pos = self.env._get_barn_for_role(role)
             
             a = FarmAgent(
                 i, 
-                AGENT_START_POSITIONS[i] if i < len(AGENT_START_POSITIONS) else self.env.agents_init[i],
+                self.env.agents_init[i],
                 role=role,
                 barn_pos=barn_pos,
                 alpha=DEFAULT_ALPHA, 
                 gamma=DEFAULT_GAMMA, 
-                eps=DEFAULT_EPS
+                eps=DEFAULT_EPS,
+                capacity=capacities[role],
+                fuel=fuels[role]
             )
             self.agents.append(a)
         self.running = False
@@ -62,40 +77,50 @@ class StateMachineTrainer:
             PhaseState.HARVESTING: 0.80
         }
         
+    # Fase del entorno que corresponde a cada fase del entrenador
+    ENV_PHASES = {
+        PhaseState.PLANTING: 'planting',
+        PhaseState.GROWTH: 'irrigating',
+        PhaseState.HARVESTING: 'harvesting',
+        PhaseState.CYCLE_COMPLETE: 'complete'
+    }
+    
     def _should_transition_phase(self, phase):
+        # Contadores O(1) mantenidos por el entorno
         if phase == PhaseState.PLANTING:
             total_buildable = len(self.env.buildable_cells)
-            planted = sum(1 for (x, y) in self.env.buildable_cells 
-                         if self.env.grid[y, x] == 2)  # CROP = 2
-            ratio = planted / max(1, total_buildable)
+            ratio = self.env.standing_crops / max(1, total_buildable)
             return ratio >= self.phase_thresholds[PhaseState.PLANTING]
         
         elif phase == PhaseState.GROWTH:
-            crops = np.sum(self.env.grid == 2)  # CROP
-            if crops == 0:
+            if self.env.standing_crops == 0:
                 return False
-            mature = np.sum((self.env.grid == 2) & 
-                          (self.env.crop_age >= self.env.MATURITY_STEPS))
-            return mature > 0
+            return self.env.mature_crops > 0
         
         elif phase == PhaseState.HARVESTING:
-            remaining = np.sum(self.env.grid == 2)
-            return remaining == 0
+            return self.env.standing_crops == 0
         
         return False
     
+    def _set_phase(self, phase):
+        self.env.set_phase(self.ENV_PHASES[phase])
+        self.train_stats['current_phase'] = phase
+    
+    def _phase_policy(self, agent, state):
+        # Solo explora el rol de la fase actual; el resto se queda quieto
+        if self.ENV_PHASES.get(self.train_stats['current_phase']) == ROLE_PHASES.get(agent.role):
+            return agent.choose_action(state, training=True)
+        return 0
+    
     def _reset_phase_for_next_cycle(self):
-        buildable = self.env.buildable_cells
-        for x, y in buildable:
-            self.env.grid[y, x] = 0  # EMPTY
-            self.env.crop_age[y, x] = 0.0
-            self.env.water[y, x] = 0
-            self.env.compaction[y, x] = 0
+        # Limpieza vectorizada de las celdas sembrables, sin reset() completo
+        self.env.begin_cycle()
         
         # Resetear agentes a posiciones iniciales
         for i, agent in enumerate(self.agents):
-            agent.pos = AGENT_START_POSITIONS[i] if i < len(AGENT_START_POSITIONS) else self.env.agents_init[i]
-            agent.current_capacity = agent.max_capacity
+            agent.pos = self.env.agents_init[i]
+            agent.current_capacity = agent.max_capacity if agent.role != 'harvester' else 0
+            agent.current_fuel = agent.max_fuel
             agent.is_returning_to_barn = False
             agent.harvested = 0
             agent.planted = 0
@@ -103,15 +128,26 @@ class StateMachineTrainer:
             agent.path = []
     
     def train_background(self, episodes=20, steps_per_episode=500):
+        """
+        Cada episodio es un ciclo SIEMBRA → RIEGO → COSECHA sobre el mismo
+        entorno: reset() solo al empezar, y entre ciclos begin_cycle().
+        """
         self.running = True
         self.train_stats['total_episodes'] = episodes
+        self.env.reset()
+        self.env.auto_phase = False  # Las fases las decide esta máquina de estados
+        self.env.finish_recharge = True  # ciclos largos sin reset: no abandonar recargas a medias
+        engine = StepEngine(self.env, self.agents, policy=self._phase_policy,
+                            learn_fn=q_learn, grow_crops=True, terminal=False,
+                            eps_decay=self.params['eps_decay'])
+        
         for ep in range(episodes):
             if not self.running:
                 break
             self.train_stats['current_episode'] = ep + 1
-            self.env.reset()
             self._reset_phase_for_next_cycle()
             phase = PhaseState.PLANTING
+            self._set_phase(phase)
             phase_step_count = 0
             episode_total_reward = 0.0
             episode_stats = {
@@ -128,77 +164,15 @@ class StateMachineTrainer:
                     break
                 
                 phase_step_count += 1
-                self.env.step_count += 1
-                obs_list = self.env._get_obs()
-                actions = {}
-                states = []
-                for i, agent in enumerate(self.agents):
-                    obs = obs_list[i]
-                    s = agent.obs_to_state(obs)
-                    states.append(s)
-                    
-                    if phase == PhaseState.PLANTING:
-                        if agent.role == 'planter':
-                            ai = agent.choose_action(s, training=True)
-                            actions[i] = {0: (0,0), 1: (1,0), 2: (-1,0), 3: (0,1), 4: (0,-1)}[ai]
-                        else:
-                            actions[i] = (0, 0)
-                    
-                    elif phase == PhaseState.GROWTH:
-                        if agent.role == 'irrigator':
-                            ai = agent.choose_action(s, training=True)
-                            actions[i] = {0: (0,0), 1: (1,0), 2: (-1,0), 3: (0,1), 4: (0,-1)}[ai]
-                        elif agent.role == 'planter':
-                            actions[i] = (0, 0)
-                        else:
-                            actions[i] = (0, 0)
-                    
-                    elif phase == PhaseState.HARVESTING:
-                        if agent.role == 'harvester':
-                            ai = agent.choose_action(s, training=True)
-                            actions[i] = {0: (0,0), 1: (1,0), 2: (-1,0), 3: (0,1), 4: (0,-1)}[ai]
-                        else:
-                            actions[i] = (0, 0)
-                    
-                    else:
-                        actions[i] = (0, 0)
-                
-                proposals = self.env.step(self.agents, actions_by_q=actions)
-                pos_counts = {}
-                for p in proposals:
-                    pos_counts[p] = pos_counts.get(p, 0) + 1
-                
-                finals = []
-                for i, p in enumerate(proposals):
-                    if pos_counts.get(p, 0) > 1:
-                        finals.append(self.agents[i].pos)
-                    else:
-                        finals.append(p)
-                
-                rewards, infos, done = self.env.apply_final_positions_and_harvest(
-                    self.agents, finals
-                )
-                episode_total_reward += sum(rewards)
-                obs2_list = self.env._get_obs()
-                for i, agent in enumerate(self.agents):
-                    s2 = agent.obs_to_state(obs2_list[i])
-                    idx_map = {(0,0): 0, (1,0): 1, (-1,0): 2, (0,1): 3, (0,-1): 4}
-                    final_pos = finals[i]
-                    movement = (final_pos[0] - agent.pos[0], final_pos[1] - agent.pos[1])
-                    ai = idx_map.get(movement, 0)
-                    
-                    agent.update_q(states[i], ai, rewards[i], s2, done=False)
-                
-                # Decay epsilon
-                for agent in self.agents:
-                    agent.decay_epsilon(self.params['eps_decay'])
+                result = engine.step()
+                episode_total_reward += sum(result.rewards)
                 
                 # Verificar transición de fase
                 if self._should_transition_phase(phase):
                     if phase not in episode_stats['phases']:
                         episode_stats['phases'][phase] = {
                             'steps': phase_step_count,
-                            'reward': sum([a.get_stats()['barn_visits'] for a in self.agents])
+                            'reward': sum(a.barn_visits for a in self.agents)
                         }
                     phase_step_count = 0
                     
@@ -208,9 +182,9 @@ class StateMachineTrainer:
                         phase = PhaseState.HARVESTING
                     elif phase == PhaseState.HARVESTING:
                         phase = PhaseState.CYCLE_COMPLETE
+                    self._set_phase(phase)
+                    if phase == PhaseState.CYCLE_COMPLETE:
                         break
-                
-                self.train_stats['current_phase'] = phase
             
             # Recolectar estadísticas del episodio
             episode_stats['total_reward'] = episode_total_reward
@@ -281,13 +255,14 @@ class StateMachineTrainer:
             
             for i, agent in enumerate(self.agents):
                 if i < len(data):
-                    new_q = defaultdict(lambda: np.zeros(5))
+                    new_q = QTable(max_states=agent.Q.max_states)
                     for state_str, q_vals in data[i].items():
                         try:
                             state_key = eval(state_str)
                         except:
                             state_key = state_str
                         new_q[state_key] = np.array(q_vals)
+                    new_q.maybe_prune()
                     agent.Q = new_q
             
             print(f"✓ Q-tables cargadas desde {path}")
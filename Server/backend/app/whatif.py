@@ -0,0 +1,163 @@
+# backend/app/whatif.py
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from .config import spawn_positions
+from .agents import FarmAgent
+from .headless import run_headless
+
+_pool = None
+_pool_key = None
+_pool_lock = threading.Lock()
+_tables = None   # en cada proceso del pool: Q-tables de la flota (initializer)
+
+
+def _init_worker(tables):
+    global _tables
+    _tables = tables
+
+
+def _get_pool(workers, tables, version):
+    """
+    Pool de procesos reutilizado entre peticiones mientras no cambien el
+    número de procesos ni las Q-tables (version). Las tablas viajan una vez
+    por proceso en el initializer, no en cada escenario.
+    """
+    global _pool, _pool_key
+    key = (workers or os.cpu_count(), version)
+    with _pool_lock:
+        if _pool is None or _pool_key != key:
+            if _pool is not None:
+                _pool.shutdown(wait=False)  # los escenarios ya enviados terminan igual
+            _pool = ProcessPoolExecutor(max_workers=key[0], initializer=_init_worker,
+                                        initargs=(tables,))
+            _pool_key = key
+        return _pool
+
+
+def _split_tables(agents):
+    """Q-tables distintas de la flota, el índice de la de cada agente y su versión"""
+    tables, slots, index = [], [], {}
+    for a in agents:
+        if id(a.Q) not in index:
+            index[id(a.Q)] = len(tables)
+            tables.append(a.Q)
+        slots.append(index[id(a.Q)])
+    version = tuple((id(q), len(q), q.version) for q in tables)
+    return tables, slots, version
+
+
+def fork_simulation(env, agents):
+    """Fork del entorno y la flota en vivo (copias a nivel de array/escalar)"""
+    return env.fork(), [a.fork() for a in agents]
+
+
+def _detach_q(agents):
+    """Quita la Q-table (compartida) de los agentes de un fork antes de enviarlo al pool"""
+    for a in agents:
+        vars(a).pop('_Q', None)
+    return agents
+
+
+def apply_scenario(env, agents, scenario):
+    """
+    Modifica un fork según el escenario:
+      - add_agents: {rol: n}  agentes nuevos junto al granero del rol, con la
+                    Q-table del primer agente existente de ese rol
+      - fuel:       {rol: combustible máximo}
+      - capacity:   {rol: capacidad máxima}
+    """
+    add = {role: n for role, n in (scenario.get('add_agents') or {}).items() if n > 0}
+    if add:
+        roles = [role for role, n in add.items() for _ in range(n)]
+        barns = {role: env._get_barn_for_role(role) for role in add}
+        blocked = set(env.obstacles) | {a.pos for a in agents}
+        for role, pos in zip(roles, spawn_positions(roles, barns, env.w, env.h, blocked=blocked)):
+            template = next((a for a in agents if a.role == role), None)
+            if template is not None:
+                ag = FarmAgent(len(agents), pos, role=role, barn_pos=template.barn_pos,
+                               alpha=template.alpha, gamma=template.gamma, eps=template.eps,
+                               capacity=template.max_capacity, fuel=template.max_fuel)
+                ag.Q = template.Q
+            else:
+                ag = FarmAgent(len(agents), pos, role=role, barn_pos=barns[role])
+            agents.append(ag)
+            env.agent_roles.append(role)
+            env.agents_init.append(pos)
+        env.n_agents = len(agents)
+
+    for role, fuel in (scenario.get('fuel') or {}).items():
+        for a in agents:
+            if a.role == role:
+                a.max_fuel = fuel
+                a.current_fuel = min(a.current_fuel, fuel)
+    for role, capacity in (scenario.get('capacity') or {}).items():
+        for a in agents:
+            if a.role == role:
+                a.max_capacity = capacity
+                a.current_capacity = min(a.current_capacity, capacity)
+
+    env.scheduler.wake_all()
+    return env, agents
+
+
+def rollout(env, agents, slots, scenario, max_steps=5000):
+    """
+    Simula un fork hacia delante (se ejecuta en un proceso del pool). Los
+    agentes llegan sin Q-table: slots indica la tabla de cada uno en las
+    recibidas por el initializer del proceso.
+    """
+    for a, slot in zip(agents, slots):
+        a.Q = _tables[slot]
+    apply_scenario(env, agents, scenario)
+    start_step = env.step_count
+    fuel_before = sum(a.fuel_consumed for a in agents)
+    result = run_headless(agents, env=env, max_steps=max_steps)
+    return {
+        'name': scenario.get('name'),
+        'scenario': scenario,
+        'agents': len(agents),
+        'completed': result['completed'],
+        'completion_step': result['steps_to_completion'],
+        'steps_simulated': result['steps'],
+        'start_step': start_step,
+        'fuel_used': round(result['fuel_consumed'] - fuel_before, 2),
+        'elapsed_s': result['elapsed_s'],
+        'metrics': result['metrics']
+    }
+
+
+def what_if(env, agents, scenarios, max_steps=5000, workers=None, lock=None):
+    """
+    Proyecta cada escenario desde el estado actual: hace los forks en el
+    proceso llamante (bajo lock si se pasa, solo lo que dura copiar) y los
+    simula en paralelo en el pool. El escenario base (sin cambios) va primero.
+    """
+    scenarios = [{'name': 'baseline'}] + list(scenarios)
+    t0 = time.perf_counter()
+    if lock is not None:
+        with lock:
+            forks = [fork_simulation(env, agents) for _ in scenarios]
+            tables, slots, version = _split_tables(agents)
+            pool = _get_pool(workers, tables, version)
+    else:
+        forks = [fork_simulation(env, agents) for _ in scenarios]
+        tables, slots, version = _split_tables(agents)
+        pool = _get_pool(workers, tables, version)
+    fork_ms = (time.perf_counter() - t0) * 1000 / len(scenarios)
+
+    futures = [pool.submit(rollout, e, _detach_q(a), slots, sc, max_steps)
+               for (e, a), sc in zip(forks, scenarios)]
+    results = [f.result() for f in futures]
+
+    base = results[0]['completion_step']
+    for r in results:
+        if base is not None and r['completion_step'] is not None:
+            r['steps_vs_baseline'] = r['completion_step'] - base
+    return {
+        'fork_ms': round(fork_ms, 3),
+        'elapsed_s': round(time.perf_counter() - t0, 3),
+        'results': results
+    }
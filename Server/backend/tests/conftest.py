@@ -0,0 +1,36 @@
+import pytest
+
+from app import sim_manager
+
+
+@pytest.fixture
+def make_sim(monkeypatch, tmp_path):
+    """Fábrica de SimManager que guarda Q-tables, estadísticas y checkpoints en tmp_path"""
+    monkeypatch.setattr(sim_manager, 'STATS_PATH', str(tmp_path / 'stats.json'))
+    monkeypatch.setattr(sim_manager, 'QTABLE_PATH', str(tmp_path / 'qtables.pkl'))
+    monkeypatch.setattr(sim_manager, 'CHECKPOINT_PATH', str(tmp_path / 'checkpoint.pkl'))
+
+    def make():
+        sim = sim_manager.SimManager()
+        sim.QTABLE_PATH = sim_manager.QTABLE_PATH
+        sim.params['eval_every'] = 0
+        sim.params['early_stop'] = None
+        return sim
+    return make
+
+
+@pytest.fixture
+def fresh_sim(make_sim):
+    return make_sim()
+
+
+def fleet(env, rng=None):
+    """Flota nueva (Q-tables propias) en las posiciones iniciales de env"""
+    from app.agents import FarmAgent
+    agents = [FarmAgent(aid=i, start_pos=env.agents_init[i], role=role,
+                        barn_pos=env._get_barn_for_role(role))
+              for i, role in enumerate(env.agent_roles)]
+    if rng is not None:
+        for a in agents:
+            a.rng = rng
+    return agents
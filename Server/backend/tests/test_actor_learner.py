@@ -0,0 +1,32 @@
+import threading
+from types import SimpleNamespace
+
+from app.actor_learner import ActorLearnerTrainer
+from app.agents import FarmAgent
+from app.env import MultiFieldEnv
+from app.role_q import share_role_q
+
+
+def make_sim():
+    env = MultiFieldEnv()
+    agents = [FarmAgent(aid=i, start_pos=env.agents_init[i], role=role)
+              for i, role in enumerate(env.agent_roles)]
+    share_role_q(agents)
+    return SimpleNamespace(
+        env=env, agents=agents, running=True, lock=threading.Lock(),
+        params={'eps': 0.5, 'eps_decay': 0.999},
+        train_stats={'episodes': [], 'best_reward': float('-inf'), 'best_episode': 0})
+
+
+def test_shared_tables_keep_identity_and_visits():
+    sim = make_sim()
+    before = {id(a.Q) for a in sim.agents}
+    tables = {id(a.Q): a.Q for a in sim.agents}
+    out = ActorLearnerTrainer(sim, actors=1, batch_size=256).train(episodes=1, steps_per_episode=40)
+
+    # Las tablas de rol siguen siendo las mismas instancias compartidas
+    assert {id(a.Q) for a in sim.agents} == before
+    assert all(a.Q is tables[id(a.Q)] for a in sim.agents)
+    # Cada transición se aplica una sola vez por tabla, no una por agente del rol
+    total = sum(sum(Q.visits.values()) for Q in tables.values())
+    assert total == out['updates'] > 0
@@ -0,0 +1,12 @@
+from app.env import MultiFieldEnv
+from conftest import fleet
+
+
+def test_blackboard_keys_by_agent_name():
+    env = MultiFieldEnv()
+    agents = fleet(env)
+    env.step(agents)
+    board = env.blackboard['agents']
+    assert set(board) == {f'agent_{a.id}' for a in agents}
+    entry = board['agent_0']
+    assert entry['pos'] == tuple(agents[0].pos) and entry['role'] == agents[0].role
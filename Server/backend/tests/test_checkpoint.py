@@ -0,0 +1,48 @@
+import random
+
+import numpy as np
+
+from app import sim_manager
+
+KEYS = ('episode', 'reward', 'steps', 'planted', 'avg_epsilon', 'total_states_learned')
+
+
+def summary(sim):
+    return [tuple(ep[k] for k in KEYS) for ep in sim.train_stats['episodes']]
+
+
+def test_resume_matches_uninterrupted_run(make_sim, monkeypatch):
+    monkeypatch.setattr(sim_manager, 'CHECKPOINT_EVERY', 2)
+
+    random.seed(5)
+    np.random.seed(5)
+    ref = make_sim()
+    ref.train_background(episodes=4, steps_per_episode=120)
+
+    # Misma ejecución cortada tras el checkpoint del episodio 2
+    random.seed(5)
+    np.random.seed(5)
+    cut = make_sim()
+    save = sim_manager.save_checkpoint
+
+    def save_and_stop(sim, path, done, *args):
+        save(sim, path, done, *args)
+        if done == 2:
+            sim.running = False
+    monkeypatch.setattr(sim_manager, 'save_checkpoint', save_and_stop)
+    cut.train_background(episodes=4, steps_per_episode=120)
+    assert len(cut.train_stats['episodes']) == 2
+    monkeypatch.setattr(sim_manager, 'save_checkpoint', save)
+
+    # Proceso "nuevo": otro estado de RNG y otra simulación
+    random.seed(99)
+    np.random.seed(99)
+    resumed = make_sim()
+    assert resumed.resume_training()
+    resumed.train_thread.join()
+    assert summary(resumed) == summary(ref)
+    for a, b in zip(resumed.agents, ref.agents):
+        assert a.Q.keys() == b.Q.keys()
+        for s in a.Q:
+            np.testing.assert_array_equal(a.Q[s], b.Q[s])
+    assert not resumed.resume_training()  # ya no quedan episodios
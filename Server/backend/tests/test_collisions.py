@@ -0,0 +1,29 @@
+import numpy as np
+
+from app.collisions import ConflictResolver
+
+W = 10
+
+
+def blocked(cur, prop, priority=None):
+    enc = lambda cells: np.array([y * W + x for x, y in cells])
+    priority = np.zeros(len(cur), dtype=np.int64) if priority is None else np.array(priority)
+    return ConflictResolver(W, W).resolve(enc(cur), enc(prop), priority).tolist()
+
+
+def test_vertex_conflicts_go_to_priority_then_index():
+    assert blocked([(0, 0), (2, 0)], [(1, 0), (1, 0)]) == [False, True]
+    assert blocked([(0, 0), (2, 0)], [(1, 0), (1, 0)], [0, 2]) == [True, False]
+    # Quien se queda quieto conserva su celda
+    assert blocked([(0, 0), (1, 0)], [(1, 0), (1, 0)]) == [True, False]
+
+
+def test_swaps_and_follow_chains():
+    assert blocked([(0, 0), (1, 0)], [(1, 0), (0, 0)]) == [True, True]
+    assert blocked([(0, 0), (1, 0)], [(1, 0), (2, 0)]) == [False, False]
+    # El último de la cadena pierde el conflicto y bloquea a los que le siguen
+    assert blocked([(0, 0), (1, 0), (2, 0), (4, 0)], [(1, 0), (2, 0), (3, 0), (3, 0)],
+                   [0, 0, 0, 1]) == [True, True, True, False]
+    # Rotación de cuatro agentes: se permite
+    assert blocked([(0, 0), (1, 0), (1, 1), (0, 1)],
+                   [(1, 0), (1, 1), (0, 1), (0, 0)]) == [False] * 4
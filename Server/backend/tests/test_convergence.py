@@ -0,0 +1,36 @@
+import pytest
+
+from app.convergence import ConvergenceMonitor
+
+
+def episode(steps, complete=True):
+    return {'reward': 1.0, 'steps': steps, 'task_complete': complete}
+
+
+def test_complete_streak_respects_step_budget():
+    m = ConvergenceMonitor(patience=0, q_tol=0, complete_streak=2, step_budget=100)
+    out = [m.update(episode(s), []) for s in (90, 120, 80, 99)]
+    assert out[:3] == [None, None, None]   # 120 pasos rompe la racha
+    assert out[3].startswith('complete') and m.status()['reason'] == out[3]
+
+
+def test_eval_patience_counts_only_new_evaluations():
+    m = ConvergenceMonitor(patience=0, q_tol=0, eval_patience=2)
+    history = []
+    out = []
+    for v in (500, 400, 420, 410):
+        history.append({'mean_steps': v})
+        out.append(m.update(episode(1, False), [], history))
+    assert out[:3] == [None, None, None]
+    assert out[3].startswith('eval') and m.best_eval == 400
+
+
+def test_plateau_after_patience_episodes():
+    m = ConvergenceMonitor(window=2, patience=3, q_tol=0)
+    out = [m.update(episode(50), []) for _ in range(5)]
+    assert out[:4] == [None] * 4 and out[4].startswith('plateau')
+
+
+def test_unknown_criterion_is_rejected():
+    with pytest.raises(ValueError):
+        ConvergenceMonitor(foo=1)
@@ -0,0 +1,30 @@
+import numpy as np
+import pytest
+
+from app.env import MultiFieldEnv, CROP
+
+
+@pytest.mark.parametrize('chunked', [False, True])
+def test_crops_age_consume_water_and_ripen(chunked):
+    env = MultiFieldEnv(chunk_threshold=1 if chunked else 10 ** 9, chunk_size=16)
+    env.MATURITY_STEPS = 10
+    env.CROP_UPDATE_EVERY = 2
+    env.CROP_WATER_USE_EVERY = 4
+    crops = np.asarray(env.grid) == CROP
+    ys, xs = np.nonzero(crops)
+    for y, x in zip(ys, xs):
+        env.water[y, x] = 2
+    env.water[0, 0] = 2   # fuera de los cultivos: no se consume
+
+    for _ in range(8):
+        env.update_crops()
+    age = np.asarray(env.crop_age)
+    water = np.asarray(env.water)
+    assert (age[crops] == 8).all() and (age[~crops] == 0).all()
+    # Consumo en los ticks 4 y 8 mientras no están maduros
+    assert (water[crops] == 0).all() and water[0, 0] == 2
+    assert env.mature_crops == 0
+
+    for _ in range(2):
+        env.update_crops()
+    assert env.mature_crops == int(crops.sum()) > 0
@@ -0,0 +1,27 @@
+import random
+
+from app.engine import StepEngine, MOVES, STAGES, training_policy
+from app.env import MultiFieldEnv
+from conftest import fleet
+
+
+def test_learn_sees_the_move_actually_taken():
+    env = MultiFieldEnv(rng=random.Random(4))
+    agents = fleet(env, random.Random(4))
+    seen = []
+
+    def learn(agent, state, action, reward, next_state, done):
+        seen.append((agent.id, action, agent.pos))
+
+    engine = StepEngine(env, agents, policy=training_policy, learn_fn=learn)
+    for _ in range(100):
+        before = [a.pos for a in agents]
+        seen.clear()
+        result = engine.step()
+        assert result.finals == [a.pos for a in agents]
+        assert {i for i, _, _ in seen} == set(env.active_agents)
+        for i, action, pos in seen:
+            dx, dy = MOVES[action]
+            assert pos == (before[i][0] + dx, before[i][1] + dy)
+    report = engine.stage_report()
+    assert set(report) == set(STAGES) and engine.ticks == 100
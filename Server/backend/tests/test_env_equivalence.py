@@ -0,0 +1,34 @@
+import random
+
+import numpy as np
+
+from app.chunked_state import ChunkedFarmState
+from app.engine import StepEngine, training_policy, q_learn
+from app.env import MultiFieldEnv
+from app.farm_state import FarmState
+from conftest import fleet
+
+
+def seeded_run(chunked, seed=3, steps=3000):
+    rng = random.Random(seed)
+    env = MultiFieldEnv(chunk_threshold=1 if chunked else 10 ** 9, chunk_size=16, rng=rng)
+    agents = fleet(env, rng)
+    engine = StepEngine(env, agents, policy=training_policy, learn_fn=q_learn)
+    env.auto_phase = False
+    phases = ('planting', 'irrigating', 'harvesting')
+    for step in range(steps):
+        env.set_phase(phases[step * len(phases) // steps])  # un tercio de la ejecución por fase
+        engine.step()
+    return env, agents
+
+
+def test_dense_and_chunked_runs_match():
+    dense, dense_agents = seeded_run(chunked=False)
+    chunked, chunked_agents = seeded_run(chunked=True)
+    assert isinstance(dense.state, FarmState)
+    assert isinstance(chunked.state, ChunkedFarmState)
+    assert dense.planted_total and dense.irrigated_total
+    for name in ('grid', 'water', 'crop_age'):
+        np.testing.assert_array_equal(np.asarray(getattr(chunked, name)), getattr(dense, name))
+    assert [a.pos for a in chunked_agents] == [a.pos for a in dense_agents]
+    assert chunked.get_metrics() == dense.get_metrics()
@@ -0,0 +1,33 @@
+from app import sim_manager
+from app.parallel_train import reset_fleet
+
+
+def test_reset_fleet_matches_fresh_agents(fresh_sim):
+    env, agents = fresh_sim.env, fresh_sim.agents
+    for a in agents:
+        a.pos = (0, 0)
+        a.current_capacity = 1
+        a.current_fuel = 0
+        a.is_returning_to_barn = True
+        a.recharge_counter = 3
+        a.path = [(1, 1)]
+    reset_fleet(env, agents, 0.3)
+    for i, a in enumerate(agents):
+        assert a.pos == env.agents_init[i]
+        # Cosechadores vacíos, el resto con carga completa (como en FarmAgent.__init__)
+        assert a.current_capacity == (0 if a.role == 'harvester' else a.max_capacity)
+        assert a.current_fuel == a.max_fuel
+        assert not a.is_returning_to_barn and a.recharge_counter == 0 and a.path == []
+        assert a.eps == 0.3
+
+
+def test_train_background_uses_shared_reset(fresh_sim, monkeypatch):
+    calls = []
+
+    def spy(env, agents, eps):
+        calls.append(eps)
+        reset_fleet(env, agents, eps)
+
+    monkeypatch.setattr(sim_manager, 'reset_fleet', spy)
+    fresh_sim.train_background(episodes=2, steps_per_episode=5)
+    assert calls == [fresh_sim.params['eps']] * 2
@@ -0,0 +1,25 @@
+from app.evaluation import BackgroundEvaluator
+
+
+def test_maybe_evaluate_follows_eval_every(fresh_sim, monkeypatch):
+    ev = BackgroundEvaluator(fresh_sim, seeds=(0,), max_steps=50)
+    submitted = []
+    monkeypatch.setattr(ev, 'submit', lambda episode: submitted.append(episode) or True)
+    for every in (0, None):
+        fresh_sim.params['eval_every'] = every
+        assert not any(ev.maybe_evaluate(ep) for ep in range(1, 7))
+    fresh_sim.params['eval_every'] = 3
+    assert [ev.maybe_evaluate(ep) for ep in range(1, 7)] == [False, False, True] * 2
+    assert submitted == [3, 6]
+
+
+def test_submit_records_result_and_skips_while_pending(fresh_sim):
+    ev = BackgroundEvaluator(fresh_sim, seeds=(0,), max_steps=50)
+    assert ev.submit(5)
+    assert not ev.submit(6)   # la anterior sigue en curso
+    ev.wait()
+    ev._pool.shutdown(wait=True)   # el callback de _record ya ha corrido
+    assert ev.skipped == 1 and [h['episode'] for h in ev.history] == [5]
+    assert {'completion_rate', 'mean_steps'} <= set(ev.latest())
+    ev.reset()
+    assert ev.history == [] and ev.skipped == 0 and ev.latest() is None
@@ -0,0 +1,57 @@
+import pickle
+
+import numpy as np
+
+from app.chunked_state import ChunkedFarmState
+from app.farm_state import FarmState
+
+
+def filled(state, rng):
+    for _ in range(300):
+        x, y = int(rng.integers(state.w)), int(rng.integers(state.h))
+        state.grid[y, x] = int(rng.integers(1, 4))
+        state.water[y, x] = int(rng.integers(0, 3))
+        state.crop_age[y, x] = int(rng.integers(0, 60000))
+    return state
+
+
+def test_layers_share_one_aligned_buffer():
+    state = FarmState(37, 23)
+    for name, dtype in state.layers:
+        assert state.offsets[name] % dtype.itemsize == 0
+        assert state.layer(name).dtype == dtype
+        assert np.shares_memory(state.layer(name), state.buffer)
+    state.crop_age[3, 4] = 1234
+    assert state.buffer.nbytes == state.nbytes
+    clone = FarmState.from_bytes(state.to_bytes(), 37, 23)
+    assert clone.crop_age[3, 4] == 1234
+
+
+def test_copy_and_pickle_are_independent():
+    state = filled(FarmState(40, 30), np.random.default_rng(0))
+    clone = state.copy()
+    clone.grid[0, 0] = 9
+    assert state.grid[0, 0] != 9
+    restored = pickle.loads(pickle.dumps(state))
+    for name, _ in state.layers:
+        np.testing.assert_array_equal(restored.layer(name), state.layer(name))
+    restored.water[1, 1] = 7
+    assert state.water[1, 1] != 7
+
+
+def test_chunked_queries_match_dense():
+    rng = np.random.default_rng(1)
+    dense = filled(FarmState(70, 45), rng)
+    chunked = ChunkedFarmState(70, 45, tile=16)
+    for y, x in zip(*np.nonzero(dense.grid)):
+        for name in ('grid', 'water', 'crop_age'):
+            chunked.set(name, int(y), int(x), dense.layer(name)[y, x])
+    for name in ('grid', 'water', 'crop_age'):
+        np.testing.assert_array_equal(np.asarray(getattr(chunked, name)), dense.layer(name))
+    for value in range(4):
+        assert chunked.count('grid', value) == dense.count('grid', value)
+    mask = lambda s: (s.grid == 2) & (s.water == 0)
+    for _ in range(50):
+        pos = (int(rng.integers(70)), int(rng.integers(45)))
+        assert chunked.find_nearest(pos, mask, values=(2,)) == dense.find_nearest(pos, mask)
+    assert len(chunked.tiles) <= -(-70 // 16) * -(-45 // 16)
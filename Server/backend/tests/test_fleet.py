@@ -0,0 +1,28 @@
+import pytest
+
+from app.config import parse_fleet, fleet_for_agents, fleet_roles
+from app.engine import StepEngine, greedy_policy
+from app.env import MultiFieldEnv, OBST
+from conftest import fleet
+
+
+def test_fleet_composition():
+    assert fleet_for_agents(6) == {'planter': 2, 'harvester': 2, 'irrigator': 2}
+    assert fleet_for_agents(10) == {'planter': 4, 'harvester': 3, 'irrigator': 3}
+    counts = parse_fleet('planter:5, harvester:4,irrigator:3')
+    assert fleet_roles(counts) == ['planter'] * 5 + ['harvester'] * 4 + ['irrigator'] * 3
+    with pytest.raises(ValueError):
+        parse_fleet('tractor:2')
+
+
+def test_large_fleet_spawns_on_free_cells():
+    roles = fleet_roles(parse_fleet('planter:8,harvester:7,irrigator:6'))
+    env = MultiFieldEnv(roles=roles)
+    assert env.n_agents == len(roles) == len(env.agents_init)
+    assert len(set(env.agents_init)) == len(roles)
+    for x, y in env.agents_init:
+        assert 0 <= x < env.w and 0 <= y < env.h
+        assert (x, y) not in env.obstacles and env.grid[y, x] != OBST
+    engine = StepEngine(env, fleet(env), policy=greedy_policy)
+    for _ in range(50):
+        engine.step()
@@ -0,0 +1,21 @@
+import random
+
+import numpy as np
+
+from app.headless import run_headless
+
+
+def test_seeded_runs_repeat_and_leave_global_rng_alone(fresh_sim):
+    random.seed(1)
+    np.random.seed(1)
+    state, np_state = random.getstate(), np.random.get_state()
+    runs = [run_headless(fresh_sim.agents, max_steps=400, until_complete=False, seed=7)
+            for _ in range(2)]
+    assert runs[0]['metrics'] == runs[1]['metrics']
+    assert runs[0]['fuel_consumed'] == runs[1]['fuel_consumed']
+    assert runs[0]['steps'] == 400
+    assert random.getstate() == state
+    np.testing.assert_array_equal(np.random.get_state()[1], np_state[1])
+    # La flota y el entorno del servidor no se tocan
+    assert fresh_sim.env.step_count == 0
+    assert [a.pos for a in fresh_sim.agents] == fresh_sim.env.agents_init
@@ -0,0 +1,23 @@
+import random
+
+from app.engine import StepEngine, training_policy
+from app.env import MultiFieldEnv
+from conftest import fleet
+
+
+def test_memoized_goals_match_fresh_search():
+    env = MultiFieldEnv(rng=random.Random(2))
+    agents = fleet(env, random.Random(2))
+    engine = StepEngine(env, agents, policy=training_policy)
+    env.auto_phase = False
+    for step in range(600):
+        env.set_phase(('planting', 'irrigating', 'harvesting')[step // 200])
+        engine.step()
+        if step % 25:
+            continue
+        obs = env._get_obs(agents)
+        for o, a in zip(obs, agents):
+            assert o['pos'] == a.pos and o['role'] == a.role
+            cached = o['goal']
+            target = env._find_target(a.pos, a.role)
+            assert cached == (target if target is not None else env._get_barn_for_role(a.role))
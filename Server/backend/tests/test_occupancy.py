@@ -0,0 +1,32 @@
+import pickle
+
+from app.env import astar
+from app.occupancy import OccupancyGrid
+
+
+def test_agent_layer_tracks_moves():
+    occ = OccupancyGrid(8, 5)
+    occ.set_static([(3, 0), (3, 1), (3, 2), (3, 3)])
+    assert (3, 2) in occ and (2, 2) not in occ
+    occ.place_agent(0, (1, 1))
+    occ.place_agent(1, (1, 1))
+    occ.place_agent(0, (2, 1))
+    assert occ.dynamic[1, 1] == 1 and occ.dynamic[1, 2] == 1
+    assert occ.is_blocked((2, 1)) and not occ.is_blocked((2, 1), goal=(2, 1))
+
+    clone = pickle.loads(pickle.dumps(occ))
+    clone.place_agent(1, (0, 0))
+    assert occ.dynamic[1, 1] == 1 and clone.dynamic[1, 1] == 0
+    assert clone.agent_cells == {0: (2, 1), 1: (0, 0)}
+
+
+def test_astar_routes_around_walls_and_agents():
+    occ = OccupancyGrid(8, 5)
+    occ.set_static([(3, 0), (3, 1), (3, 2), (3, 3)])
+    path = astar((0, 0), (6, 0), occ, 8, 5)
+    assert path[0] == (0, 0) and path[-1] == (6, 0)
+    assert (3, 4) in path and not any(p in occ for p in path)
+    occ.place_agent(0, (3, 4))
+    assert astar((0, 0), (6, 0), occ, 8, 5) is None
+    # La meta ocupada por un agente cuenta como libre
+    assert astar((2, 4), (3, 4), occ, 8, 5) == [(2, 4), (3, 4)]
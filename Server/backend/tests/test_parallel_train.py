@@ -0,0 +1,32 @@
+import threading
+from types import SimpleNamespace
+
+import numpy as np
+
+from app.agents import FarmAgent, QTable
+from app.parallel_train import ParallelTrainer, merge_role_tables
+
+
+def test_merge_weights_by_visits_per_role():
+    a = {(0,): np.array([1.0, 0, 0, 0, 0]), (1,): np.array([4.0, 0, 0, 0, 0])}
+    b = {(0,): np.array([3.0, 0, 0, 0, 0])}
+    c = {(0,): np.array([9.0, 0, 0, 0, 0])}
+    merged = merge_role_tables(['planter', 'planter', 'harvester'], [a, b, c],
+                               [{(0,): 1, (1,): 2}, {(0,): 3}, {(0,): 5}])
+    q, visits = merged['planter']
+    assert q[(0,)][0] == (1 * 1.0 + 3 * 3.0) / 4 and q[(1,)][0] == 4.0
+    assert visits == {(0,): 4, (1,): 2}
+    assert merged['harvester'][0][(0,)][0] == 9.0
+
+
+def test_merge_counts_shared_table_once():
+    shared = QTable()
+    agents = [FarmAgent(aid=i, start_pos=(0, 0), role='planter') for i in range(2)]
+    for a in agents:
+        a.Q = shared
+    sim = SimpleNamespace(agents=agents, lock=threading.Lock())
+    row = np.array([2.0, 0, 0, 0, 0])
+    shard = {'Q': [{(0,): row}, {(0,): row}], 'visits': [{(0,): 3}, {(0,): 3}]}
+    ParallelTrainer(sim, workers=1)._merge([shard])
+    assert all(a.Q is shared for a in agents)
+    assert shared.visits[(0,)] == 6 and shared[(0,)][0] == 2.0
@@ -0,0 +1,31 @@
+from app.agents import FarmAgent
+from app.planning import PrioritizedSweeping
+
+
+def agent():
+    return FarmAgent(aid=0, start_pos=(0, 0), role='planter', alpha=0.5, gamma=0.9)
+
+
+def test_planning_propagates_reward_to_predecessors():
+    ag = agent()
+    planner = PrioritizedSweeping(planning_steps=20)
+    planner(ag, (0,), 1, 0.0, (1,), False)
+    planner(ag, (1,), 2, 10.0, (2,), True)
+    assert ag.Q[(0,)][1] == 0.0
+    visits = dict(ag.visits)
+    planner.learn()
+    assert planner.backups > 0 and ag.Q[(0,)][1] > 0
+    assert dict(ag.visits) == visits   # los backups simulados no cuentan como visitas
+
+
+def test_queue_is_capped_and_pruned_states_stay_out():
+    ag = agent()
+    planner = PrioritizedSweeping(planning_steps=5, max_queue=10)
+    for k in range(50):
+        planner(ag, (k,), 0, float(k + 1), (k + 1,), True)
+    model = planner.models[id(ag.Q)]
+    assert len(model.priority) <= planner.max_queue and planner.dropped > 0
+    # El estado de mayor prioridad se poda de la Q-table: no vuelve por planificación
+    del ag.Q[(49,)]
+    planner.learn()
+    assert (49,) not in ag.Q
@@ -0,0 +1,41 @@
+import os
+
+import numpy as np
+
+from app.agents import FarmAgent, QTable
+from app.policy import CompiledPolicy, load_or_compile
+
+
+def fleet_with_q(share):
+    rng = np.random.default_rng(0)
+    agents = [FarmAgent(aid=i, start_pos=(0, 0), role='planter') for i in range(3)]
+    for a in agents:
+        a.Q = QTable({(int(rng.integers(-8, 9)), int(rng.integers(-8, 9)), 0, 0, 0, 0, 0):
+                      rng.normal(size=5) for _ in range(40)})
+    if share:
+        agents[1].Q = agents[0].Q
+    return agents
+
+
+def test_compiled_actions_match_argmax_and_fallback():
+    agents = fleet_with_q(share=True)
+    policy = CompiledPolicy.compile(agents)
+    assert policy.slots == [0, 0, 1] and len(policy.actions) == 2
+    for a in agents:
+        for s, q in a.Q.items():
+            assert policy(a, s) == int(np.argmax(q))
+    unseen = (3, 0, 15, 4, 5, 4, 1)
+    assert unseen not in agents[2].Q and policy(agents[2], unseen) == 1   # avanza en +x
+    states = {i: next(iter(a.Q)) for i, a in enumerate(agents)}
+    assert policy.batch(agents, states) == {i: policy(agents[i], s) for i, s in states.items()}
+
+
+def test_saved_policy_is_recompiled_when_sharing_changes(tmp_path):
+    path = str(tmp_path / 'policy.npz')
+    load_or_compile(fleet_with_q(share=True), path)
+    assert os.path.exists(path)
+    agents = fleet_with_q(share=False)
+    policy = load_or_compile(agents, path)
+    assert policy.slots == [0, 1, 2]
+    s = next(iter(agents[1].Q))
+    assert policy(agents[1], s) == int(np.argmax(agents[1].Q[s]))
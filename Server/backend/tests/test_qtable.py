@@ -0,0 +1,38 @@
+import pickle
+
+import numpy as np
+
+from app.agents import QTable
+
+
+def test_row_does_not_insert():
+    q = QTable()
+    np.testing.assert_array_equal(q.row((5,)), np.zeros(5))
+    assert (5,) not in q and len(q) == 0
+
+
+def test_prune_evicts_oldest_first_and_keeps_new_states():
+    q = QTable(max_states=10)
+    for i in range(30):
+        # Estados viejos muy visitados y con valor alto: aun así se podan antes
+        q.update((i,), 0, 100.0 - i, alpha=1.0)
+        q.touch((i,), 50 if i < 5 else 0)
+    assert len(q) <= q.max_states
+    assert (29,) in q and (28,) in q
+    assert not any((i,) in q for i in range(5))
+    assert q.evictions == 30 - len(q) and set(q.visits) == set(q)
+
+
+def test_delta_and_pickle():
+    q = QTable(max_states=100)
+    q.update((1,), 0, 2.0, alpha=0.5)
+    q.begin_delta()
+    q.update((1,), 0, 2.0, alpha=0.5)    # 1.0 → 1.5
+    q.update((2,), 1, 4.0, alpha=0.5)    # nuevo: 0 → 2.0
+    diff_sq, norm_sq = q.delta()
+    assert diff_sq == 0.5 ** 2 + 2.0 ** 2 and norm_sq == 1.5 ** 2 + 2.0 ** 2
+    q.end_delta()
+    clone = pickle.loads(pickle.dumps(q))
+    assert isinstance(clone, QTable) and clone.max_states == 100
+    assert dict(clone.visits) == dict(q.visits)
+    np.testing.assert_array_equal(clone[(2,)], q[(2,)])
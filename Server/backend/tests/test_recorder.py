@@ -0,0 +1,38 @@
+import glob
+import random
+
+import numpy as np
+import pytest
+
+from app.engine import StepEngine, greedy_policy
+from app.env import MultiFieldEnv
+from app.recorder import TrajectoryRecorder, TRACE_LAYERS, load_trace
+from conftest import fleet
+
+
+@pytest.mark.parametrize('chunked', [False, True])
+def test_trace_replays_grid_and_water(tmp_path, chunked):
+    env = MultiFieldEnv(chunk_threshold=1 if chunked else 10 ** 9, chunk_size=16,
+                        rng=random.Random(7))
+    agents = fleet(env)
+    env.set_phase('irrigating')
+    rec = TrajectoryRecorder(str(tmp_path), len(agents), chunk_steps=128)
+    engine = StepEngine(env, agents, policy=greedy_policy, recorder=rec)
+    rec.begin_episode(0, env)
+    for tick in range(600):
+        engine.step()
+        if tick == 300:
+            env.begin_cycle()   # cambio masivo fuera de los pasos
+            env.set_phase('irrigating')
+    rec.close()
+    assert rec.stats()['error'] is None
+
+    trace = load_trace(glob.glob(str(tmp_path / '*.npz')))
+    assert trace['cells'].shape[1] == 5
+    layers = {name: trace[name + '0'].copy() for name in TRACE_LAYERS}
+    for _, lid, x, y, value in trace['cells']:
+        layers[TRACE_LAYERS[lid]][y, x] = value
+    # Hay cambios de ambas capas y la traza reproduce el estado final
+    assert set(np.unique(trace['cells'][:, 1])) == {0, 1}
+    np.testing.assert_array_equal(layers['grid'], np.asarray(env.grid))
+    np.testing.assert_array_equal(layers['water'], np.asarray(env.water))
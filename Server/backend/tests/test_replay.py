@@ -0,0 +1,36 @@
+import numpy as np
+
+from app.agents import FarmAgent, QTable
+from app.replay import ReplayLearner
+
+
+def random_state(rng):
+    return (int(rng.integers(-8, 9)), int(rng.integers(-8, 9)), int(rng.integers(16)),
+            int(rng.integers(5)), int(rng.integers(6)), int(rng.integers(5)), int(rng.integers(2)))
+
+
+def test_row_table_bounded_by_pruned_tables():
+    rng = np.random.default_rng(0)
+    shared = QTable(max_states=200)
+    agents = [FarmAgent(aid=i, start_pos=(0, 0), role='planter') for i in range(2)]
+    for a in agents:
+        a.Q = shared
+    learner = ReplayLearner(agents, capacity=300, batch_size=32, initial_rows=64)
+    for tick in range(5000):
+        a = agents[tick % 2]
+        learner(a, random_state(rng), int(rng.integers(5)), 1.0, random_state(rng), False)
+        learner.learn()
+        if tick % 100 == 99:
+            learner.sync_to_agents()
+
+    assert shared.evictions > 0 and learner.compactions > 0
+    # Filas: estados vivos de la tabla + los referenciados por el buffer (300 transiciones)
+    assert len(learner.row_key) <= shared.max_states + 2 * 300
+    # Las filas de los buffers siguen apuntando a un (slot, estado) consistente
+    buf = learner.buffers['planter']
+    for s in np.concatenate([buf.s[:buf.size], buf.s2[:buf.size]]):
+        slot, state = learner.row_key[s]
+        assert learner.row_of[slot][state] == s
+    # La compactación conserva los valores de los estados vivos
+    for state, q in shared.items():
+        np.testing.assert_allclose(learner.q[learner.row_of[0][state]], q, rtol=1e-6)
@@ -0,0 +1,32 @@
+import numpy as np
+
+from app.agents import FarmAgent, QTable
+from app.role_q import share_role_q, batched_greedy
+
+
+def agents_with_tables():
+    roles = ['planter', 'planter', 'harvester']
+    agents = [FarmAgent(aid=i, start_pos=(0, 0), role=r) for i, r in enumerate(roles)]
+    agents[0].Q = QTable({(1,): np.array([0.0, 4, 0, 0, 0])}, {(1,): 1})
+    agents[1].Q = QTable({(1,): np.array([0.0, 0, 0, 8, 0]), (2,): np.array([1.0, 0, 0, 0, 0])},
+                         {(1,): 3, (2,): 1})
+    agents[2].Q = QTable({(1,): np.array([0.0, 0, 5, 0, 0])}, {(1,): 2})
+    return agents
+
+
+def test_share_role_q_merges_by_visits():
+    agents = agents_with_tables()
+    shared = share_role_q(agents)
+    assert agents[0].Q is agents[1].Q is shared['planter']
+    assert agents[2].Q is shared['harvester'] and agents[2].Q is not agents[0].Q
+    np.testing.assert_allclose(agents[0].Q[(1,)], [0, 1, 0, 6, 0])
+    assert agents[0].visits[(1,)] == 4
+
+
+def test_batched_greedy_matches_argmax():
+    agents = agents_with_tables()
+    share_role_q(agents)
+    states = {0: (1,), 1: (2,), 2: (1,)}
+    actions = batched_greedy(agents, states)
+    for i, s in states.items():
+        assert actions[i] == int(np.argmax(agents[i].Q[s]))
@@ -0,0 +1,25 @@
+from app.engine import StepEngine, greedy_policy
+from app.env import MultiFieldEnv
+from conftest import fleet
+
+
+def test_parked_off_phase_agents_sleep_until_their_phase():
+    env = MultiFieldEnv()
+    agents = fleet(env)
+    env.auto_phase = False
+    engine = StepEngine(env, agents, policy=greedy_policy)
+    off_phase = [i for i, a in enumerate(agents) if a.role != 'planter']
+    for _ in range(20):
+        engine.step()
+    # En plantación, los demás roles aparcados con todo lleno no cuestan nada
+    assert set(off_phase) <= env.scheduler.sleeping
+    assert set(env.active_agents).isdisjoint(off_phase)
+    parked = [agents[i].pos for i in off_phase]
+    engine.step()
+    assert [agents[i].pos for i in off_phase] == parked
+
+    env.set_phase('harvesting')
+    engine.step()
+    harvesters = [i for i, a in enumerate(agents) if a.role == 'harvester']
+    assert set(harvesters) <= set(env.active_agents)
+    assert not any(env.scheduler.is_sleeping(i) for i in harvesters)
@@ -0,0 +1,22 @@
+import random
+
+from app.train_state_machine import StateMachineTrainer
+
+
+def test_cycles_continue_on_one_env(monkeypatch):
+    random.seed(0)
+    trainer = StateMachineTrainer()
+    monkeypatch.setattr(trainer, 'save_qs', lambda *a, **k: None)
+    resets = []
+    reset = trainer.env.reset
+    monkeypatch.setattr(trainer.env, 'reset', lambda: resets.append(1) or reset())
+    cycles = []
+    begin_cycle = trainer.env.begin_cycle
+    monkeypatch.setattr(trainer.env, 'begin_cycle', lambda: cycles.append(1) or begin_cycle())
+
+    trainer.train_background(episodes=2, steps_per_episode=800)
+    episodes = trainer.train_stats['episodes']
+    assert len(episodes) == 2 and len(resets) == 1 and len(cycles) == 2
+    assert trainer.env.step_count == 1600
+    for ep in episodes:
+        assert ep['planted'] > 0 and 'planting' in ep['phases']
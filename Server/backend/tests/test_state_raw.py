@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+from app import api
+from app.env import MultiFieldEnv
+
+
+def decode_layers(headers, body):
+    """Reconstruye las capas completas (h, w) desde la respuesta de /state/raw"""
+    w, h = int(headers['x-grid-width']), int(headers['x-grid-height'])
+    assert len(body) == int(headers['x-grid-bytes'])
+    buf = np.frombuffer(body, dtype=np.uint8)
+    layers = [entry.split(':') for entry in headers['x-grid-layers'].split(',')]
+    if 'x-grid-tiles' not in headers:
+        return {name: buf[int(off):int(off) + w * h * np.dtype(dt).itemsize].view(dt).reshape(h, w)
+                for name, dt, off in layers}
+    out = {name: np.zeros((h, w), dtype=dt) for name, dt in layers}
+    for entry in headers['x-grid-tiles'].split(','):
+        x0, y0, tw, th, base = map(int, entry.split(':'))
+        off = 0
+        for name, dt in layers:
+            size = np.dtype(dt).itemsize
+            off = -(-off // size) * size
+            out[name][y0:y0 + th, x0:x0 + tw] = (
+                buf[base + off:base + off + tw * th * size].view(dt).reshape(th, tw))
+            off += tw * th * size
+    return out
+
+
+@pytest.mark.parametrize('chunked', [False, True])
+def test_state_raw_round_trip(monkeypatch, chunked):
+    env = MultiFieldEnv(chunk_threshold=1 if chunked else 10 ** 9, chunk_size=16)
+    env.water[5, 7] = 3
+    monkeypatch.setattr(api.sim, 'env', env)
+
+    resp = api.state_raw()
+    assert resp.media_type == 'application/octet-stream'
+    assert ('x-grid-tiles' in resp.headers) == chunked
+
+    layers = decode_layers(resp.headers, resp.body)
+    np.testing.assert_array_equal(layers['grid'], np.asarray(env.grid))
+    np.testing.assert_array_equal(layers['water'], np.asarray(env.water))
+    assert layers['water'][5, 7] == 3
@@ -0,0 +1,46 @@
+import random
+
+import pytest
+
+from app.sweep import HyperparameterSweep, sample_config
+
+SPACE = {'alpha': {'low': 0.1, 'high': 0.9}, 'gamma': [0.9, 0.95],
+         'eps_decay': {'low': 0.98, 'high': 0.999, 'log': True}}
+
+
+def test_sample_config_stays_in_space():
+    rng = random.Random(0)
+    for _ in range(50):
+        c = sample_config(SPACE, rng)
+        assert 0.1 <= c['alpha'] <= 0.9 and c['gamma'] in (0.9, 0.95)
+        assert 0.98 <= c['eps_decay'] <= 0.999
+    with pytest.raises(ValueError):
+        sample_config({'foo': [1]}, rng)
+
+
+def test_promotes_top_fraction_before_new_trials(fresh_sim):
+    sw = HyperparameterSweep(fresh_sim, SPACE, n_configs=4, eta=2, min_episodes=1, seed=0)
+    assert sw.max_rung == 2 and [sw.budget(k) for k in range(3)] == [1, 2, 4]
+    rung_results = {0: [], 1: [], 2: []}
+    promoted = {0: set(), 1: set()}
+    for tid, rate in ((0, 0.2), (1, 0.8)):
+        sw.trials[tid].update(completion_rate=rate, mean_steps=100, mean_fuel_efficiency=1.0,
+                              rung=0, status='paused')
+        rung_results[0].append(tid)
+    assert sw._next_job(rung_results, promoted) == (1, 1)   # el mejor de 2 sube
+    assert sw._next_job(rung_results, promoted) == (2, 0)   # luego, trials nuevos
+    assert sw.best()['id'] == 1
+
+
+def test_run_and_apply_best(fresh_sim):
+    sw = HyperparameterSweep(fresh_sim, {'alpha': [0.3, 0.6]}, n_configs=2, eta=2,
+                             min_episodes=1, steps_per_episode=30, eval_steps=30,
+                             eval_seeds=(0,), workers=1, seed=1)
+    res = sw.run()
+    assert res['status'] == 'done'
+    statuses = sorted(t['status'] for t in sw.trials)
+    assert statuses == ['completed', 'pruned']
+    best = sw.best()
+    assert best['status'] == 'completed' and best['episodes'] == sw.budget(1)
+    assert sw.apply_best() == best['config']
+    assert all(a.alpha == best['config']['alpha'] for a in fresh_sim.agents)
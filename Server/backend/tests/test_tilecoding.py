@@ -0,0 +1,27 @@
+import numpy as np
+
+from app.tilecoding import TileQ
+
+STATE = (120, -300, 3, 0.5, 900, 0.25, 1)
+NEAR = (119, -300, 3, 0.5, 900, 0.25, 1)
+
+
+def test_updates_converge_and_generalize_with_fixed_memory():
+    q = TileQ(5, 8, 4096)
+    nbytes = q.w.nbytes
+    assert STATE not in q and not q.row(STATE).any()
+    for _ in range(50):
+        q.update(STATE, 2, 10.0, 0.5)
+    assert STATE in q
+    assert abs(q.row(STATE)[2] - 10.0) < 0.1
+    assert q.row(NEAR)[2] > 0          # estados vecinos comparten tiles
+    assert q.w.nbytes == nbytes and q.maybe_prune() == 0
+
+
+def test_batch_matches_rows_and_reports_td():
+    q = TileQ(5, 8, 4096)
+    states = [STATE, (0, 0, 0, 0, 0, 0, 0)]
+    td = q.update_batch(states, [1, 0], [5.0, -1.0], 0.5)
+    np.testing.assert_allclose(td, [5.0, -1.0])
+    np.testing.assert_allclose(q.rows(states), np.stack([q.row(s) for s in states]), rtol=1e-6)
+    assert q.rows(states)[0, 1] > 0 and q.rows(states)[1, 0] < 0
@@ -0,0 +1,33 @@
+import pytest
+
+from app import api
+
+
+@pytest.fixture
+def started(monkeypatch):
+    monkeypatch.setattr(api.sim, 'params', dict(api.sim.params))
+    calls = []
+    monkeypatch.setattr(api.sim, 'start_training', lambda **kw: calls.append(kw) or True)
+    return calls
+
+
+def test_early_stop_not_kept_from_previous_request(started):
+    api.train(api.TrainRequest(early_stop={'patience': 5}))
+    assert api.sim.params['early_stop'] == {'patience': 5}
+    api.train(api.TrainRequest())
+    assert api.sim.params['early_stop'] is None
+    assert len(started) == 2
+
+
+def test_invalid_early_stop_is_rejected(started):
+    out = api.train(api.TrainRequest(early_stop={'paciencia': 5}))
+    assert out['status'] == 'error'
+    assert not started
+
+
+def test_eval_every_not_kept_from_previous_request(started):
+    api.train(api.TrainRequest(eval_every=5))
+    assert api.sim.params['eval_every'] == 5
+    api.train(api.TrainRequest())
+    assert not api.sim.params['eval_every']
+    assert api.evaluations()['eval_every'] == 0
@@ -0,0 +1,44 @@
+import random
+
+import numpy as np
+
+from app.engine import StepEngine, greedy_policy
+from app.env import MultiFieldEnv
+from app.headless import run_headless
+from app.whatif import fork_simulation, what_if
+from conftest import fleet
+
+
+def live_sim():
+    env = MultiFieldEnv(rng=random.Random(6))
+    agents = fleet(env)
+    engine = StepEngine(env, agents, policy=greedy_policy)
+    for _ in range(50):
+        engine.step()
+    return env, agents
+
+
+def test_fork_is_independent_of_live_sim():
+    env, agents = live_sim()
+    grid, water = env.grid.copy(), env.water.copy()
+    positions = [a.pos for a in agents]
+    fenv, fagents = fork_simulation(env, agents)
+    assert all(f.Q is a.Q for f, a in zip(fagents, agents))
+    run_headless(fagents, env=fenv, max_steps=300, until_complete=False)
+    assert fenv.step_count == env.step_count + 300
+    assert not np.array_equal(fenv.grid, grid) or not np.array_equal(fenv.water, water)
+    np.testing.assert_array_equal(env.grid, grid)
+    np.testing.assert_array_equal(env.water, water)
+    assert [a.pos for a in agents] == positions
+    assert env.occupancy.agent_cells == {i: p for i, p in enumerate(positions)}
+
+
+def test_what_if_scenarios_leave_live_sim_untouched():
+    env, agents = live_sim()
+    step, n = env.step_count, len(agents)
+    out = what_if(env, agents, [{'name': 'extra', 'add_agents': {'harvester': 1}}],
+                  max_steps=200, workers=1)
+    base, extra = out['results']
+    assert base['name'] == 'baseline' and base['agents'] == n
+    assert extra['agents'] == n + 1 and extra['start_step'] == step
+    assert env.step_count == step and len(agents) == len(env.agent_roles) == n